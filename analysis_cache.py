@@ -0,0 +1,126 @@
+import hashlib
+import sys
+from collections import OrderedDict
+
+from expression_parser_with_quads import ExpressionParser
+from parser import JSParser
+from recursive_parser import RecursiveDescentParser
+from scanner import JSScanner
+
+# Версия анализаторов входит в ключ кэша. Ее нужно увеличивать при изменении
+# сканера или парсеров, меняющем результаты анализа
+ANALYZER_VERSION = 1
+
+
+def estimate_size(obj, sample=64):
+    """Приблизительный размер объекта вместе с вложенными объектами в байтах.
+
+    Общие объекты учитываются один раз. Размер длинных списков и кортежей
+    оценивается по первым sample элементам, чтобы оценка не стоила столько же,
+    сколько сам анализ."""
+    seen = set()
+
+    def size_of(value):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        size = sys.getsizeof(value)
+        if isinstance(value, (str, bytes, int, float, bool, type(None))):
+            return size
+
+        if isinstance(value, dict):
+            items = list(value.keys()) + list(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = value
+        else:
+            items = [getattr(value, name) for name in getattr(type(value), '__slots__', ())
+                     if hasattr(value, name)]
+            if hasattr(value, '__dict__'):
+                items.append(value.__dict__)
+
+        if isinstance(items, (list, tuple)) and len(items) > sample:
+            return size + sum(size_of(item) for item in items[:sample]) * len(items) // sample
+        return size + sum(size_of(item) for item in items)
+
+    return size_of(obj)
+
+
+class AnalysisCache:
+    """LRU-кэш результатов анализа, общий для всех команд меню «Пуск».
+
+    Ключ - хеш содержимого документа, версия анализаторов и вид результата,
+    поэтому повторный или комбинированный запуск на неизмененном документе
+    не выполняет анализ заново. Размер результатов оценивается в байтах, и
+    при превышении бюджета max_bytes вытесняются давно не использованные.
+
+    Результаты из кэша общие для всех команд и не должны изменяться."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # Ключ -> (результат, размер в байтах)
+        self.size = 0                 # Суммарный размер результатов в кэше
+        self.hits = 0
+        self.misses = 0
+        self.scanner = JSScanner()
+
+    @staticmethod
+    def digest(text):
+        """Хеш содержимого документа"""
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def get(self, digest, kind, compute):
+        """Возвращает результат вида kind для документа с хешем digest,
+        вычисляя его функцией compute при промахе"""
+        key = (digest, ANALYZER_VERSION, kind)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        value = compute()
+        size = estimate_size(value)
+        # Результат больше всего бюджета не кэшируем
+        if size <= self.max_bytes:
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+        return value
+
+    def clear(self):
+        """Очищает кэш"""
+        self.entries.clear()
+        self.size = 0
+
+    def tokens(self, text, tokenize=None, digest=None):
+        """Поток лексем документа.
+
+        tokenize - функция получения лексем вместо сканера кэша, например,
+        лексемы инкрементального сканера редактора"""
+        digest = digest or self.digest(text)
+        return self.get(digest, 'tokens', lambda: (tokenize or self.scanner.tokenize)(text))
+
+    def syntax(self, text, tokenize=None):
+        """Результат синтаксического анализа: (лексемы, синтаксические ошибки, журнал восстановления).
+
+        Синтаксический анализ использует закэшированный поток лексем"""
+        digest = self.digest(text)
+
+        def compute():
+            tokens = self.tokens(text, tokenize, digest)
+            parser = JSParser()
+            _, syntax_errors = parser.parse_tokens(tokens)
+            return tokens, syntax_errors, list(parser.get_recovery_logs())
+
+        return self.get(digest, 'syntax', compute)
+
+    def quads(self, text):
+        """Тетрады арифметического выражения: (тетрады, ошибки)"""
+        return self.get(self.digest(text), 'quads', lambda: ExpressionParser().parse(text))
+
+    def recursive(self, text):
+        """Результат рекурсивного спуска: (журнал вызовов, ошибки, журнал выполнения)"""
+        return self.get(self.digest(text), 'recursive', lambda: RecursiveDescentParser().parse(text))
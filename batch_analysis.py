@@ -0,0 +1,497 @@
+"""Пакетный лексический и синтаксический анализ файлов без графического интерфейса.
+
+Файлы распределяются порциями по пулу процессов, в каждом процессе один раз
+создаются сканер и парсер. Результаты выводятся в формате JSON Lines
+(один JSON-объект на файл) в порядке завершения обработки.
+
+С ключом --split каждый файл делится на части по границам объявлений, и
+части одного файла разбираются всеми процессами (см. parse_parallel) -
+так анализируется один большой файл.
+
+С ключом --expressions файлы содержат по одному арифметическому выражению
+в строке. Строки разбираются независимо порциями во всех процессах, а для
+каждого выражения выводятся его тетрады и ошибки в порядке строк.
+
+Пример запуска:
+    python batch_analysis.py configs/ --workers 8 --output report.jsonl
+    python batch_analysis.py huge.js --split
+    python batch_analysis.py formulas.txt --expressions
+"""
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from expression_parser_with_quads import ExpressionParser
+from parser import JSParser, SyntaxError
+from scanner import JSScanner, ScanState, TokenBuffer
+
+# Парсер рабочего процесса, создается один раз при запуске процесса
+_parser = None
+# Анализатор выражений рабочего процесса
+_expression_parser = None
+
+
+def init_worker(engine="regex", recovery_log=False):
+    """Создает парсер (и сканер) рабочего процесса"""
+    global _parser
+    _parser = JSParser()
+    _parser.scanner = JSScanner(engine)
+    # Журнал состояний автомата нужен только для отладки и заметно замедляет разбор
+    _parser.debug_mode = recovery_log
+
+
+def init_expression_worker(engine="regex"):
+    """Создает анализатор выражений рабочего процесса"""
+    global _expression_parser
+    _expression_parser = ExpressionParser()
+    _expression_parser.scanner = JSScanner(engine)
+
+
+def parse_expression_lines(lines):
+    """Разбирает порцию строк-выражений в рабочем процессе.
+
+    Для каждой строки возвращает (тетрады кортежами, имя результата, ошибки);
+    временные переменные каждого выражения нумеруются с t1"""
+    parser = _expression_parser
+    results = []
+    for line in lines:
+        quads, errors = parser.parse(line)
+        results.append(([(quad.op, quad.arg1, quad.arg2, quad.result) for quad in quads],
+                        parser.result, list(errors)))
+    return results
+
+
+# Граница частей файла при разборе по частям: начало строки с `let` после
+# строки, которая заканчивается на `;`
+SPLIT_POINT = re.compile(r';[ \t\r]*\n(?=[ \t]*let\b)')
+
+
+def read_text(path, result):
+    """Читает файл; при ошибке записывает ее в result и возвращает None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        result['error'] = str(e)
+        return None
+
+
+def make_result(result, parser, tokens, syntax_errors):
+    """Заполняет словарь результатов анализа файла"""
+    result['tokens'] = len(tokens)
+    result['lexical_errors'] = len(parser.errors)
+    result['syntax_errors'] = [
+        {'line': error.line, 'column': error.column, 'message': error.message, 'value': error.value}
+        for error in syntax_errors
+    ]
+    if parser.debug_mode:
+        result['recovery_log'] = parser.get_recovery_logs()
+    return result
+
+
+def analyze_file(path):
+    """Анализирует один файл и возвращает словарь с результатами"""
+    result = {'file': path}
+    text = read_text(path, result)
+    if text is None:
+        return result
+
+    tokens, syntax_errors = _parser.parse(text)
+    return make_result(result, _parser, tokens, syntax_errors)
+
+
+def analyze_chunk(paths):
+    """Анализирует порцию файлов в рабочем процессе"""
+    return [analyze_file(path) for path in paths]
+
+
+def split_text(text, parts, min_size=1 << 16):
+    """Делит текст не больше чем на parts частей по границам объявлений.
+
+    Части начинаются с начала строки: лексемы сканера не переходят через
+    перевод строки (незакрытая строка заканчивается в конце строки), поэтому
+    часть не может начаться внутри лексемы. Глубину скобок без сканирования
+    не узнать, поэтому граница ищется эвристически (см. SPLIT_POINT), а
+    проверяет ее merge_parts. Возвращает список пар (смещение, номер строки)"""
+    cuts = [(0, 1)]
+    step = max(len(text) // parts, min_size)
+    target = step
+    line = 1
+    while target < len(text):
+        match = SPLIT_POINT.search(text, target)
+        if not match:
+            break
+        cut = match.end()
+        line += text.count('\n', cuts[-1][0], cut)
+        cuts.append((cut, line))
+        target = cut + step
+    return cuts
+
+
+def parse_part(text, first_line):
+    """Сканирует и разбирает часть файла в рабочем процессе.
+
+    Часть разбирается так, как будто перед ней нет открытых скобок, а
+    объявления начинаются с ее первой лексемы; поправки на соседние части
+    вносит merge_parts. Возвращает словарь с массивами лексем, скобками без
+    пары внутри части и результатами разбора каждого объявления"""
+    scanner = _parser.scanner
+    buffer = TokenBuffer(text, scanner.kinds)
+    state = ScanState(line=first_line)
+    scanner.scan(text, state, buffer)
+
+    # Закрывающие скобки, которым не нашлось пары в части: в целом файле их
+    # может закрыть скобка из предыдущих частей
+    types = bytes(buffer.types)
+    partners = buffer.partners
+    closers = []
+    for kind in (scanner.kind_codes['RBRACE'], scanner.kind_codes['RPAREN'],
+                 scanner.kind_codes['RBRACKET']):
+        index = types.find(kind)
+        while index >= 0:
+            if partners[index] < 0:
+                closers.append(index)
+            index = types.find(kind, index + 1)
+    closers.sort()
+
+    # Объявления разбираются по одному, чтобы при слиянии можно было
+    # принять результаты части начиная с любого из них
+    parser = _parser
+    tokens = list(buffer)
+    parser.tokens = tokens
+    parser.syntax_errors = []
+    parser.tracer.clear()
+    starts = array('i')
+    ends = array('i')
+    error_counts = array('i')
+    log_counts = array('i')
+    reads_end = []  # Номера объявлений, которые просмотрели часть до конца
+    count = len(tokens)
+    index = 0
+    while index < count:
+        starts.append(index)
+        error_counts.append(len(parser.syntax_errors))
+        log_counts.append(len(parser.tracer))
+        parser.lookahead = index
+        index = parser.parse_statement(tokens, index)
+        ends.append(index)
+        if parser.lookahead >= count:
+            reads_end.append(len(starts) - 1)
+    error_counts.append(len(parser.syntax_errors))
+    log_counts.append(len(parser.tracer))
+
+    return {
+        'types': buffer.types, 'starts': buffer.starts, 'ends': buffer.ends,
+        'lines': buffer.lines, 'columns': buffer.columns, 'partners': buffer.partners,
+        'closers': closers, 'openers': state.brackets,
+        'statements': (starts, ends), 'reads_end': reads_end,
+        'errors': [(error.message, error.line, error.column, error.value)
+                   for error in parser.syntax_errors],
+        'error_counts': error_counts,
+        'logs': list(parser.tracer.events), 'log_counts': log_counts,
+    }
+
+
+def merge_parts(text, cuts, results, parser):
+    """Собирает результаты частей в поток лексем и ошибки всего файла,
+    совпадающие с результатом parser.parse(text).
+
+    Скобки частей сопоставляются последовательно: закрывающая скобка без пары
+    в своей части закрывает последнюю открытую скобку предыдущих частей и
+    становится лексемой-ошибкой, если ее тип не подходит. Объявления части
+    принимаются, только если анализ всего файла начинает объявление с той же
+    лексемы, и объявление не просмотрело часть до конца; остальные объявления
+    (и все объявления части с исправленными скобками) разбираются заново
+    по потоку лексем всего файла."""
+    scanner = parser.scanner
+    tokens = TokenBuffer(text, scanner.kinds)
+    error_kind = scanner.kind_codes['ERROR']
+    closing = {'LBRACE': '}', 'LPAREN': ')', 'LBRACKET': ']'}
+    stack = []
+    bases = []
+    fixed = []
+    for (offset, _), result in zip(cuts, results):
+        base = len(tokens.types)
+        bases.append(base)
+        tokens.types.extend(result['types'])
+        tokens.starts.extend(map(offset.__add__, result['starts']))
+        tokens.ends.extend(map(offset.__add__, result['ends']))
+        tokens.lines.extend(result['lines'])
+        tokens.columns.extend(result['columns'])
+        tokens.partners.extend([partner + base if partner >= 0 else -1
+                                for partner in result['partners']])
+
+        changed = False
+        for closer in result['closers']:
+            if not stack:
+                break
+            index = base + closer
+            opening_type, opener = stack.pop()
+            if text[tokens.starts[index]] == closing[opening_type]:
+                tokens.partners[opener] = index
+                tokens.partners[index] = opener
+            else:
+                tokens.types[index] = error_kind
+                changed = True
+        fixed.append(changed)
+        stack.extend((opening_type, base + opener) for opening_type, opener in result['openers'])
+    scanner.close_brackets(ScanState(brackets=stack), tokens)
+
+    # Лексические ошибки идут перед синтаксическими, как в JSParser.parse_tokens
+    parser.tokens = tokens
+    parser.errors = []
+    parser.syntax_errors = errors = []
+    parser.tracer.clear()
+    parser.current_state = parser.STATES['START']
+    types = bytes(tokens.types)
+    index = types.find(error_kind)
+    while index >= 0:
+        parser.add_lexical_error(tokens[index])
+        index = types.find(error_kind, index + 1)
+
+    position = 0
+    count = len(tokens)
+    for base, changed, result in zip(bases, fixed, results):
+        starts, ends = result['statements']
+        reads_end = result['reads_end']
+        end = base + len(result['types'])
+        while position < end:
+            k = bisect_left(starts, position - base)
+            if not changed and k < len(starts) and starts[k] == position - base:
+                # Объявления части до первого, просмотревшего часть до конца
+                last = reads_end[bisect_left(reads_end, k)] if reads_end and reads_end[-1] >= k else len(starts)
+                if last > k:
+                    errors.extend(SyntaxError(*error) for error in
+                                  result['errors'][result['error_counts'][k]:result['error_counts'][last]])
+                    # Индексы лексем в событиях журнала части сдвигаются к потоку файла
+                    parser.tracer.extend((kind, state, index + base, template, args)
+                                         for kind, state, index, template, args in
+                                         result['logs'][result['log_counts'][k]:result['log_counts'][last]])
+                    position = base + ends[last - 1]
+                    continue
+            position = parser.parse_statement(tokens, position)
+    # Лексемы незакрытых скобок в конце файла
+    while position < count:
+        position = parser.parse_statement(tokens, position)
+    return tokens, errors
+
+
+def parse_parallel(text, parser, executor=None, parts=None):
+    """Разбирает один текст по частям в пуле процессов executor.
+
+    Возвращает то же, что parser.parse(text), но лексемы - в TokenBuffer.
+    Рабочие процессы пула должны быть запущены через init_worker с тем же
+    движком сканера; без пула части разбираются в текущем процессе (нужен
+    вызов init_worker). Части пересылаются между процессами как массивы,
+    а не как объекты Token."""
+    cuts = split_text(text, parts or 1)
+    chunks = [text[offset:end] for (offset, _), (end, _) in zip(cuts, cuts[1:] + [(len(text), 0)])]
+    lines = [line for _, line in cuts]
+    if executor is None:
+        results = list(map(parse_part, chunks, lines))
+    else:
+        results = list(executor.map(parse_part, chunks, lines))
+    return merge_parts(text, cuts, results, parser)
+
+
+def iter_split_results(files, workers=None, engine="regex", recovery_log=False):
+    """Анализирует файлы по одному, разбирая части каждого файла во всех процессах"""
+    workers = workers or os.cpu_count() or 1
+    parser = JSParser()
+    parser.scanner = JSScanner(engine)
+    parser.debug_mode = recovery_log
+
+    executor = None
+    if workers == 1:
+        init_worker(engine, recovery_log)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                       initargs=(engine, recovery_log))
+    try:
+        for path in files:
+            result = {'file': path}
+            text = read_text(path, result)
+            if text is not None:
+                # Частей больше, чем процессов, чтобы процессы были загружены равномерно
+                tokens, syntax_errors = parse_parallel(text, parser, executor, workers * 4)
+                make_result(result, parser, tokens, syntax_errors)
+            yield result
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def iter_expression_chunks(files, chunk_lines):
+    """Делит строки файлов на порции (файл, номера строк, строки).
+
+    Пустые строки пропускаются. Для файла, который не удалось прочитать,
+    выдается (файл, None, словарь с ошибкой)"""
+    for path in files:
+        result = {'file': path}
+        text = read_text(path, result)
+        if text is None:
+            yield path, None, result
+            continue
+        numbers = []
+        lines = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            numbers.append(number)
+            lines.append(line)
+            if len(lines) == chunk_lines:
+                yield path, numbers, lines
+                numbers = []
+                lines = []
+        if lines:
+            yield path, numbers, lines
+
+
+def expression_records(path, numbers, lines, results):
+    """Словари результатов для порции строк-выражений"""
+    return [{'file': path, 'line': number, 'expression': line,
+             'quads': quads, 'result': result, 'errors': errors}
+            for number, line, (quads, result, errors) in zip(numbers, lines, results)]
+
+
+def iter_expression_results(files, workers=None, chunk_lines=4096, engine="regex"):
+    """Разбирает строки-выражения файлов в пуле процессов и выдает
+    результаты по строкам в порядке файлов и строк.
+
+    Порции по chunk_lines строк отправляются в пул заранее, но не больше
+    двух порций на процесс, а результаты выдаются в порядке отправки,
+    поэтому память не растет с числом строк."""
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        init_expression_worker(engine)
+        for path, numbers, lines in iter_expression_chunks(files, chunk_lines):
+            if numbers is None:
+                yield lines
+            else:
+                yield from expression_records(path, numbers, lines, parse_expression_lines(lines))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_expression_worker,
+                             initargs=(engine,)) as executor:
+        pending = deque()  # (файл, номера строк, строки, задача) в порядке отправки
+        chunks = iter_expression_chunks(files, chunk_lines)
+        while True:
+            while len(pending) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                path, numbers, lines = chunk
+                future = executor.submit(parse_expression_lines, lines) if numbers is not None else None
+                pending.append((path, numbers, lines, future))
+            if not pending:
+                break
+            path, numbers, lines, future = pending.popleft()
+            if future is None:
+                yield lines
+            else:
+                yield from expression_records(path, numbers, lines, future.result())
+
+
+def collect_files(paths, pattern="*.js"):
+    """Собирает файлы из списка путей, рекурсивно обходя каталоги"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if fnmatch.fnmatch(name, pattern):
+                        files.append(os.path.join(root, name))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_results(files, workers=None, chunk_size=16, engine="regex", recovery_log=False):
+    """Анализирует файлы в пуле процессов и выдает результаты по мере готовности.
+
+    Файлы отправляются порциями по chunk_size, а в работе одновременно
+    находится не больше двух порций на процесс, поэтому очередь задач
+    не растет вместе с числом файлов."""
+    workers = workers or os.cpu_count() or 1
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+
+    if workers == 1:
+        # Без пула процессов - удобно для отладки
+        init_worker(engine, recovery_log)
+        for chunk in chunks:
+            yield from analyze_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(engine, recovery_log)) as executor:
+        pending = set()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < workers * 2:
+                pending.add(executor.submit(analyze_chunk, chunks[next_chunk]))
+                next_chunk += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Пакетный лексический и синтаксический анализ файлов JavaScript")
+    arg_parser.add_argument('paths', nargs='+', help="файлы и каталоги для анализа")
+    arg_parser.add_argument('-j', '--workers', type=int, default=None,
+                            help="число рабочих процессов (по умолчанию - число ядер)")
+    arg_parser.add_argument('--chunk-size', type=int, default=16,
+                            help="число файлов в одной задаче")
+    arg_parser.add_argument('--pattern', default='*.js',
+                            help="шаблон имен файлов при обходе каталогов")
+    arg_parser.add_argument('--engine', choices=JSScanner.ENGINES, default="regex",
+                            help="движок сканера")
+    arg_parser.add_argument('--recovery-log', action='store_true',
+                            help="включить в результаты журнал восстановления после ошибок")
+    arg_parser.add_argument('--split', action='store_true',
+                            help="разбирать каждый файл по частям во всех процессах "
+                                 "(для одного большого файла)")
+    arg_parser.add_argument('--expressions', action='store_true',
+                            help="файлы содержат по одному арифметическому выражению в строке; "
+                                 "выводятся тетрады и ошибки каждого выражения")
+    arg_parser.add_argument('--chunk-lines', type=int, default=4096,
+                            help="число строк-выражений в одной задаче")
+    arg_parser.add_argument('-o', '--output', help="файл для результатов (по умолчанию - stdout)")
+    args = arg_parser.parse_args(argv)
+
+    files = collect_files(args.paths, args.pattern)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    has_errors = False
+    try:
+        if args.expressions:
+            results = iter_expression_results(files, args.workers, args.chunk_lines, args.engine)
+        elif args.split:
+            results = iter_split_results(files, args.workers, args.engine, args.recovery_log)
+        else:
+            results = iter_results(files, args.workers, args.chunk_size,
+                                   args.engine, args.recovery_log)
+        for result in results:
+            if result.get('error') or result.get('syntax_errors') or result.get('errors'):
+                has_errors = True
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    # Ненулевой код возврата, если хотя бы в одном файле найдены ошибки
+    return 1 if has_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
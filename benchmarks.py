@@ -0,0 +1,340 @@
+"""Бенчмарки сканера и анализаторов.
+
+Пример запуска:
+    python benchmarks.py adversarial --engine dfa
+    python benchmarks.py keywords
+    python benchmarks.py recovery
+    python benchmarks.py expressions
+    python benchmarks.py vector
+    python benchmarks.py compiled
+    python benchmarks.py formulas
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+from expression_parser_with_quads import ExpressionParser
+from parser import JSParser
+from quad_evaluator import CompiledCache, FormulaEngine, VectorEvaluator, interpret_quads, numpy
+from scanner import JSScanner
+
+# Патологические входы для сканера: функция от размера в символах -> текст
+ADVERSARIAL_INPUTS = {
+    'кавычки подряд': lambda n: '"' * n,
+    'незакрытые кавычки в строках': lambda n: '"x\n' * (n // 3),
+    'чередование кавычек': lambda n: '"\'' * (n // 2),
+    'длинная незакрытая строка': lambda n: '"' + 'x' * (n - 1),
+    'длинное число': lambda n: '1' * n,
+    'цифры и буквы': lambda n: '1a' * (n // 2),
+    'числа с точками': lambda n: '1.' * (n // 2),
+    'инкременты': lambda n: '++1' * (n // 3),
+    'недопустимые символы': lambda n: '@' * n,
+    'символы Unicode': lambda n: 'я' * n,
+    'префиксы ключевых слов': lambda n: 'functio ' * (n // 8),
+    'незакрытые скобки': lambda n: '(' * n,
+    'несогласованные скобки': lambda n: '{)' * (n // 2),
+}
+
+
+def best_time(func, repeat=3):
+    """Наименьшее время выполнения func из repeat запусков в секундах"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def growth_exponent(sizes, times):
+    """Показатель степени роста времени: 1 - линейный рост, 2 - квадратичный"""
+    return math.log(times[-1] / times[0]) / math.log(sizes[-1] / sizes[0])
+
+
+def run_adversarial(engine="dfa", size=100_000, steps=4, repeat=3, limit=1.3):
+    """Проверяет, что время разбора патологических входов растет линейно.
+
+    Каждый вход сканируется при размерах size, 2*size, ... 2**(steps-1)*size.
+    Возвращает True, если показатель роста всех входов не больше limit."""
+    scanner = JSScanner(engine)
+    sizes = [size * 2 ** step for step in range(steps)]
+    print(f"Движок: {engine}, размеры: {', '.join(map(str, sizes))}")
+
+    linear = True
+    for name, make_input in ADVERSARIAL_INPUTS.items():
+        times = []
+        for n in sizes:
+            text = make_input(n)
+            times.append(best_time(lambda: scanner.tokenize(text), repeat))
+        exponent = growth_exponent(sizes, times)
+        verdict = "линейно" if exponent <= limit else "НЕЛИНЕЙНО"
+        linear = linear and exponent <= limit
+        print(f"{name:32} {' '.join(f'{t:8.4f}' for t in times)}  рост n^{exponent:.2f}  {verdict}")
+    return linear
+
+
+# Объявления с ошибкой, после которой лексема для восстановления не находится
+# до конца потока: без таблиц следующих вхождений разбор квадратичен
+RECOVERY_INPUTS = {
+    'строка вместо числа': 'let a = { "k": "v" };\n',
+    'пропущено двоеточие': 'let a = { "k" "v" };\n',
+    'нет закрывающей скобки': 'let a = { "k": 1 ;\n',
+}
+
+
+def run_recovery(count=2000, steps=3, repeat=3, limit=1.3):
+    """Проверяет, что время разбора файлов с ошибками в каждом объявлении
+    растет линейно с числом объявлений count, 2*count, ..."""
+    scanner = JSScanner()
+    parser = JSParser()
+    parser.debug_mode = False
+    counts = [count * 2 ** step for step in range(steps)]
+    print(f"Число объявлений: {', '.join(map(str, counts))}")
+
+    linear = True
+    for name, statement in RECOVERY_INPUTS.items():
+        times = []
+        for n in counts:
+            tokens = scanner.tokenize(statement * n)
+            times.append(best_time(lambda: parser.parse_tokens(tokens), repeat))
+        exponent = growth_exponent(counts, times)
+        verdict = "линейно" if exponent <= limit else "НЕЛИНЕЙНО"
+        linear = linear and exponent <= limit
+        print(f"{name:32} {' '.join(f'{t:8.4f}' for t in times)}  рост n^{exponent:.2f}  {verdict}")
+    return linear
+
+
+# Арифметические выражения: функция от числа операций -> текст
+EXPRESSION_INPUTS = {
+    'цепочка сложений': lambda n: 'a+' * n + 'a',
+    'чередование приоритетов': lambda n: 'a+b*' * (n // 2) + 'c',
+    'унарные минусы': lambda n: '-' * n + 'a',
+    'вложенные скобки': lambda n: '(a+' * n + 'b' + ')' * n,
+}
+
+
+def run_expressions(size=125_000, steps=4, repeat=1, limit=1.3):
+    """Проверяет, что время формирования тетрад растет линейно с числом
+    операций выражения size, 2*size, ... (по умолчанию до 10^6 операций).
+    
+    Для каждого входа сообщается также, разбирает ли его рекурсивный спуск:
+    длинные цепочки операций и глубокие скобки превышают глубину рекурсии"""
+    sizes = [size * 2 ** step for step in range(steps)]
+    print(f"Число операций: {', '.join(map(str, sizes))}")
+
+    linear = True
+    for name, make_input in EXPRESSION_INPUTS.items():
+        times = []
+        for n in sizes:
+            text = make_input(n)
+            parser = ExpressionParser()
+            times.append(best_time(lambda: parser.parse(text), repeat))
+            if parser.errors:
+                print(f"{name}: {parser.errors[0]}")
+                return False
+        exponent = growth_exponent(sizes, times)
+        verdict = "линейно" if exponent <= limit else "НЕЛИНЕЙНО"
+        linear = linear and exponent <= limit
+        _, errors = ExpressionParser("recursive").parse(make_input(sizes[0]))
+        recursive = "рекурсивный спуск: ошибка" if errors else "рекурсивный спуск: разобрано"
+        print(f"{name:26} {' '.join(f'{t:8.4f}' for t in times)}  рост n^{exponent:.2f}  {verdict}  {recursive}")
+    return linear
+
+
+# Выражение для бенчмарков вычисления тетрад
+BENCHMARK_EXPRESSION = "(a + b) * (a - c) / -b + a * a * c - (b + c) * (a + c)"
+
+
+def run_vector(rows=10_000_000, repeat=3):
+    """Сравнивает векторное вычисление тетрад целиком и блоками"""
+    if numpy is None:
+        print("Для бенчмарка нужен пакет numpy")
+        return False
+    parser = ExpressionParser()
+    quads, _ = parser.parse(BENCHMARK_EXPRESSION)
+    evaluator = VectorEvaluator(quads, parser.result)
+    rng = numpy.random.default_rng(1)
+    columns = {name: rng.uniform(1, 2, rows) for name in evaluator.inputs}
+    out = numpy.empty(rows)
+    print(f"Выражение: {BENCHMARK_EXPRESSION}")
+    print(f"Тетрад: {len(quads)}, буферов: {evaluator.buffer_count}, строк: {rows}")
+    for name, block_rows in (("целиком", None), ("блоками", VectorEvaluator.BLOCK_ROWS)):
+        elapsed = best_time(lambda: evaluator.evaluate(columns, out, block_rows), repeat)
+        print(f"{name:8} {elapsed:8.4f} с  {rows / elapsed / 1e6:8.2f} млн строк/с")
+    return True
+
+
+def run_compiled(rows=100_000, repeat=3):
+    """Сравнивает вычисление выражения по строкам интерпретатором тетрад
+    и функцией, скомпилированной из тетрад"""
+    parser = ExpressionParser()
+    quads, _ = parser.parse(BENCHMARK_EXPRESSION)
+    cache = CompiledCache()
+    expression = cache.get(BENCHMARK_EXPRESSION)
+    rng = random.Random(1)
+    table = [{name: rng.uniform(1, 2) for name in expression.inputs} for _ in range(rows)]
+    print(f"Выражение: {BENCHMARK_EXPRESSION}")
+    print(f"Тетрад: {len(quads)}, строк: {rows}")
+
+    def interpreted():
+        for bindings in table:
+            interpret_quads(quads, bindings, parser.result)
+
+    def compiled():
+        # Выражение берется из кэша по тексту для каждой строки
+        for bindings in table:
+            cache.get(BENCHMARK_EXPRESSION).evaluate(bindings)
+
+    function = expression.function
+    tuples = [tuple(bindings[name] for name in expression.inputs) for bindings in table]
+
+    def compiled_tuples():
+        for values in tuples:
+            function(*values)
+
+    baseline = None
+    for name, func in (("интерпретатор", interpreted), ("компиляция, словари", compiled),
+                       ("компиляция, кортежи", compiled_tuples)):
+        elapsed = best_time(func, repeat)
+        baseline = baseline or elapsed
+        print(f"{name:22} {elapsed:8.4f} с  {rows / elapsed / 1e6:6.2f} млн строк/с  x{baseline / elapsed:.2f}")
+
+
+def run_formulas(count=10_000, variables=1000, updates=1000, repeat=3):
+    """Сравнивает пересчет всех формул после изменения одной переменной
+    с инкрементальным пересчетом FormulaEngine"""
+    rng = random.Random(1)
+    names = [f"x{index}" for index in range(variables)]
+    # Разные переменные в каждой формуле: знаменатель не обращается в ноль
+    texts = ["{} * {} + {} / ({} - {})".format(*rng.sample(names, 5)) for _ in range(count)]
+    engine = FormulaEngine()
+    for index, text in enumerate(texts):
+        engine.add_formula(f"f{index}", text)
+    bindings = {name: rng.uniform(1, 2) for name in names}
+    engine.update(bindings)
+    cache = CompiledCache()
+    expressions = [cache.get(text) for text in texts]
+    changes = [(rng.choice(names), rng.uniform(1, 2)) for _ in range(updates)]
+    print(f"Формул: {count}, переменных: {variables}, изменений: {updates}")
+
+    def full():
+        for name, value in changes:
+            bindings[name] = value
+            for expression in expressions:
+                expression.evaluate(bindings)
+
+    def incremental():
+        for name, value in changes:
+            engine.set(name, value)
+
+    baseline = None
+    for title, func in (("полный пересчет", full), ("инкрементальный", incremental)):
+        elapsed = best_time(func, repeat)
+        baseline = baseline or elapsed
+        print(f"{title:18} {elapsed:8.4f} с  {elapsed / updates * 1e6:10.1f} мкс/изменение  x{baseline / elapsed:.2f}")
+
+
+def identifier_heavy_text(size, keyword_share=0.3, seed=1):
+    """Текст из объявлений с большим числом идентификаторов и ключевых слов"""
+    rng = random.Random(seed)
+    names = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz_') for _ in range(rng.randint(1, 12)))
+             for _ in range(500)]
+    keywords = JSScanner.KEYWORDS
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(keywords) if rng.random() < keyword_share else rng.choice(names)
+        separator = rng.choice((' ', ' = ', ', ', ';\n', ': '))
+        words.append(word + separator)
+        length += len(word) + len(separator)
+    return ''.join(words)
+
+
+def run_keywords(size=1_000_000, repeat=5):
+    """Сравнивает пропускную способность движков на тексте из идентификаторов"""
+    text = identifier_heavy_text(size)
+    baseline = None
+    print(f"Текст: {len(text)} символов")
+    for engine in JSScanner.ENGINES:
+        scanner = JSScanner(engine)
+        count = len(scanner.tokenize(text))
+        elapsed = best_time(lambda: scanner.tokenize(text), repeat)
+        baseline = baseline or elapsed
+        print(f"{engine:8} {elapsed:8.4f} с  {count / elapsed / 1e6:6.2f} млн лексем/с  "
+              f"x{baseline / elapsed:.2f}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Бенчмарки сканера и анализаторов")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    adversarial = commands.add_parser('adversarial',
+                                      help="время разбора патологических входов сканером")
+    adversarial.add_argument('--engine', choices=JSScanner.ENGINES, default="dfa",
+                             help="движок сканера")
+    adversarial.add_argument('--size', type=int, default=100_000,
+                             help="наименьший размер входа в символах")
+    adversarial.add_argument('--steps', type=int, default=4,
+                             help="число удвоений размера входа")
+    adversarial.add_argument('--limit', type=float, default=1.3,
+                             help="наибольший допустимый показатель роста времени")
+    keywords = commands.add_parser('keywords',
+                                   help="пропускная способность движков на тексте из идентификаторов")
+    keywords.add_argument('--size', type=int, default=1_000_000,
+                          help="размер текста в символах")
+    recovery = commands.add_parser('recovery',
+                                   help="время разбора файлов с ошибкой в каждом объявлении")
+    recovery.add_argument('--count', type=int, default=2000,
+                          help="наименьшее число объявлений")
+    recovery.add_argument('--steps', type=int, default=3,
+                          help="число удвоений числа объявлений")
+    recovery.add_argument('--limit', type=float, default=1.3,
+                          help="наибольший допустимый показатель роста времени")
+    expressions = commands.add_parser('expressions',
+                                      help="время формирования тетрад длинных выражений")
+    expressions.add_argument('--size', type=int, default=125_000,
+                             help="наименьшее число операций в выражении")
+    expressions.add_argument('--steps', type=int, default=4,
+                             help="число удвоений числа операций")
+    expressions.add_argument('--limit', type=float, default=1.3,
+                             help="наибольший допустимый показатель роста времени")
+    vector = commands.add_parser('vector',
+                                 help="векторное вычисление тетрад над столбцами NumPy")
+    vector.add_argument('--rows', type=int, default=10_000_000,
+                        help="число строк")
+    compiled = commands.add_parser('compiled',
+                                   help="вычисление выражения по строкам: интерпретатор и компиляция")
+    compiled.add_argument('--rows', type=int, default=100_000,
+                          help="число строк")
+    formulas = commands.add_parser('formulas',
+                                   help="инкрементальный пересчет формул при изменении переменной")
+    formulas.add_argument('--count', type=int, default=10_000,
+                          help="число формул")
+    formulas.add_argument('--updates', type=int, default=1000,
+                          help="число изменений переменных")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'adversarial':
+        ok = run_adversarial(args.engine, args.size, args.steps, limit=args.limit)
+        return 0 if ok else 1
+    if args.command == 'keywords':
+        run_keywords(args.size)
+    if args.command == 'recovery':
+        ok = run_recovery(args.count, args.steps, limit=args.limit)
+        return 0 if ok else 1
+    if args.command == 'vector':
+        return 0 if run_vector(args.rows) else 1
+    if args.command == 'compiled':
+        run_compiled(args.rows)
+    if args.command == 'formulas':
+        run_formulas(args.count, updates=args.updates)
+    if args.command == 'expressions':
+        ok = run_expressions(args.size, args.steps, limit=args.limit)
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import re
+
+
+class _CharClasses(dict):
+    """Отображение символа в класс символов для str.translate.
+
+    Классы ASCII-символов заполняются заранее, остальные символы
+    классифицируются при первой встрече теми же проверками \\d, \\w и \\s,
+    что и в регулярных выражениях сканера."""
+
+    def __init__(self, ascii_classes, udigit, uword, space, other):
+        super().__init__((code, chr(cls)) for code, cls in enumerate(ascii_classes))
+        self.udigit = chr(udigit)
+        self.uword = chr(uword)
+        self.space = chr(space)
+        self.other = chr(other)
+
+    def __missing__(self, code):
+        char = chr(code)
+        if re.match(r'\d', char):
+            cls = self.udigit
+        elif re.match(r'\w', char):
+            cls = self.uword
+        elif re.match(r'\s', char):
+            cls = self.space
+        else:
+            cls = self.other
+        self[code] = cls
+        return cls
+
+
+class DFAEngine:
+    """Табличный детерминированный автомат для лексем JSScanner.
+
+    Распознает те же классы лексем, что и регулярное выражение сканера,
+    но за один проход по тексту: переход автомата выбирается по таблице
+    [состояние][класс символа], а лексема определяется по правилу самого
+    длинного совпадения. Каждая буква ключевых слов образует свой класс
+    символов, поэтому ключевые слова распознаются тем же автоматом, что
+    и идентификаторы (префиксное дерево внутри состояний идентификатора).
+
+    Время разбора линейно при любом входе: все состояния, кроме начальных,
+    либо допускающие, либо (тело строки) не имеют переходов в тупик. Поэтому
+    после остановки автомата последнее допущенное совпадение заканчивается
+    на текущем символе, и разбор никогда не возвращается назад по тексту.
+    Это свойство проверяется при построении таблицы.
+    """
+
+    DEAD = -1
+
+    def __init__(self, keywords):
+        self.keywords = frozenset(keywords)
+        self._build_classes()
+        self._build_table()
+
+    def _build_classes(self):
+        """Разбивает символы на классы"""
+        self.class_names = []
+
+        def new_class(name):
+            self.class_names.append(name)
+            return len(self.class_names) - 1
+
+        # Каждый символ ключевых слов - отдельный класс
+        keyword_chars = sorted({char for keyword in self.keywords for char in keyword})
+        self.char_class = {char: new_class(char) for char in keyword_chars}
+
+        self.LETTER = new_class('LETTER')      # [a-zA-Z_] вне ключевых слов
+        self.DIGIT = new_class('DIGIT')        # [0-9] вне ключевых слов
+        self.UDIGIT = new_class('UDIGIT')      # Прочие цифры \d
+        self.UWORD = new_class('UWORD')        # Прочие символы \w
+        self.NEWLINE = new_class('NEWLINE')    # \n
+        self.SPACE = new_class('SPACE')        # Прочие пробельные символы \s
+        self.OTHER = new_class('OTHER')        # Недопустимые символы
+        punctuation = {}
+        for char in '"\'.+-*/={}()[]:,;':
+            punctuation[char] = new_class(char)
+
+        ascii_classes = []
+        for code in range(128):
+            char = chr(code)
+            if char in self.char_class:
+                cls = self.char_class[char]
+            elif char in punctuation:
+                cls = punctuation[char]
+            elif char.isascii() and (char.isalpha() or char == '_'):
+                cls = self.LETTER
+            elif char.isdigit():
+                cls = self.DIGIT
+            elif char == '\n':
+                cls = self.NEWLINE
+            elif re.match(r'\s', char):
+                cls = self.SPACE
+            else:
+                cls = self.OTHER
+            ascii_classes.append(cls)
+
+        self.letter_classes = {cls for code, cls in enumerate(ascii_classes)
+                               if chr(code).isalpha() or chr(code) == '_'}
+        self.digit_classes = {cls for code, cls in enumerate(ascii_classes) if chr(code).isdigit()}
+        self.punctuation = punctuation
+        self.classes = _CharClasses(ascii_classes, self.UDIGIT, self.UWORD, self.SPACE, self.OTHER)
+        self.word_classes = self.letter_classes | self.digit_classes | {self.UDIGIT, self.UWORD}
+
+    def _build_table(self):
+        """Строит таблицу переходов"""
+        class_count = len(self.class_names)
+        self.table = []       # Переходы: состояние -> [класс символа] -> состояние
+        self.accept = []      # Вид лексемы в допускающем состоянии
+        self.eof_accept = []  # Вид лексемы, если текст закончился в этом состоянии
+
+        def new_state(accept=None, eof_accept=None):
+            self.table.append([self.DEAD] * class_count)
+            self.accept.append(accept)
+            self.eof_accept.append(eof_accept if eof_accept is not None else accept)
+            return len(self.table) - 1
+
+        def link(state, classes, target):
+            for cls in classes:
+                self.table[state][cls] = target
+
+        word_chars = self.letter_classes | self.digit_classes
+        p = self.punctuation
+
+        # Два начальных состояния: ключевое слово должно начинаться на границе слова
+        self.start = new_state()
+        self.start_after_word = new_state()
+
+        identifier = new_state('IDENTIFIER')
+        link(identifier, word_chars, identifier)
+
+        # Префиксное дерево ключевых слов внутри идентификатора
+        prefixes = {keyword[:i] for keyword in self.keywords for i in range(1, len(keyword) + 1)}
+        trie = {}
+        for prefix in sorted(prefixes, key=len):
+            trie[prefix] = new_state('KEYWORD' if prefix in self.keywords else 'IDENTIFIER')
+        link(self.start, self.letter_classes, identifier)
+        link(self.start_after_word, self.letter_classes, identifier)
+        for prefix, state in trie.items():
+            link(state, word_chars, identifier)
+            if len(prefix) == 1:
+                link(self.start, [self.char_class[prefix]], state)
+            else:
+                link(trie[prefix[:-1]], [self.char_class[prefix[-1]]], state)
+
+        # Числа: \d+(\.\d*)?
+        number = new_state('NUMBER')
+        fraction = new_state('NUMBER')
+        digits = self.digit_classes | {self.UDIGIT}
+        for start in (self.start, self.start_after_word):
+            link(start, digits, number)
+        link(number, digits, number)
+        link(number, [p['.']], fraction)
+        link(fraction, digits, fraction)
+
+        # Строки и незакрытые строки
+        for quote, invalid in (('"', 'INVALID_STRING_DOUBLE'), ("'", 'INVALID_STRING_SINGLE')):
+            body = new_state(eof_accept=invalid)
+            closed = new_state('STRING')
+            broken = new_state(invalid)
+            link(body, range(class_count), body)
+            link(body, [p[quote]], closed)
+            link(body, [self.NEWLINE], broken)
+            for start in (self.start, self.start_after_word):
+                link(start, [p[quote]], body)
+
+        # Пробельные символы
+        whitespace = new_state('WHITESPACE')
+        link(whitespace, [self.SPACE, self.NEWLINE], whitespace)
+
+        # Односимвольные лексемы
+        single = [
+            ('+-*/', 'OPERATOR'), ('=', 'ASSIGNMENT'),
+            ('{', 'LBRACE'), ('}', 'RBRACE'), ('(', 'LPAREN'), (')', 'RPAREN'),
+            ('[', 'LBRACKET'), (']', 'RBRACKET'),
+            (':', 'COLON'), (',', 'COMMA'), (';', 'SEMICOLON'), ('.', 'ERROR'),
+        ]
+        for chars, kind in single:
+            state = new_state(kind)
+            for start in (self.start, self.start_after_word):
+                link(start, [p[char] for char in chars], state)
+        error = new_state('ERROR')
+        for start in (self.start, self.start_after_word):
+            link(start, [self.SPACE, self.NEWLINE], whitespace)
+            link(start, [self.OTHER], error)
+
+        # Плоская таблица: индекс = состояние * число классов + класс
+        self.class_count = class_count
+        self.flat_table = [target for row in self.table for target in row]
+        self._check_linear()
+
+    def _check_linear(self):
+        """Проверяет, что разбор не возвращается назад по тексту"""
+        for state, row in enumerate(self.table):
+            if state in (self.start, self.start_after_word) or self.accept[state] is not None:
+                continue
+            if self.DEAD in row or self.eof_accept[state] is None:
+                raise ValueError(f"Недопускающее состояние {state} может остановить автомат")
+
+    def matches(self, text, pos=0):
+        """Выдает лексемы текста начиная с pos в виде (вид, начало, конец)"""
+        classes = text.translate(self.classes)
+        length = len(classes)
+        table = self.flat_table
+        width = self.class_count
+        accept = self.accept
+        word_classes = self.word_classes
+
+        while pos < length:
+            # Граница слова перед лексемой нужна для ключевых слов
+            if pos > 0 and ord(classes[pos - 1]) in word_classes:
+                state = self.start_after_word
+            else:
+                state = self.start
+
+            kind = None
+            end = pos
+            index = pos
+            while index < length:
+                state = table[state * width + ord(classes[index])]
+                if state < 0:
+                    break
+                index += 1
+                if accept[state] is not None:
+                    kind = accept[state]
+                    end = index
+            else:
+                if self.eof_accept[state] is not None:
+                    kind = self.eof_accept[state]
+                    end = length
+
+            if kind is None:
+                # Символ не начинает ни одной лексемы
+                pos += 1
+                continue
+
+            # Ключевое слово должно заканчиваться на границе слова
+            if kind == 'KEYWORD' and end < length and ord(classes[end]) in word_classes:
+                kind = 'IDENTIFIER'
+
+            yield kind, pos, end
+            pos = end
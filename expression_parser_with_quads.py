@@ -1,4 +1,8 @@
+import re
+from array import array
+
 from scanner import JSScanner, Token
+from tracing import Tracer
 
 class Quad:
     def __init__(self, op, arg1, arg2, result):
@@ -10,27 +14,171 @@ class Quad:
     def __repr__(self):
         return f"({self.op}, {self.arg1}, {self.arg2}, {self.result})"
 
+
+class Temp(str):
+    """Имя временной переменной тетрад (t1, t2, ...).
+
+    Выглядит как строка tN, но не равна идентификатору с тем же текстом,
+    поэтому словари и множества имен в вычислителях и оптимизаторе тетрад
+    различают временную переменную t1 и переменную выражения t1. Хэш -
+    хэш строки: совпадение с идентификатором стоит лишь одного сравнения."""
+    
+    __slots__ = ()
+    
+    def __eq__(self, other):
+        return isinstance(other, Temp) and str.__eq__(self, other)
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    __hash__ = str.__hash__
+
+
+class QuadBuffer:
+    """Компактное поколоночное хранилище тетрад.
+    
+    Вместо объекта Quad на каждую тетраду хранит массив кодов операций и три
+    массива кодов аргументов и результата. Идентификаторы и пустой аргумент
+    "_" хранятся в таблице символов один раз, код - индекс в ней. Временная
+    переменная tN (объект Temp) хранится как код -N, и ее имя строится только
+    при обращении. Обычная строка, даже вида tN, - это идентификатор и попадает
+    в таблицу символов, поэтому идентификатор t1 и временная переменная t1
+    имеют разные коды.
+    Индексация и перебор возвращают объекты Quad, поэтому буфер можно
+    передавать туда, где ожидается список тетрад."""
+    
+    # Операции тетрад: код операции - индекс в кортеже
+    OPERATIONS = ('+', '-', '*', '/', 'uminus', '=')
+    OPERATION_CODES = {op: code for code, op in enumerate(OPERATIONS)}
+    
+    def __init__(self):
+        self.ops = array('B')
+        self.args1 = array('i')
+        self.args2 = array('i')
+        self.results = array('i')
+        self.symbols = ["_"]    # Код -> имя идентификатора
+        self.codes = {"_": 0}   # Имя идентификатора -> код
+    
+    @classmethod
+    def from_quads(cls, quads):
+        """Буфер с копией списка тетрад"""
+        buffer = cls()
+        for quad in quads:
+            buffer.add(quad.op, quad.arg1, quad.arg2, quad.result)
+        return buffer
+    
+    def intern(self, name):
+        """Код имени: -N для временной переменной tN, иначе индекс в таблице символов"""
+        if name.__class__ is Temp:
+            return -int(name[1:])
+        code = self.codes.get(name)
+        if code is not None:
+            return code
+        code = self.codes[name] = len(self.symbols)
+        self.symbols.append(name)
+        return code
+    
+    def symbol(self, code):
+        """Имя по коду"""
+        return self.symbols[code] if code >= 0 else Temp(f"t{-code}")
+    
+    def add(self, op, arg1, arg2, result):
+        """Добавляет тетраду и возвращает ее индекс. Аргументы и результат -
+        имена или уже полученные коды (int)"""
+        if op not in self.OPERATION_CODES:
+            raise ValueError(f"Неизвестная операция тетрады: {op}")
+        self.ops.append(self.OPERATION_CODES[op])
+        self.args1.append(arg1 if arg1.__class__ is int else self.intern(arg1))
+        self.args2.append(arg2 if arg2.__class__ is int else self.intern(arg2))
+        self.results.append(result if result.__class__ is int else self.intern(result))
+        return len(self.ops) - 1
+    
+    def quad(self, index):
+        """Возвращает тетраду с индексом index в виде объекта Quad"""
+        symbol = self.symbol
+        return Quad(self.OPERATIONS[self.ops[index]], symbol(self.args1[index]),
+                    symbol(self.args2[index]), symbol(self.results[index]))
+    
+    def nbytes(self):
+        """Размер массивов тетрад в байтах (без таблицы символов)"""
+        return sum(len(column) * column.itemsize
+                   for column in (self.ops, self.args1, self.args2, self.results))
+    
+    def __len__(self):
+        return len(self.ops)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.quad(i) for i in range(*index.indices(len(self.ops)))]
+        if index < 0:
+            index += len(self.ops)
+        if not 0 <= index < len(self.ops):
+            raise IndexError("индекс тетрады вне диапазона")
+        return self.quad(index)
+    
+    def __iter__(self):
+        operations = self.OPERATIONS
+        symbol = self.symbol
+        for op, arg1, arg2, result in zip(self.ops, self.args1, self.args2, self.results):
+            yield Quad(operations[op], symbol(arg1), symbol(arg2), symbol(result))
+
 class ExpressionParser:
     # Определим допустимые операторы и символы для арифметических выражений
     VALID_OPERATORS = ['+', '-', '*', '/']
     
-    def __init__(self):
+    # Приоритеты бинарных операций: операция с большим приоритетом выполняется раньше
+    PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2}
+    
+    # Типы лексем скобок сканера
+    LPAREN = "открывающая круглая скобка"
+    RPAREN = "закрывающая круглая скобка"
+    
+    # Операции, аргументы которых можно переставлять при поиске общих подвыражений
+    COMMUTATIVE = ('+', '*')
+    
+    # "stack" - разбор с явным стеком без рекурсии (по умолчанию),
+    # "recursive" - рекурсивный спуск по грамматике E, A, T, B, O
+    ENGINES = ("stack", "recursive")
+    
+    def __init__(self, engine="stack", cse=False, compact=False):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Неизвестный движок анализатора выражений: {engine}")
+        self.engine = engine
+        self.cse = cse  # Исключение общих подвыражений
+        # Тетрады в QuadBuffer: имена во время разбора заменяются кодами
+        # таблицы символов буфера, а временные переменные - числами
+        self.compact = compact
+        self.nodes = None  # (операция, аргумент 1, аргумент 2) -> результат при cse
+        self.operations = 0  # Число операций выражения
         self.scanner = JSScanner()
         self.tokens = []
         self.current = 0
         self.temp_counter = 1
         self.quads = []
+        self.result = None  # Имя значения выражения: результат последней операции или идентификатор
         self.errors = []
+        # Отладочный журнал лексем; чтобы видеть его в консоли, нужно включить
+        # уровень Tracer.TOKENS и подключить приемник sys.stdout
+        self.tracer = Tracer()
 
     def parse(self, text):
+        # Один анализатор можно использовать для нескольких выражений
+        self.errors = []
+        self.result = None
+        
         # Получаем все токены из сканера
         all_tokens = list(self.scanner.tokenize(text))
         
-        # Добавляем отладочный вывод токенов
-        print("=== Отладка токенов ===")
-        for i, token in enumerate(all_tokens):
-            print(f"{i}: Тип={token.type}, Значение='{token.value}', Строка={token.line}, Позиция={token.column}")
-        print("======================")
+        # Отладочный журнал токенов
+        trace_tokens = self.tracer.enabled(Tracer.TOKENS)
+        if trace_tokens:
+            self.tracer.clear()
+            self.trace("=== Отладка токенов ===")
+            for i, token in enumerate(all_tokens):
+                self.tracer.emit(Tracer.TOKENS, 'token', None, i,
+                                 "{0}: Тип={1}, Значение='{2}', Строка={3}, Позиция={4}",
+                                 i, token.type, token.value, token.line, token.column)
+            self.trace("======================")
         
         # Проверяем наличие чисел во входной строке - они не поддерживаются в этой грамматике
         has_numbers = False
@@ -78,14 +226,16 @@ class ExpressionParser:
                 
             self.tokens.append(token)
             
-        # Добавляем отладочный вывод обработанных токенов
-        print("=== Обработанные токены ===")
-        for i, token in enumerate(self.tokens):
-            print(f"{i}: Тип={token.type}, Значение='{token.value}'")
-        print("=== Ошибки ===")
-        for error in self.errors:
-            print(error)
-        print("========================")
+        # Отладочный журнал обработанных токенов
+        if trace_tokens:
+            self.trace("=== Обработанные токены ===")
+            for i, token in enumerate(self.tokens):
+                self.tracer.emit(Tracer.TOKENS, 'token', None, i, "{0}: Тип={1}, Значение='{2}'",
+                                 i, token.type, token.value)
+            self.trace("=== Ошибки ===")
+            for error in self.errors:
+                self.tracer.emit(Tracer.TOKENS, 'error', None, None, error)
+            self.trace("========================")
         
         # Если есть ошибки, сразу возвращаем их
         if self.errors:
@@ -93,16 +243,22 @@ class ExpressionParser:
             
         self.current = 0
         self.temp_counter = 1
-        self.quads = []
+        self.quads = QuadBuffer() if self.compact else []
+        self.nodes = {} if self.cse else None
+        self.operations = 0
 
         try:
-            result = self.E()
+            if self.engine == "recursive":
+                result = self.E()
+            else:
+                result = self.parse_stack()
             
             # Проверяем, что все токены были обработаны
             if not self.is_at_end():
                 token = self.peek()
                 self.error(f"Неожиданный символ '{token.value}' в конце выражения")
                 
+            self.result = self.quads.symbol(result) if self.compact else result
             return self.quads, self.errors
         except Exception as e:
             self.errors.append(str(e))
@@ -115,14 +271,10 @@ class ExpressionParser:
     def A(self, inh):
         if self.match("оператор", "+"):
             t2 = self.T()
-            temp = self.new_temp()
-            self.emit("+", inh, t2, temp)
-            return self.A(temp)
+            return self.A(self.make_node("+", inh, t2))
         elif self.match("оператор", "-"):
             t2 = self.T()
-            temp = self.new_temp()
-            self.emit("-", inh, t2, temp)
-            return self.A(temp)
+            return self.A(self.make_node("-", inh, t2))
         return inh
 
     def T(self):
@@ -132,32 +284,100 @@ class ExpressionParser:
     def B(self, inh):
         if self.match("оператор", "*"):
             t2 = self.O()
-            temp = self.new_temp()
-            self.emit("*", inh, t2, temp)
-            return self.B(temp)
+            return self.B(self.make_node("*", inh, t2))
         elif self.match("оператор", "/"):
             t2 = self.O()
-            temp = self.new_temp()
-            self.emit("/", inh, t2, temp)
-            return self.B(temp)
+            return self.B(self.make_node("/", inh, t2))
         return inh
 
     def O(self):
         if self.match("оператор", "-"):
-            t = self.O()
-            temp = self.new_temp()
-            self.emit("uminus", t, "_", temp)
-            return temp
+            return self.make_node("uminus", self.O(), "_")
         elif self.match("идентификатор"):
-            return self.previous().value
-        elif self.match("LPAREN"):
+            return self.operand(self.previous().value)
+        elif self.match(self.LPAREN):
             temp = self.E()
-            if not self.match("RPAREN"):
+            if not self.match(self.RPAREN):
                 self.error("Ожидалась закрывающая скобка ')'")
             return temp
         else:
             self.error("Ожидался идентификатор, унарный минус или скобка")
 
+    def parse_stack(self):
+        """Разбирает выражение E без рекурсии и возвращает имя его результата.
+        
+        Операции, ожидающие правый операнд, и открывающие скобки хранятся в
+        явном стеке (метод приоритетов), поэтому глубина вложенности и длина
+        цепочек операций не ограничены стеком вызовов, а время и память линейны
+        по длине выражения. Тетрады, временные переменные и ошибки совпадают
+        с рекурсивным спуском: бинарная операция выполняется, как только
+        встречена следующая операция не большего приоритета, а унарный минус -
+        сразу после своего операнда"""
+        tokens = self.tokens
+        count = len(tokens)
+        precedence = self.PRECEDENCE
+        operators = []  # Бинарные операции, "uminus" и "(" в порядке появления
+        operands = []   # Имена идентификаторов и временных переменных
+        depth = 0       # Число незакрытых скобок
+        index = 0
+        
+        while True:
+            # Операнд O: унарные минусы и открывающие скобки перед идентификатором
+            while True:
+                self.current = index
+                if index >= count:
+                    self.error("Ожидался идентификатор, унарный минус или скобка")
+                token = tokens[index]
+                index += 1
+                if token.type == "оператор" and token.value == "-":
+                    operators.append("uminus")
+                elif token.type == self.LPAREN:
+                    operators.append("(")
+                    depth += 1
+                elif token.type == "идентификатор":
+                    operands.append(self.operand(token.value))
+                    break
+                else:
+                    self.current = index - 1
+                    self.error("Ожидался идентификатор, унарный минус или скобка")
+            
+            # Унарные минусы перед завершенным операндом и закрывающие скобки
+            while True:
+                while operators and operators[-1] == "uminus":
+                    operators.pop()
+                    operands.append(self.make_node("uminus", operands.pop(), "_"))
+                if depth and index < count and tokens[index].type == self.RPAREN:
+                    self.reduce_operators(operators, operands, 0)
+                    operators.pop()
+                    depth -= 1
+                    index += 1
+                    continue
+                break
+            
+            self.current = index
+            token = tokens[index] if index < count else None
+            if token is not None and token.type == "оператор" and token.value in precedence:
+                # Выполняем предыдущие операции не меньшего приоритета (левая ассоциативность)
+                self.reduce_operators(operators, operands, precedence[token.value])
+                operators.append(token.value)
+                index += 1
+                continue
+            
+            if depth:
+                self.error("Ожидалась закрывающая скобка ')'")
+            self.reduce_operators(operators, operands, 0)
+            return operands.pop()
+    
+    def reduce_operators(self, operators, operands, level):
+        """Выполняет бинарные операции с вершины стека, пока их приоритет
+        не меньше level (level 0 - до открывающей скобки или дна стека)"""
+        precedence = self.PRECEDENCE
+        while operators and precedence.get(operators[-1], 0) >= level and operators[-1] != "(":
+            op = operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(self.make_node(op, left, right))
+
     def match(self, token_type, value=None):
         if self.check(token_type, value):
             self.advance()
@@ -189,12 +409,59 @@ class ExpressionParser:
         return self.tokens[self.current - 1]
 
     def new_temp(self):
-        temp = f"t{self.temp_counter}"
+        if self.compact:
+            temp = -self.temp_counter
+        else:
+            temp = Temp(f"t{self.temp_counter}")
         self.temp_counter += 1
         return temp
 
+    def operand(self, name):
+        # Идентификатор-операнд: в компактном режиме - код таблицы символов
+        return self.quads.intern(name) if self.compact else name
+
+    def make_node(self, op, arg1, arg2):
+        """Операция op над arg1 и arg2; возвращает имя ее результата.
+        
+        При исключении общих подвыражений (cse) тетрады образуют ориентированный
+        ациклический граф: узел ищется в словаре по ключу (операция, аргументы),
+        аргументы коммутативных операций упорядочиваются, и уже вычисленное
+        подвыражение не порождает новой тетрады"""
+        self.operations += 1
+        nodes = self.nodes
+        if nodes is None:
+            temp = self.new_temp()
+            self.emit(op, arg1, arg2, temp)
+            return temp
+        key = (op, arg2, arg1) if op in self.COMMUTATIVE and arg2 < arg1 else (op, arg1, arg2)
+        temp = nodes.get(key)
+        if temp is None:
+            temp = nodes[key] = self.new_temp()
+            self.emit(op, arg1, arg2, temp)
+        return temp
+    
+    def sharing_report(self):
+        """Отчет о совместном использовании подвыражений последнего разбора:
+        число операций выражения, число тетрад и сколько операций
+        вычисляются повторно используемыми тетрадами"""
+        operations = self.operations
+        quads = len(self.quads)
+        return {
+            'operations': operations,
+            'quads': quads,
+            'shared': operations - quads,
+            'ratio': operations / quads if quads else 1.0,
+        }
+
     def emit(self, op, arg1, arg2, result):
-        self.quads.append(Quad(op, arg1, arg2, result))
+        if self.compact:
+            self.quads.add(op, arg1, arg2, result)
+        else:
+            self.quads.append(Quad(op, arg1, arg2, result))
+
+    def trace(self, message):
+        # Строка отладочного журнала лексем
+        self.tracer.emit(Tracer.TOKENS, 'message', None, None, message)
 
     def error(self, message):
         if self.is_at_end():
@@ -0,0 +1,325 @@
+from bisect import bisect_right
+
+from incremental_scanner import IncrementalScanner
+from parser import JSParser, SyntaxError
+
+
+class Statement:
+    """Результат анализа одного объявления.
+
+    Позиции - пары (индекс строки, индекс лексемы в строке); лексемы ошибок
+    незакрытых скобок в конце потока находятся на строке с индексом, равным
+    числу строк документа. У объявлений после места правки индексы строк
+    отсчитываются от конца документа, поэтому не меняются при правках выше."""
+
+    __slots__ = ('start', 'end', 'read', 'reads_end', 'reach', 'lexical', 'errors')
+
+    def __init__(self, start, end, read, reads_end, lexical, errors):
+        self.start = start          # Позиция первой лексемы
+        self.end = end              # Позиция за последней разобранной лексемой
+        self.read = read            # Строка последней просмотренной лексемы
+        self.reads_end = reads_end  # Результат зависит от конца потока лексем
+        self.reach = read           # Наибольшая строка read этого и предыдущих объявлений
+        self.lexical = lexical      # Число лексических ошибок
+        self.errors = errors        # Число синтаксических ошибок
+
+
+class IncrementalParser:
+    """Инкрементальный синтаксический анализ документа по объявлениям.
+
+    Объявления `let ... = { ... };` грамматики JSParser независимы: после
+    каждого автомат возвращается в состояние START. Анализатор хранит
+    границы объявлений и их ошибки, а после правки заново разбирает только
+    объявления, которые просмотрели измененные строки (с учетом лексем,
+    просмотренных при восстановлении после ошибок), пока граница очередного
+    объявления не совпадет с прежней. Ошибки остальных объявлений
+    переносятся в результат без повторного анализа.
+
+    Объявления хранятся двумя стеками вокруг места последней правки, как
+    в буфере с разрывом: объявления после него хранят позиции относительно
+    конца документа, поэтому правки подряд в одном месте не требуют сдвига
+    позиций всех следующих объявлений.
+
+    Лексемы берутся построчно у инкрементального сканера lexer; правки
+    документа нужно передавать через replace_lines и set_text. Журнал
+    восстановления не ведется - для него есть JSParser с debug_mode.
+
+    Объявления, которые при восстановлении просмотрели поток до конца, и
+    лексемы незакрытых скобок в конце потока зависят от всего документа:
+    пока в нем есть незакрытые скобки, правка стоит линейного прохода по
+    границам объявлений (но не повторного анализа).
+    """
+
+    # Начальное число лексем в окне, по которому разбираются объявления
+    WINDOW = 256
+
+    def __init__(self, lexer=None):
+        self.lexer = lexer or IncrementalScanner()
+        self.parser = JSParser()
+        self.parser.debug_mode = False
+        self.reset()
+
+    def reset(self):
+        """Забывает результаты анализа: следующий анализ пройдет по всему документу"""
+        self.before = []          # Объявления до места правки по порядку
+        self.after = []           # Объявления после места правки в обратном порядке
+        self.before_lexical = []  # Ошибки объявлений before по порядку
+        self.before_errors = []
+        self.after_lexical = []   # Ошибки объявлений after в обратном порядке
+        self.after_errors = []
+        self.after_shift = 0      # Сдвиг номеров строк ошибок в after_lexical и after_errors
+        self.after_reads_end = 0  # Число объявлений в after, зависящих от конца потока
+        self.line_count = len(self.lexer.lines)  # Число строк при последнем анализе
+        self.dirty = (0, self.line_count)  # Измененные с последнего анализа строки [начало, конец)
+        self.shift = 0            # Изменение числа строк с последнего анализа
+        self.end_dirty = True     # Могли измениться лексемы незакрытых скобок в конце потока
+
+    def set_text(self, text):
+        """Заменяет весь текст документа"""
+        self.lexer.set_text(text)
+        self.reset()
+
+    def replace_lines(self, first, removed, new_lines):
+        """Заменяет removed строк начиная с first на new_lines (см. IncrementalScanner.replace_lines)"""
+        had_brackets = bool(self.lexer.final_brackets)
+        rescanned = self.lexer.replace_lines(first, removed, new_lines)
+        shift = len(new_lines) - removed
+        lo, hi = self.lexer.changed_lines
+
+        # Объединяем с областью прежних правок, переведенной в новую нумерацию строк
+        if self.dirty is not None:
+            old_lo, old_hi = self.dirty
+            lo = min(lo, old_lo)
+            hi = max(hi, old_hi + shift)
+        self.dirty = (lo, hi)
+        self.shift += shift
+        # Лексемы незакрытых скобок стоят в конце потока и ссылаются на строки скобок
+        self.end_dirty = self.end_dirty or had_brackets or bool(self.lexer.final_brackets)
+        return rescanned
+
+    def parse(self):
+        """Возвращает поток лексем и синтаксические ошибки, как JSParser.parse_tokens"""
+        return self.lexer.tokens(), self.syntax_errors()
+
+    def syntax_errors(self):
+        """Синтаксические ошибки документа в том же порядке, что и у JSParser:
+        сначала лексические ошибки, затем ошибки объявлений"""
+        self._update()
+        if self.after_shift:
+            self.after_lexical = self._shifted(self.after_lexical, self.after_shift)
+            self.after_errors = self._shifted(self.after_errors, self.after_shift)
+            self.after_shift = 0
+        return (self.before_lexical + self.after_lexical[::-1] +
+                self.before_errors + self.after_errors[::-1])
+
+    @staticmethod
+    def _shifted(errors, delta):
+        """Ошибки со сдвинутыми на delta номерами строк (новые объекты)"""
+        return [SyntaxError(error.message, error.line + delta, error.column, error.value)
+                for error in errors]
+
+    def _update(self):
+        """Разбирает заново объявления, затронутые правками с последнего анализа"""
+        if self.dirty is None:
+            return
+        lo, hi = self.dirty
+        old_hi = hi - self.shift
+        old_count = self.line_count
+
+        # Объявления после разрыва, которые не дошли до измененных строк, переносим в before
+        while self.after:
+            statement = self.after[-1]
+            if statement.reads_end or old_count - statement.read >= lo:
+                break
+            self._to_before(old_count)
+
+        # Объявления, просмотревшие измененные строки, разбираются заново,
+        # а целиком следующие за измененными строками переносятся в after
+        while self.before and self.before[-1].reach >= lo:
+            statement = self.before[-1]
+            if statement.start[0] >= old_hi:
+                self._to_after(old_count)
+            else:
+                self._drop(self.before, self.before_lexical, self.before_errors)
+        while self.after and old_count - self.after[-1].start[0] < old_hi:
+            self._drop_after()
+
+        self.after_shift += self.shift
+        self.line_count = len(self.lexer.lines)
+        self._reparse(self.before[-1].end if self.before else (0, 0))
+
+        self.dirty = None
+        self.shift = 0
+        self.end_dirty = False
+
+    def _reparse(self, position):
+        """Разбирает объявления начиная с позиции position, пока граница
+        объявления не совпадет с началом прежнего объявления из after"""
+        parser = self.parser
+        size = self.WINDOW
+        while True:
+            tokens, firsts, lines, bases, complete = self._window(position, size)
+            count = len(tokens)
+
+            def position_of(index):
+                k = bisect_right(firsts, index) - 1
+                return lines[k], index - bases[k]
+
+            index = 0
+            while index < count:
+                start = position_of(index)
+                # Прежние объявления, начинающиеся раньше, перекрыты новыми
+                while self.after and self._after_start() < start:
+                    self._drop_after()
+                if self.after and self._after_start() == start:
+                    if self.after[-1].reads_end and self.end_dirty:
+                        # Объявление зависит от измененного конца потока - разбираем заново
+                        self._drop_after()
+                    elif self.end_dirty:
+                        # Граница совпала с прежней, но конец потока изменился: пропускаем
+                        # объявления до первого, зависящего от конца потока, или до конца
+                        # документа, где могли появиться лексемы незакрытых скобок
+                        while self.after and not self.after[-1].reads_end:
+                            self._to_before(self.line_count)
+                        if self.after:
+                            self._drop_after()
+                        position = self.before[-1].end
+                        break
+                    else:
+                        # Граница совпала с прежней: дальше результаты не изменились
+                        return
+
+                parser.tokens = tokens
+                parser.syntax_errors = errors = []
+                parser.lookahead = index
+                end = parser.parse_statement(tokens, index)
+                if parser.lookahead >= count and not complete:
+                    # Объявлению не хватило окна - разбираем его заново в окне побольше
+                    position = start
+                    size *= 2
+                    break
+
+                parser.syntax_errors = lexical = []
+                parser.errors = []
+                for token in tokens[index:end]:
+                    if token.type == "ERROR":
+                        parser.add_lexical_error(token)
+
+                last_line, last_index = position_of(end - 1)
+                if parser.lookahead >= count:
+                    read, reads_end = last_line, True
+                else:
+                    read = position_of(parser.lookahead)[0]
+                    reads_end = read >= self.line_count
+                statement = Statement(start, (last_line, last_index + 1), read, reads_end,
+                                      len(lexical), len(errors))
+                self._push_before(statement, lexical, errors)
+                index = end
+            else:
+                if complete:
+                    # Конец документа: прежних объявлений после него нет
+                    while self.after:
+                        self._drop_after()
+                    return
+                # Окно разобрано целиком - продолжаем со следующей строки в окне побольше
+                position = (lines[-1] + 1, 0)
+                size *= 2
+
+    def _window(self, position, size):
+        """Лексемы документа начиная с позиции position, не меньше size штук
+        (или до конца документа).
+
+        Возвращает (лексемы, индексы первых лексем строк в окне, индексы строк,
+        смещения индексов лексем в строках, дошло ли окно до конца документа)"""
+        lexer = self.lexer
+        line_count = len(lexer.lines)
+        line, index = position
+        tokens = []
+        firsts = []
+        lines = []
+        bases = []
+        while line < line_count and len(tokens) < size:
+            line_tokens = lexer.line_tokens_at(line)
+            if index < len(line_tokens):
+                firsts.append(len(tokens))
+                lines.append(line)
+                bases.append(len(tokens) - index)
+                tokens.extend(line_tokens[index:] if index else line_tokens)
+            line += 1
+            index = 0
+
+        complete = line >= line_count
+        if complete and lexer.final_brackets:
+            # Лексемы ошибок незакрытых скобок, которые сканер добавляет в конец потока
+            tail = lexer.tokens()[-len(lexer.final_brackets):]
+            if position[0] == line_count:
+                index = position[1]
+            if index < len(tail):
+                firsts.append(len(tokens))
+                lines.append(line_count)
+                bases.append(len(tokens) - index)
+                tokens.extend(tail[index:])
+        return tokens, firsts, lines, bases, complete
+
+    def _after_start(self):
+        """Позиция начала ближайшего объявления из after"""
+        line, index = self.after[-1].start
+        return self.line_count - line, index
+
+    def _push_before(self, statement, lexical, errors):
+        statement.reach = statement.read
+        if self.before:
+            statement.reach = max(statement.reach, self.before[-1].reach)
+        if statement.reads_end:
+            statement.reach = float('inf')
+        self.before.append(statement)
+        self.before_lexical.extend(lexical)
+        self.before_errors.extend(errors)
+
+    @staticmethod
+    def _take(errors, count):
+        """Снимает count последних ошибок со стека errors"""
+        if not count:
+            return []
+        taken = errors[-count:]
+        del errors[-count:]
+        return taken
+
+    def _to_after(self, line_count):
+        """Переносит последнее объявление из before в after"""
+        statement = self.before.pop()
+        for errors, after in ((self._take(self.before_lexical, statement.lexical), self.after_lexical),
+                              (self._take(self.before_errors, statement.errors), self.after_errors)):
+            if self.after_shift:
+                errors = self._shifted(errors, -self.after_shift)
+            after.extend(reversed(errors))
+        statement.start = (line_count - statement.start[0], statement.start[1])
+        statement.end = (line_count - statement.end[0], statement.end[1])
+        statement.read = line_count - statement.read
+        self.after.append(statement)
+        self.after_reads_end += statement.reads_end
+
+    def _to_before(self, line_count):
+        """Переносит ближайшее объявление из after в before"""
+        statement = self.after.pop()
+        self.after_reads_end -= statement.reads_end
+        lexical = self._take(self.after_lexical, statement.lexical)[::-1]
+        errors = self._take(self.after_errors, statement.errors)[::-1]
+        if self.after_shift:
+            lexical = self._shifted(lexical, self.after_shift)
+            errors = self._shifted(errors, self.after_shift)
+        statement.start = (line_count - statement.start[0], statement.start[1])
+        statement.end = (line_count - statement.end[0], statement.end[1])
+        statement.read = line_count - statement.read
+        self._push_before(statement, lexical, errors)
+
+    def _drop(self, statements, lexical, errors):
+        """Удаляет последнее объявление стека statements вместе с его ошибками"""
+        statement = statements.pop()
+        self._take(lexical, statement.lexical)
+        self._take(errors, statement.errors)
+        return statement
+
+    def _drop_after(self):
+        statement = self._drop(self.after, self.after_lexical, self.after_errors)
+        self.after_reads_end -= statement.reads_end
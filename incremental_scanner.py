@@ -0,0 +1,281 @@
+from array import array
+
+from line_index import LineIndex
+from scanner import JSScanner, ScanState, Token
+
+
+class IncrementalScanner:
+    """Инкрементальный лексический анализатор документа.
+
+    Хранит лексемы по строкам и контрольную точку перед каждой строкой
+    (типы открытых скобок). Лексемы этого сканера не переходят через границу
+    строки: строковые литералы заканчиваются на переводе строки, а пробельные
+    символы пропускаются, поэтому начало строки всегда является началом лексемы
+    и состояние "внутри строки" в контрольной точке хранить не нужно.
+
+    При изменении документа строки сканируются заново начиная с первой
+    измененной, пока стек скобок после очередной строки не совпадет со старой
+    контрольной точкой - дальше поток лексем не меняется. Ошибки сканера
+    зависят только от типов открытых скобок, поэтому их и достаточно сравнивать.
+
+    Вместе с контрольными точками для каждой строки хранятся ее скобки с
+    глубиной стека и наименьшая глубина стека в строке. Они обновляются
+    только для пересканированных строк, и по ним парная скобка находится без
+    сборки потока лексем документа: строки, в которых глубина не опускается
+    ниже глубины скобки, пропускаются одним сравнением.
+    """
+
+    def __init__(self, scanner=None):
+        # В редактор вставляются произвольные тексты, поэтому по умолчанию
+        # используется движок с линейным временем разбора
+        self.scanner = scanner or JSScanner(engine="dfa")
+        self.lines = []        # Тексты строк без символа перевода строки
+        self.line_tokens = []  # Лексемы каждой строки
+        self.checkpoints = []  # Типы открытых скобок перед началом каждой строки
+        # Скобки каждой строки: (индекс лексемы в строке, глубина, открывающая,
+        # ошибка); глубина открывающей скобки - глубина стека после нее,
+        # закрывающей - до нее (0, если стек был пуст и скобка его не изменила)
+        self.line_brackets = []
+        self.low_points = []   # Наименьшая глубина стека скобок в каждой строке
+        self.final_brackets = ()  # Типы открытых скобок после последней строки
+        self.line_index = LineIndex()  # Индекс начал строк документа
+        self._tokens = None       # Поток лексем документа (до следующей правки)
+        self.pairs = array('i')   # Индекс парных скобок потока лексем
+        self.line_offsets = array('I')  # Индекс первой лексемы каждой строки в потоке
+        self.changed_lines = (0, 0)  # Строки, лексемы которых изменила последняя правка
+        self.set_text("")
+
+    def set_text(self, text):
+        """Полностью пересканирует документ"""
+        self.lines = []
+        self.line_tokens = []
+        self.checkpoints = []
+        self.line_brackets = []
+        self.low_points = []
+        self.final_brackets = ()
+        self.line_index = LineIndex()
+        self.replace_lines(0, 0, text.split('\n'))
+
+    def replace_lines(self, first, removed, new_lines):
+        """Заменяет removed строк начиная с first на new_lines и пересканирует
+        только затронутые строки. Возвращает число пересканированных строк.
+        
+        В changed_lines запоминается диапазон строк [начало, конец), лексемы
+        которых могли измениться: у пересканированных строк за пределами
+        измененной области лексемы часто остаются прежними (меняется только
+        стек скобок), и такие строки в конце диапазона в него не входят"""
+        old_count = len(self.lines)
+        shift = len(new_lines) - removed
+        changed_end = first + len(new_lines)  # Конец измененной области в новом документе
+
+        self.lines[first:first + removed] = new_lines
+        self.line_index.replace_lines(first, removed, new_lines)
+        self._tokens = None
+
+        # Стек скобок перед первой измененной строкой не изменился
+        stack = self.checkpoints[first] if first < old_count else self.final_brackets
+
+        tokens = []
+        checkpoints = []
+        line_brackets = []
+        low_points = []
+        index = first
+        old_index = old_count
+        changed_lines_end = changed_end
+        while index < len(self.lines):
+            checkpoints.append(stack)
+            depth = len(stack)
+            line_tokens, stack = self._scan_line(index, stack)
+            tokens.append(line_tokens)
+            brackets, low_point = self._bracket_profile(line_tokens, depth)
+            line_brackets.append(brackets)
+            low_points.append(low_point)
+            if index >= changed_end and not self._same_tokens(line_tokens, self.line_tokens[index - shift]):
+                changed_lines_end = index + 1
+            index += 1
+
+            # За пределами измененной области сверяемся со старой контрольной точкой
+            if index >= changed_end:
+                candidate = index - shift
+                if candidate < old_count and self.checkpoints[candidate] == stack:
+                    old_index = candidate
+                    break
+        else:
+            self.final_brackets = stack
+
+        self.line_tokens[first:old_index] = tokens
+        self.checkpoints[first:old_index] = checkpoints
+        self.line_brackets[first:old_index] = line_brackets
+        self.low_points[first:old_index] = low_points
+        self.changed_lines = (first, changed_lines_end)
+        return len(tokens)
+    
+    @staticmethod
+    def _same_tokens(tokens, old_tokens):
+        """Совпадают ли лексемы строки с прежними (без учета номера строки)"""
+        if len(tokens) != len(old_tokens):
+            return False
+        for token, old in zip(tokens, old_tokens):
+            if token.code != old.code or token.column != old.column or token.value != old.value:
+                return False
+        return True
+
+    @staticmethod
+    def _bracket_profile(tokens, depth):
+        """Скобки строки с глубиной стека и наименьшая глубина стека в строке,
+        если перед строкой открыто depth скобок. Разбор повторяет сканер:
+        закрывающая скобка снимает вершину непустого стека, даже если она
+        ошибочна"""
+        brackets = []
+        low_point = depth
+        for index, token in enumerate(tokens):
+            value = token.value
+            if value in ('{', '(', '[') and token.type != "ERROR":
+                depth += 1
+                brackets.append((index, depth, True, False))
+            elif value in ('}', ')', ']'):
+                brackets.append((index, depth, False, token.type == "ERROR"))
+                if depth:
+                    depth -= 1
+                    low_point = min(low_point, depth)
+        return tuple(brackets), low_point
+
+    def _scan_line(self, index, stack):
+        """Сканирует одну строку, начиная со стека скобок stack"""
+        text = self.lines[index]
+        if index < len(self.lines) - 1:
+            text += '\n'
+
+        state = ScanState(line=index + 1, brackets=[(bracket, None) for bracket in stack])
+        tokens = self.scanner.scan(text, state, [])
+
+        # Если строка не изменила стек скобок, используем прежний кортеж
+        brackets = tuple(bracket for bracket, _ in state.brackets)
+        if brackets == stack:
+            brackets = stack
+        return tokens, brackets
+
+    def tokens(self):
+        """Возвращает поток лексем всего документа, как JSScanner.tokenize.
+        
+        Поток и индекс парных скобок собираются один раз после каждой правки"""
+        if self._tokens is not None:
+            return self._tokens
+        
+        result = []
+        line_offsets = array('I')
+        for index, line_tokens in enumerate(self.line_tokens):
+            line_offsets.append(len(result))
+            if line_tokens and line_tokens[0].line != index + 1:
+                line_tokens = self.line_tokens_at(index)
+            result.extend(line_tokens)
+
+        # Незакрытые скобки в конце документа: контрольные точки хранят только
+        # типы скобок, поэтому сами открывающие лексемы находим повторным проходом,
+        # который заодно строит индекс парных скобок
+        pairs, openers = self.scanner.match_brackets(result)
+        self.scanner.close_brackets(ScanState(brackets=openers), result)
+        pairs.extend(array('i', [-1]) * len(openers))
+        
+        self._tokens = result
+        self.pairs = pairs
+        self.line_offsets = line_offsets
+        return result
+    
+    def line_tokens_at(self, index):
+        """Лексемы строки с индексом index (нумерация с 0) с верными номерами строк"""
+        line_tokens = self.line_tokens[index]
+        number = index + 1
+        # После вставки или удаления строк номера строк у лексем сдвигаются.
+        # Лексемы заменяются новыми, а не изменяются: выданные ранее потоки
+        # лексем (например, сохраненные в AnalysisCache) остаются верными
+        if line_tokens and line_tokens[0].line != number:
+            line_tokens = [Token(token.type, token.value, number, token.column, token.code)
+                           for token in line_tokens]
+            self.line_tokens[index] = line_tokens
+        return line_tokens
+    
+    def token_at(self, line, column):
+        """Индекс лексемы потока, занимающей позицию column в строке line, или -1"""
+        tokens = self.tokens()
+        if not 1 <= line <= len(self.line_offsets):
+            return -1
+        first = self.line_offsets[line - 1]
+        for index in range(first, first + len(self.line_tokens[line - 1])):
+            token = tokens[index]
+            if token.column > column:
+                break
+            if column < token.column + len(token.value):
+                return index
+        return -1
+    
+    def bracket_pair(self, line, column):
+        """Скобка, занимающая позицию column в строке line, и парная ей скобка
+        (лексемы) или None.
+
+        Поток лексем документа не собирается: парная скобка ищется по
+        скобкам строк и наименьшим глубинам стека, начиная со строки line"""
+        if not 1 <= line <= len(self.line_tokens):
+            return None
+        index = line - 1
+        line_tokens = self.line_tokens_at(index)
+        for position, (token_index, depth, opening, error) in enumerate(self.line_brackets[index]):
+            token = line_tokens[token_index]
+            if token.column <= column < token.column + len(token.value):
+                break
+        else:
+            return None
+        if not depth:
+            return None
+
+        brackets = self.line_brackets
+        if opening:
+            # Парная скобка - первая закрывающая скобка, снимающая уровень depth
+            candidates = brackets[index][position + 1:]
+            while True:
+                for token_index, bracket_depth, bracket_opening, bracket_error in candidates:
+                    if not bracket_opening and bracket_depth == depth:
+                        if bracket_error:
+                            return None
+                        return token, self.line_tokens_at(index)[token_index]
+                index += 1
+                # Строки, в которых глубина не опускается ниже depth, не снимают уровень depth
+                while index < len(brackets) and self.low_points[index] >= depth:
+                    index += 1
+                if index == len(brackets):
+                    return None  # Скобка не закрыта до конца документа
+                candidates = brackets[index]
+
+        if error:
+            return None
+        # Парная скобка - последняя открывающая скобка уровня depth перед закрывающей
+        candidates = brackets[index][:position]
+        while True:
+            for token_index, bracket_depth, bracket_opening, _ in reversed(candidates):
+                if bracket_opening and bracket_depth == depth:
+                    return token, self.line_tokens_at(index)[token_index]
+            index -= 1
+            # Открывающая скобка уровня depth возможна только в строке, где глубина
+            # опускается ниже depth (в том числе в ее начале)
+            while self.low_points[index] >= depth:
+                index -= 1
+            candidates = brackets[index]
+
+    def fold_ranges(self):
+        """Диапазоны строк (первая, последняя) многострочных блоков в скобках
+        для сворачивания и структуры документа"""
+        ranges = []
+        openers = []  # Строка и позиция открывающей скобки каждого уровня стека
+        for index, brackets in enumerate(self.line_brackets):
+            line_tokens = self.line_tokens[index]
+            for token_index, depth, opening, error in brackets:
+                if opening:
+                    del openers[depth - 1:]
+                    openers.append((index + 1, line_tokens[token_index].column))
+                elif depth:
+                    opener = openers[depth - 1]
+                    del openers[depth - 1:]
+                    if not error and opener[0] <= index:
+                        ranges.append((opener, index + 1))
+        ranges.sort()
+        return [(opener[0], last) for opener, last in ranges]
@@ -12,12 +12,9 @@ from PyQt6.QtGui import (
 from PyQt6.QtCore import Qt, QTranslator, QRect
 from ui_interf import Ui_MainWindow
 from simple_text_edit import CodeEditor
-from scanner import JSScanner
-from parser import JSParser
 import re
-from expression_parser_with_quads import ExpressionParser
 from regex_search_dialog import RegexSearchDialog
-from recursive_parser import RecursiveDescentParser
+from analysis_cache import AnalysisCache
 
 
 class LineNumberTextEdit(QPlainTextEdit):
@@ -285,13 +282,21 @@ class ResultTabWidget(QTabWidget):
                     doc = editor.document()
                     cursor = QTextCursor(doc)
                     
-                    # Перемещаемся к указанной строке
-                    block = doc.findBlockByLineNumber(line - 1)  # Нумерация строк начинается с 0
-                    if block.isValid():
+                    if hasattr(editor, "lexer"):
+                        # Позицию Qt находим по индексу строк без обхода блоков документа
+                        line_index = editor.lexer.line_index
+                        if not 1 <= line <= len(line_index):
+                            return
+                        cursor.setPosition(line_index.qt_position(line, position))
+                    else:
+                        # Перемещаемся к указанной строке
+                        block = doc.findBlockByLineNumber(line - 1)  # Нумерация строк начинается с 0
+                        if not block.isValid():
+                            return
                         cursor.setPosition(block.position() + position - 1)
-                        editor.setTextCursor(cursor)
-                        editor.centerCursor()  # Центрируем вид на курсоре
-                        editor.setFocus()  # Устанавливаем фокус на редактор
+                    editor.setTextCursor(cursor)
+                    editor.centerCursor()  # Центрируем вид на курсоре
+                    editor.setFocus()  # Устанавливаем фокус на редактор
         except (ValueError, TypeError) as e:
             print(f"Ошибка при навигации к ошибке: {e}")
 
@@ -378,6 +383,9 @@ class TextEditor(QMainWindow):
         self.current_file_paths = []
         self.unsaved_changes = []
         
+        # Кэш результатов анализа по содержимому документа, общий для всех команд анализа
+        self.analysis_cache = AnalysisCache()
+        
         # Инициализация переводчика для интернационализации
         self.translator = QTranslator()
         self.current_language = "ru"  # По умолчанию русский
@@ -517,6 +525,8 @@ class TextEditor(QMainWindow):
         new_editor.document().contentsChanged.connect(lambda: self.update_unsaved_status(new_editor))
         new_editor.cursorPositionChanged.connect(
             lambda: self.update_cursor_position(new_editor))
+        if hasattr(self, "live_syntax_action"):
+            new_editor.set_live_syntax(self.live_syntax_action.isChecked())
         
         # Создаем layout для редактора
         editor_layout = QVBoxLayout()
@@ -801,6 +811,13 @@ class TextEditor(QMainWindow):
         """)
         QMessageBox.information(self, "О программе", about_text)
 
+    def get_tokenizer(self, editor):
+        """Функция получения лексем документа для кэша анализа: лексемы
+        инкрементального сканера редактора, если он есть"""
+        if hasattr(editor, "lexer"):
+            return lambda text: editor.lexer.tokens()
+        return None
+
     def run_lexical_analysis(self):
         """Выполняет лексический анализ текущего открытого документа"""
         # Получаем текущий редактор
@@ -819,9 +836,7 @@ class TextEditor(QMainWindow):
             self.status_message_label.setText("Нет текста для анализа")
             return
         
-        # Инициализируем сканер и выполняем токенизацию
-        scanner = JSScanner()
-        tokens = scanner.tokenize(text)
+        tokens = self.analysis_cache.tokens(text, self.get_tokenizer(current_editor))
         
         # Разделяем токены на обычные и ошибки
         valid_tokens = []
@@ -908,11 +923,8 @@ class TextEditor(QMainWindow):
         self.result_tabs.clear_token_table()
         self.result_tabs.clear_error_table()
         
-        # Создаем парсер
-        parser = JSParser()
-        
-        # Выполняем анализ
-        tokens, syntax_errors = parser.parse(text)
+        # Выполняем анализ (или берем результат из кэша)
+        tokens, syntax_errors, recovery_logs = self.analysis_cache.syntax(text, self.get_tokenizer(editor))
         
         # Добавляем информацию в консоль
         self.add_console_message("Запуск синтаксического анализа")
@@ -942,7 +954,6 @@ class TextEditor(QMainWindow):
             )
             
         # Отображаем журнал восстановления после ошибок
-        recovery_logs = parser.get_recovery_logs()
         if recovery_logs:
             self.add_console_message("=== Журнал восстановления после ошибок (метод Айронса) ===")
             for log in recovery_logs:
@@ -1011,10 +1022,12 @@ class TextEditor(QMainWindow):
             self.lexer_tabs.clear_token_table()
             self.lexer_tabs.clear_error_table()
         
-        # Шаг 1: Лексический анализ
-        scanner = JSScanner()
-        tokens = scanner.tokenize(text)
+        # Лексический и синтаксический анализ выполняются один раз: оба окна
+        # используют один поток лексем из кэша
+        tokens, syntax_errors, recovery_logs = self.analysis_cache.syntax(
+            text, self.get_tokenizer(current_editor))
         
+        # Шаг 1: Лексический анализ
         # Заполняем таблицу токенов в окне лексического анализа
         for token in tokens:
             self.lexer_tabs.add_token_to_table(
@@ -1025,9 +1038,6 @@ class TextEditor(QMainWindow):
         self.lexer_results_window.show()
         
         # Шаг 2: Синтаксический анализ
-        parser = JSParser()
-        tokens, syntax_errors = parser.parse(text)
-        
         # Заполняем таблицу токенов в главном окне
         valid_tokens = [token for token in tokens if token.type != "ERROR"]
         if valid_tokens:
@@ -1073,7 +1083,6 @@ class TextEditor(QMainWindow):
             )
         
         # Отображаем журнал восстановления после ошибок
-        recovery_logs = parser.get_recovery_logs()
         if recovery_logs:
             self.add_console_message("\n=== Журнал восстановления после ошибок (метод Айронса) ===")
             for log in recovery_logs:
@@ -1117,8 +1126,7 @@ class TextEditor(QMainWindow):
 
         text = current_editor.toPlainText()
 
-        parser = ExpressionParser()
-        quads, errors = parser.parse(text)
+        quads, errors = self.analysis_cache.quads(text)
 
         self.result_tabs.clear_token_table()
         self.result_tabs.clear_error_table()
@@ -1156,8 +1164,7 @@ class TextEditor(QMainWindow):
             return
 
         text = editor.toPlainText()
-        parser = RecursiveDescentParser()
-        call_stack, errors, logs = parser.parse(text)
+        call_stack, errors, logs = self.analysis_cache.recursive(text)
 
         if not hasattr(self, 'recursive_tab'):
             from PyQt6.QtWidgets import QTextEdit
@@ -1220,6 +1227,19 @@ class TextEditor(QMainWindow):
 
         self.ui.menuRun.addAction(recursive_button)
         self.ui.toolBar.addAction(recursive_button)
+
+        # Проверка синтаксиса при вводе: после правки разбираются только затронутые объявления
+        self.live_syntax_action = QAction("Проверка синтаксиса при вводе", self)
+        self.live_syntax_action.setCheckable(True)
+        self.live_syntax_action.setToolTip("Подсвечивать синтаксические ошибки во время набора")
+        self.live_syntax_action.toggled.connect(self.set_live_syntax)
+        self.ui.menuRun.addSeparator()
+        self.ui.menuRun.addAction(self.live_syntax_action)
+
+    def set_live_syntax(self, enabled):
+        """Включает или выключает проверку синтаксиса при вводе во всех редакторах"""
+        for editor in self.findChildren(CodeEditor):
+            editor.set_live_syntax(enabled)
         
     
     def setup_toolbar_icons(self):
@@ -1490,13 +1510,19 @@ class TextEditor(QMainWindow):
         """Показывает диалог поиска по регулярным выражениям"""
         editor = self.get_current_editor()
         if editor:
-            self.regex_search_dialog.set_text(editor.toPlainText())
+            # Индекс строк поддерживается редактором при каждой правке
+            line_index = editor.lexer.line_index if hasattr(editor, "lexer") else None
+            self.regex_search_dialog.set_text(editor.toPlainText(), line_index)
             self.regex_search_dialog.exec()
     
     def highlight_match(self, start: int, end: int):
         """Выделяет найденное совпадение в тексте"""
         editor = self.get_current_editor()
         if editor:
+            # Смещения в тексте Python переводим в позиции Qt (единицы UTF-16)
+            if hasattr(editor, "lexer"):
+                start = editor.lexer.line_index.to_utf16(start)
+                end = editor.lexer.line_index.to_utf16(end)
             cursor = editor.textCursor()
             cursor.setPosition(start)
             cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
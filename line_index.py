@@ -0,0 +1,194 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+class LineIndex:
+    """Индекс начал строк текста для перевода смещений в (строка, позиция) и обратно.
+
+    Хранит смещения начал строк в массивах array, поэтому номер строки по
+    смещению находится двоичным поиском за O(log n), а смещение по номеру
+    строки - за O(1). Строки и позиции нумеруются с 1, как в лексемах сканера.
+
+    Смещения считаются в символах Python (кодовых точках). Позиции курсора Qt
+    считаются в единицах UTF-16, в которых символ вне базовой плоскости
+    Unicode (например, эмодзи) занимает две единицы, поэтому индекс хранит
+    также смещения таких символов и умеет считать позиции в единицах UTF-16.
+
+    При правке документа индекс обновляется построчно методом replace_lines,
+    как и IncrementalScanner. Смещения хранятся двумя массивами вокруг места
+    последней правки, как в буфере с разрывом (см. IncrementalParser): до
+    него - от начала текста, после него - от конца текста в обратном порядке.
+    Правка меняет только концы массивов у разрыва и не сдвигает смещения
+    следующих строк, поэтому правки подряд в одном месте стоят O(1) плюс
+    длина новых строк, а перенос разрыва - O(расстояние в строках).
+    """
+
+    # Символы, которые в UTF-16 кодируются суррогатной парой
+    ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+    def __init__(self, text=None):
+        # Смещения начал строк до разрыва (от начала текста, по возрастанию)
+        self.starts = array('Q')
+        # Строки после разрыва: end - смещение начала, от последней строки к разрыву
+        # (по возрастанию), где end = length + 1 - начало несуществующей строки за текстом
+        self.tail = array('Q')
+        # Смещения символов вне базовой плоскости до и после разрыва (так же)
+        self.astral = array('Q')
+        self.astral_tail = array('Q')
+        self.length = -1          # Длина текста (-1 - в индексе нет ни одной строки)
+        # Без текста индекс пуст - строки добавляются через replace_lines
+        if text is not None:
+            self.replace_lines(0, 0, text.split('\n'))
+
+    def __len__(self):
+        """Число строк"""
+        return len(self.starts) + len(self.tail)
+
+    def _move_gap(self, line):
+        """Переносит разрыв к началу строки line (нумерация с 0)"""
+        end = self.length + 1
+        starts, tail = self.starts, self.tail
+        if line < len(starts):
+            moved = starts[line:]
+            del starts[line:]
+            moved.reverse()
+            tail.extend(end - start for start in moved)
+        elif line > len(starts):
+            count = line - len(starts)
+            moved = tail[-count:]
+            del tail[-count:]
+            moved.reverse()
+            starts.extend(end - start for start in moved)
+
+    def _move_astral_gap(self, offset):
+        """Переносит разрыв смещений символов вне базовой плоскости к смещению offset"""
+        end = self.length + 1
+        astral, tail = self.astral, self.astral_tail
+        index = bisect_left(astral, offset)
+        if index < len(astral):
+            moved = astral[index:]
+            del astral[index:]
+            moved.reverse()
+            tail.extend(end - value for value in moved)
+        else:
+            # В tail по возрастанию end - смещение: смещения меньше offset - в конце
+            index = bisect_right(tail, end - offset)
+            if index < len(tail):
+                moved = tail[index:]
+                del tail[index:]
+                moved.reverse()
+                astral.extend(end - value for value in moved)
+
+    def replace_lines(self, first, removed, new_lines):
+        """Заменяет removed строк начиная с first (нумерация с 0) на new_lines"""
+        count = len(self)
+        if first < 0 or removed < 0 or first + removed > count:
+            raise ValueError(f"Недопустимый диапазон строк: {first}, {removed}")
+
+        self._move_gap(first)
+        end = self.length + 1
+        tail = self.tail
+        # Смещения начала заменяемых строк и начала строки после них
+        base = end - tail[-1] if tail else end
+        if removed:
+            del tail[-removed:]
+        old_end = end - tail[-1] if tail else end
+
+        self.starts.extend(accumulate((len(line) + 1 for line in new_lines[:-1]), initial=base)
+                           if new_lines else ())
+        new_end = base + sum(len(line) + 1 for line in new_lines)
+
+        # Символы вне базовой плоскости в заменяемых строках удаляются из начала хвоста
+        self._move_astral_gap(base)
+        astral_tail = self.astral_tail
+        kept = bisect_right(astral_tail, end - old_end)
+        del astral_tail[kept:]
+        start = base
+        for line in new_lines:
+            self.astral.extend(start + match.start() for match in self.ASTRAL.finditer(line))
+            start += len(line) + 1
+
+        # Хвосты хранят смещения от конца текста и не меняются
+        self.length += new_end - old_end
+
+    def line_of(self, offset):
+        """Номер строки, в которой находится смещение offset"""
+        tail = self.tail
+        if not tail or offset < self.length + 1 - tail[-1]:
+            return bisect_right(self.starts, offset)
+        # Строки хвоста, начало которых не больше offset
+        return len(self.starts) + len(tail) - bisect_left(tail, self.length + 1 - offset)
+
+    def line_start(self, line):
+        """Смещение начала строки line"""
+        index = line - 1
+        before = len(self.starts)
+        if index < before:
+            return self.starts[index]
+        return self.length + 1 - self.tail[len(self.tail) - 1 - (index - before)]
+
+    def line_end(self, line):
+        """Смещение конца строки line (ее символа перевода строки или конца текста)"""
+        if line < len(self):
+            return self.line_start(line + 1) - 1
+        return self.length
+
+    def _astral_before(self, offset):
+        """Число символов вне базовой плоскости до смещения offset"""
+        tail = self.astral_tail
+        count = bisect_left(self.astral, offset)
+        if tail:
+            count += len(tail) - bisect_right(tail, self.length + 1 - offset)
+        return count
+
+    def _astral_at(self, index):
+        """Смещение символа вне базовой плоскости с номером index"""
+        before = len(self.astral)
+        if index < before:
+            return self.astral[index]
+        return self.length + 1 - self.astral_tail[len(self.astral_tail) - 1 - (index - before)]
+
+    def line_column(self, offset, utf16=False):
+        """Переводит смещение в пару (строка, позиция).
+
+        Если utf16=True, позиция в строке считается в единицах UTF-16, как в Qt."""
+        line = self.line_of(offset)
+        start = self.line_start(line)
+        column = offset - start
+        if utf16:
+            column += self._astral_before(offset) - self._astral_before(start)
+        return line, column + 1
+
+    def offset(self, line, column, utf16=False):
+        """Переводит пару (строка, позиция) в смещение.
+
+        Если utf16=True, позиция в строке задана в единицах UTF-16, как в Qt."""
+        if not 1 <= line <= len(self):
+            raise ValueError(f"Недопустимый номер строки: {line}")
+        start = self.line_start(line)
+        units = column - 1
+        if not utf16:
+            return start + units
+
+        # Каждый символ вне базовой плоскости до искомой позиции занимает лишнюю единицу
+        skipped = 0
+        index = self._astral_before(start)
+        total = len(self.astral) + len(self.astral_tail)
+        end = self.line_end(line)
+        while index < total:
+            astral = self._astral_at(index)
+            if astral >= end or astral - start + skipped >= units:
+                break
+            skipped += 1
+            index += 1
+        return start + units - skipped
+
+    def to_utf16(self, offset):
+        """Переводит смещение в символах в позицию Qt в единицах UTF-16"""
+        return offset + self._astral_before(offset)
+
+    def qt_position(self, line, column):
+        """Позиция курсора Qt для лексемы или ошибки в строке line и позиции column"""
+        return self.to_utf16(self.offset(line, column))
@@ -1,5 +1,7 @@
 import re
+from array import array
 from scanner import JSScanner, Token
+from tracing import Tracer
 
 class SyntaxError:
     """Класс для представления синтаксической ошибки"""
@@ -10,6 +12,73 @@ class SyntaxError:
         self.column = column
         self.value = token_value
 
+
+def _starts_with_let(value):
+    """Идентификатор похож на ключевое слово 'let' (например, "letS")"""
+    return value.lower().startswith("let")
+
+
+_LETTER = re.compile(r'[a-zA-Z]')
+
+
+def _starts_with_letter(value):
+    """Идентификатор начинается с латинской буквы"""
+    return _LETTER.match(value) is not None
+
+
+def _starts_without_letter(value):
+    """Идентификатор начинается не с латинской буквы"""
+    return not _starts_with_letter(value)
+
+
+def _has_at_sign(value):
+    """Лексема-ошибка содержит символ '@'"""
+    return "@" in value
+
+
+class _Guard:
+    """Переход автомата, зависящий от значения лексемы.
+    
+    Если test(значение) истинно, выполняется действие then, иначе - otherwise.
+    Сообщения действия then могут содержать подстановку {value}."""
+    
+    __slots__ = ('test', 'then', 'otherwise')
+    
+    def __init__(self, test, then, otherwise):
+        self.test = test
+        self.then = then
+        self.otherwise = otherwise
+
+
+def _compile_table(states, terminals, grammar, state_errors, insertions, guards):
+    """Строит таблицу переходов автомата, индексируемую state * len(terminals) + terminal.
+
+    Элемент таблицы - номер следующего состояния (переход без ошибки),
+    действие (ошибка, запись журнала, следующее состояние, восстановление,
+    повторная обработка лексемы) или _Guard."""
+    width = len(terminals)
+    table = []
+    for state in range(len(states)):
+        error = state_errors.get(state)
+        if error is None:
+            # Состояние без обработки ошибок: лексема пропускается
+            default = state
+        else:
+            message, recovery = error
+            default = (message, None, states['ERROR'], recovery, False)
+        table.extend([default] * width)
+
+    for state, terminal, next_state in grammar:
+        table[state * width + terminal] = next_state
+    for (state, terminal), (message, log, next_state, reprocess) in insertions.items():
+        if message is None and state in state_errors:
+            message = state_errors[state][0]
+        table[state * width + terminal] = (message, log, next_state, None, reprocess)
+    for (state, terminal), (test, then) in guards.items():
+        table[state * width + terminal] = _Guard(test, then, table[state * width + terminal])
+    return tuple(table)
+
+
 class JSParser:
     """Синтаксический анализатор для JavaScript на основе конечного автомата
     
@@ -31,6 +100,11 @@ class JSParser:
     15. ‹I› → ' , '‹E3›
     16. ‹I› → ' } '‹End›
     17. ‹End› → ‹;›
+    
+    Грамматика скомпилирована в таблицу переходов TABLE, индексируемую
+    номером состояния и номером терминала (класса лексемы). Терминал
+    лексемы определяется по ее целочисленному коду, поэтому в основном
+    цикле нет сравнений строк типов лексем.
     """
     
     # Состояния конечного автомата
@@ -56,6 +130,182 @@ class JSParser:
     # Словарь для получения имени состояния по его коду
     STATE_NAMES = {v: k for k, v in STATES.items()}
     
+    # Терминалы грамматики: классы лексем, которые различает автомат.
+    # Буквы, цифры и символы строк (правила 3-4, 9-11, 14) распознает сканер,
+    # поэтому терминалами служат целые лексемы
+    TERMINALS = {
+        'LET': 0,        # Ключевое слово let
+        'KEYWORD': 1,    # Другое ключевое слово
+        'IDENTIFIER': 2, # Идентификатор
+        'ASSIGN': 3,     # Оператор присваивания =
+        'LBRACE': 4,     # Открывающая фигурная скобка {
+        'RBRACE': 5,     # Закрывающая фигурная скобка }
+        'STRING': 6,     # Строка в кавычках
+        'COLON': 7,      # Двоеточие :
+        'NUMBER': 8,     # Число
+        'COMMA': 9,      # Запятая ,
+        'SEMICOLON': 10, # Точка с запятой ;
+        'ERROR': 11,     # Лексическая ошибка
+        'OTHER': 12,     # Остальные лексемы
+    }
+    
+    # Терминал для каждого типа лексемы сканера
+    TERMINAL_TYPES = {
+        "ключевое слово": TERMINALS['KEYWORD'],
+        "идентификатор": TERMINALS['IDENTIFIER'],
+        "оператор присваивания": TERMINALS['ASSIGN'],
+        "открывающая фигурная скобка": TERMINALS['LBRACE'],
+        "закрывающая фигурная скобка": TERMINALS['RBRACE'],
+        "строка": TERMINALS['STRING'],
+        "двоеточие": TERMINALS['COLON'],
+        "число": TERMINALS['NUMBER'],
+        "запятая": TERMINALS['COMMA'],
+        "точка с запятой": TERMINALS['SEMICOLON'],
+        "ERROR": TERMINALS['ERROR'],
+    }
+    
+    # Переходы без ошибок: (состояние, терминал, следующее состояние)
+    GRAMMAR = (
+        (STATES['START'], TERMINALS['LET'], STATES['KEYWORD']),         # 1
+        (STATES['KEYWORD'], TERMINALS['IDENTIFIER'], STATES['ID']),     # 2-4
+        (STATES['ID'], TERMINALS['ASSIGN'], STATES['ASSIGN']),          # 5
+        (STATES['ASSIGN'], TERMINALS['LBRACE'], STATES['LBRACE']),      # 6
+        (STATES['LBRACE'], TERMINALS['STRING'], STATES['KEY']),         # 7, 9-11
+        (STATES['LBRACE'], TERMINALS['RBRACE'], STATES['RBRACE']),      # 8
+        (STATES['KEY'], TERMINALS['COLON'], STATES['COLON']),           # 12
+        (STATES['COLON'], TERMINALS['NUMBER'], STATES['VALUE']),        # 13-14
+        (STATES['VALUE'], TERMINALS['COMMA'], STATES['COMMA']),         # 15
+        (STATES['VALUE'], TERMINALS['RBRACE'], STATES['RBRACE']),       # 16
+        (STATES['COMMA'], TERMINALS['STRING'], STATES['KEY']),          # 15, 7
+        # Запятая после последнего элемента допустима
+        (STATES['COMMA'], TERMINALS['RBRACE'], STATES['RBRACE']),
+        # После точки с запятой готовы к новому объявлению
+        (STATES['RBRACE'], TERMINALS['SEMICOLON'], STATES['START']),    # 17
+    )
+    
+    # Ошибка в состоянии: (сообщение, восстановление методом Айронса).
+    # Восстановление - (имя метода, аргументы); если метод вернул False или
+    # восстановления нет, автомат переходит в состояние ERROR
+    STATE_ERRORS = {
+        STATES['START']: ("Ожидалось ключевое слово 'let'",
+                          ('recover_from_error', ("ключевое слово", "let"))),
+        STATES['KEYWORD']: ("Ожидался идентификатор после 'let'",
+                            ('recover_to_state', (STATES['ID'],))),
+        STATES['ID']: ("Ожидался оператор присваивания '='",
+                       ('recover_to_state', (STATES['ASSIGN'],))),
+        STATES['ASSIGN']: ("Ожидалась открывающая фигурная скобка '{'",
+                           ('recover_to_state', (STATES['LBRACE'],))),
+        STATES['LBRACE']: ("Ожидалась строка в кавычках или закрывающая фигурная скобка '}'",
+                           ('recover_to_next_key_or_brace', ())),
+        STATES['KEY']: ("Ожидалось двоеточие ':'",
+                        ('recover_to_state', (STATES['COLON'],))),
+        STATES['COLON']: ("Ожидалось числовое значение",
+                          ('recover_to_state', (STATES['VALUE'],))),
+        STATES['VALUE']: ("Ожидалась запятая ',' или закрывающая фигурная скобка '}'",
+                          ('recover_to_comma_or_brace', ())),
+        STATES['COMMA']: ("Ожидалась строка в кавычках (ключ)",
+                          ('recover_to_next_key_or_brace', ())),
+        STATES['RBRACE']: ("Ожидалась точка с запятой ';'", None),
+    }
+    
+    # Метод Айронса: вставка воображаемой лексемы или синхронизация по лексеме.
+    # (состояние, терминал) -> (сообщение об ошибке, запись журнала,
+    # следующее состояние, повторная обработка лексемы). Сообщение None -
+    # сообщение об ошибке состояния из STATE_ERRORS (в состоянии ERROR ошибки нет)
+    INSERTIONS = {
+        (STATES['KEYWORD'], TERMINALS['ASSIGN']): (
+            "Отсутствует идентификатор между 'let' и '='",
+            "Вставлен воображаемый идентификатор перед оператором присваивания", STATES['ASSIGN'], False),
+        (STATES['ID'], TERMINALS['LBRACE']): (
+            None, "Вставлен воображаемый оператор присваивания '='", STATES['LBRACE'], False),
+        (STATES['KEY'], TERMINALS['NUMBER']): (
+            None, "Вставлено воображаемое двоеточие ':'", STATES['VALUE'], False),
+        (STATES['COLON'], TERMINALS['COMMA']): (
+            None, "Вставлено воображаемое числовое значение", STATES['COMMA'], False),
+        (STATES['COLON'], TERMINALS['RBRACE']): (
+            None, "Вставлено воображаемое числовое значение перед закрывающей скобкой", STATES['RBRACE'], False),
+        # Отсутствует точка с запятой, но начинается новое объявление
+        (STATES['RBRACE'], TERMINALS['LET']): (
+            None, "Вставлена воображаемая точка с запятой ';'", STATES['START'], True),
+        # В состоянии ошибки пытаемся восстановиться и начать анализ заново
+        (STATES['ERROR'], TERMINALS['SEMICOLON']): (
+            None, "Восстановление: найдена точка с запятой", STATES['START'], False),
+        (STATES['ERROR'], TERMINALS['LET']): (
+            None, "Восстановление: найдено новое ключевое слово 'let'", STATES['START'], True),
+        (STATES['ERROR'], TERMINALS['RBRACE']): (
+            None, "Восстановление: найдена закрывающая фигурная скобка", STATES['RBRACE'], False),
+    }
+    
+    # Переходы, зависящие от значения лексемы: (состояние, терминал) ->
+    # (проверка значения, действие при успешной проверке). При неуспешной
+    # проверке выполняется обычный переход из таблицы
+    GUARDS = {
+        # Ошибка в ключевом слове, например "letS" вместо "let":
+        # считаем это ключевым словом 'let' и продолжаем
+        (STATES['START'], TERMINALS['IDENTIFIER']): (_starts_with_let, (
+            "Ошибка: '{value}' не является ключевым словом 'let'",
+            "Принято '{value}' как ключевое слово 'let'", STATES['KEYWORD'], None, False)),
+        # Идентификатор должен начинаться с буквы, иначе все равно принимаем его
+        (STATES['KEYWORD'], TERMINALS['IDENTIFIER']): (_starts_without_letter, (
+            "Идентификатор должен начинаться с буквы",
+            "Принят идентификатор '{value}', хотя он начинается неправильно", STATES['ID'], None, False)),
+        # Символ @ встроен в идентификатор: пропускаем его и продолжаем
+        (STATES['KEYWORD'], TERMINALS['ERROR']): (_has_at_sign, (
+            "Недопустимый символ '@' в идентификаторе",
+            "Пропускаем недопустимый идентификатор '{value}'", STATES['KEYWORD'], None, False)),
+    }
+    
+    TABLE = _compile_table(STATES, TERMINALS, GRAMMAR, STATE_ERRORS, INSERTIONS, GUARDS)
+    
+    # Ожидаемые токены для каждого состояния (нужны методу Айронса при восстановлении).
+    # В остальных состояниях список ожидаемых токенов не меняется
+    EXPECTED_TOKENS = {
+        STATES['START']: [("ключевое слово", "let")],
+        STATES['KEYWORD']: [("идентификатор", None)],
+        STATES['ID']: [("оператор присваивания", "=")],
+        STATES['ASSIGN']: [("открывающая фигурная скобка", "{")],
+        STATES['LBRACE']: [("строка", None), ("закрывающая фигурная скобка", "}")],
+        STATES['KEY']: [("двоеточие", ":")],
+        STATES['COLON']: [("число", None)],
+        STATES['VALUE']: [("запятая", ","), ("закрывающая фигурная скобка", "}")],
+        STATES['COMMA']: [("строка", None), ("закрывающая фигурная скобка", "}")],
+        STATES['RBRACE']: [("точка с запятой", ";")],
+    }
+    
+    # Цели восстановления recover_to_state: состояние -> варианты
+    # (тип искомой лексемы, состояние после нее) в порядке перебора
+    RECOVERY_TARGETS = {
+        STATES['ID']: (("идентификатор", STATES['ID']),),
+        STATES['ASSIGN']: (("оператор присваивания", STATES['ASSIGN']),
+                           ("открывающая фигурная скобка", STATES['LBRACE'])),
+        STATES['LBRACE']: (("открывающая фигурная скобка", STATES['LBRACE']),),
+        STATES['COLON']: (("двоеточие", STATES['COLON']), ("число", STATES['VALUE'])),
+        STATES['VALUE']: (("число", STATES['VALUE']), ("запятая", STATES['COMMA']),
+                          ("закрывающая фигурная скобка", STATES['RBRACE'])),
+    }
+    
+    # Ошибка о незавершенном объявлении в конце ввода для каждого состояния
+    END_ERRORS = {
+        STATES['START']: None,
+        STATES['KEYWORD']: "Незавершенное объявление: отсутствует идентификатор после 'let'",
+        STATES['ID']: "Незавершенное объявление: отсутствует оператор присваивания '='",
+        STATES['ASSIGN']: "Незавершенное объявление: отсутствует открывающая фигурная скобка '{'",
+        STATES['LBRACE']: "Незавершенный объект: отсутствует содержимое или закрывающая скобка '}'",
+        STATES['KEY']: "Незавершенное свойство: отсутствует двоеточие после ключа",
+        STATES['COLON']: "Незавершенное свойство: отсутствует значение после двоеточия",
+        STATES['VALUE']: "Незавершенный объект: отсутствует запятая или закрывающая скобка '}'",
+        STATES['COMMA']: "Незавершенный объект: отсутствует запятая или закрывающая скобка '}'",
+        STATES['RBRACE']: "Незавершенное объявление: отсутствует точка с запятой ';'",
+        STATES['ERROR']: None,
+    }
+    
+    # Сколько лексем после ошибки восстановление просматривает перебором; дальше
+    # лексемы ищутся по таблицам следующих вхождений (см. sync_table)
+    SCAN_LIMIT = 32
+    
+    # Шаблон записи журнала о состоянии автомата на очередной лексеме
+    STATE_LOG = "Состояние: {0}, Токен: {1} '{2}' на {3}:{4}"
+    
     def __init__(self):
         self.scanner = JSScanner()
         self.tokens = []
@@ -64,316 +314,261 @@ class JSParser:
         self.current_state = self.STATES['START']
         self.recovery_mode = False  # Флаг режима восстановления для метода Айронса
         self.expected_tokens = []   # Список ожидаемых токенов для текущего состояния
-        self.recovery_logs = []     # Журнал восстановления после ошибок
-        self.debug_mode = True      # Режим отладки для логирования
+        self.tracer = Tracer(Tracer.TOKENS)  # Журнал анализа и восстановления после ошибок
+        self.lookahead = 0          # Наибольший индекс просмотренной лексемы
+        self.errors = []            # Лексические ошибки
+        self.terminals = self.terminal_codes()  # Код лексемы -> терминал грамматики
+        self.sync_tokens = None     # Поток лексем, для которого построены таблицы вхождений
+        self.sync_positions = {}    # Тип лексемы -> индексы лексем этого типа
+        self.sync_tables = {}       # (тип, значение) -> таблица следующих вхождений
     
     def parse(self, text):
         """Анализирует JavaScript код и возвращает результат"""
-        # Инициализация сканера для получения токенов
-        self.scanner = JSScanner()
-        self.tokens = self.scanner.tokenize(text)
+        # Получаем токены сканером, созданным один раз в конструкторе
+        return self.parse_tokens(self.scanner.tokenize(text))
+    
+    def parse_tokens(self, tokens):
+        """Анализирует уже полученный поток лексем, не изменяя его"""
+        self.tokens = tokens
         self.errors = []  # Инициализируем список для лексических ошибок
-        
+    
         # Сбрасываем синтаксические ошибки и журнал восстановления перед анализом
         self.syntax_errors = []
-        self.recovery_logs = []
-        
+        self.tracer.clear()
+    
         # Проверяем на лексические ошибки из токенов
         for token in self.tokens:
             if token.type == "ERROR":
-                self.errors.append({
-                    'message': f"Лексическая ошибка: {token.value}",
-                    'line': token.line,
-                    'column': token.column
-                })
-                self.add_error(f"Лексическая ошибка: {token.value}", token.line, token.column)
-        
+                self.add_lexical_error(token)
+    
         # Анализируем токены на наличие объявлений ассоциативных массивов
         if self.tokens:
             # Анализируем все токены как один непрерывный поток
             self.analyze_assoc_array(self.tokens)
-        
+    
         # Возвращаем результаты анализа - два значения для распаковки
         return self.tokens, self.syntax_errors
     
+    def add_lexical_error(self, token):
+        """Добавляет ошибку для лексемы-ошибки сканера"""
+        self.errors.append({
+            'message': f"Лексическая ошибка: {token.value}",
+            'line': token.line,
+            'column': token.column
+        })
+        self.add_error(f"Лексическая ошибка: {token.value}", token.line, token.column)
+    
+    def terminal_codes(self):
+        """Терминал для каждого кода лексемы сканера"""
+        terminals = {}
+        for type_name, code in self.scanner.kinds:
+            terminal = self.TERMINAL_TYPES.get(type_name, self.TERMINALS['OTHER'])
+            if terminals.setdefault(code, terminal) != terminal:
+                raise ValueError(f"Код лексемы {code} соответствует разным терминалам")
+        return terminals
+    
     def analyze_assoc_array(self, tokens):
         """Анализирует объявление ассоциативного массива как конечный автомат
         с применением метода Айронса для нейтрализации ошибок"""
         self.current_state = self.STATES['START']
         self.current_token_index = 0
+        self.lookahead = 0
+        
+        # Объявления независимы: после каждого автомат возвращается в состояние START
+        index = 0
+        while index < len(tokens):
+            index = self.parse_statement(tokens, index)
+    
+    def parse_statement(self, tokens, start):
+        """Анализирует одно объявление, начиная с лексемы start в состоянии START.
         
-        while self.current_token_index < len(tokens):
-            current_token = tokens[self.current_token_index]
+        Возвращает индекс лексемы, с которой начинается следующее объявление
+        (автомат вернулся в состояние START), или len(tokens), если поток
+        закончился. В self.lookahead запоминается наибольший индекс
+        просмотренной лексемы; len(tokens) означает, что результат зависит
+        от конца потока"""
+        table = self.TABLE
+        width = len(self.TERMINALS)
+        terminals = self.terminals
+        other = self.TERMINALS['OTHER']
+        keyword = self.TERMINALS['KEYWORD']
+        let = self.TERMINALS['LET']
+        start_state = self.STATES['START']
+        expected_tokens = self.EXPECTED_TOKENS
+        state_names = self.STATE_NAMES
+        tracer = self.tracer
+        trace_tokens = tracer.enabled(Tracer.TOKENS)
+        
+        state = start_state
+        index = start
+        count = len(tokens)
+        
+        while index < count:
+            current_token = tokens[index]
+            examined = index
             
             # Определяем ожидаемые токены для текущего состояния
-            self.set_expected_tokens()
+            expected = expected_tokens.get(state)
+            if expected is not None:
+                self.expected_tokens = expected
             
             # Логируем текущее состояние для отладки
-            if self.debug_mode:
-                self.log_state(current_token)
+            if trace_tokens:
+                tracer.emit(Tracer.TOKENS, 'state', state, index, self.STATE_LOG,
+                            state_names.get(state, 'НЕИЗВЕСТНО'), current_token.type,
+                            current_token.value, current_token.line, current_token.column)
             
-            if self.current_state == self.STATES['START']:
-                # Ожидаем ключевое слово 'let'
-                if current_token.type == "ключевое слово" and current_token.value == "let":
-                    self.current_state = self.STATES['KEYWORD']
-                else:
-                    # Обрабатываем случай, когда вместо ключевого слова 'let' идет идентификатор или другое
-                    if current_token.type == "идентификатор" and current_token.value.lower().startswith("let"):
-                        # Ошибка в ключевом слове, например "letS" вместо "let"
-                        self.add_error(f"Ошибка: '{current_token.value}' не является ключевым словом 'let'", 
-                                    current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: считаем это ключевым словом 'let' и продолжаем
-                        self.log_recovery(f"Принято '{current_token.value}' как ключевое слово 'let'")
-                        self.current_state = self.STATES['KEYWORD']
-                    else:
-                        # Не начинает строку с ключевого слова 'let' или подобного идентификатора
-                        self.add_error("Ожидалось ключевое слово 'let'", 
-                                    current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: пропускаем токен, ищем ближайшее 'let'
-                        if not self.recover_from_error("ключевое слово", "let"):
-                            self.current_state = self.STATES['ERROR']
+            terminal = terminals.get(current_token.code, other)
+            if terminal == keyword and current_token.value == "let":
+                terminal = let
+            action = table[state * width + terminal]
             
-            elif self.current_state == self.STATES['KEYWORD']:
-                # После 'let' ожидаем идентификатор, начинающийся с буквы
-                if current_token.type == "идентификатор":
-                    # Проверяем, что идентификатор начинается с буквы
-                    if re.match(r'^[a-zA-Z]', current_token.value):
-                        self.current_state = self.STATES['ID']
-                    else:
-                        self.add_error("Идентификатор должен начинаться с буквы", 
-                                     current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: все равно принимаем идентификатор
-                        self.log_recovery(f"Принят идентификатор '{current_token.value}', хотя он начинается неправильно")
-                        self.current_state = self.STATES['ID']
+            if action.__class__ is _Guard:
+                value = current_token.value
+                if action.test(value):
+                    message, log, next_state, recovery, reprocess = action.then
+                    action = (message.format(value=value), log.format(value=value),
+                              next_state, recovery, reprocess)
                 else:
-                    # Проверяем особый случай, когда символ @ встроен в идентификатор
-                    if current_token.type == "ERROR" and "@" in current_token.value:
-                        self.add_error("Недопустимый символ '@' в идентификаторе", 
-                                    current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: пропускаем и продолжаем
-                        self.log_recovery(f"Пропускаем недопустимый идентификатор '{current_token.value}'")
-                        self.current_token_index += 1
-                        continue
-                    elif current_token.type == "оператор присваивания":
-                        # Отсутствует идентификатор между 'let' и '='
-                        self.add_error("Отсутствует идентификатор между 'let' и '='", 
-                                     current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: вставляем воображаемый идентификатор и продолжаем
-                        self.log_recovery("Вставлен воображаемый идентификатор перед оператором присваивания")
-                        self.current_state = self.STATES['ASSIGN']
-                    else:
-                        self.add_error("Ожидался идентификатор после 'let'", 
-                                     current_token.line, current_token.column, current_token.value)
-                        # Применение метода Айронса: ищем следующий токен присваивания или идентификатор
-                        if not self.recover_to_state(self.STATES['ID']):
-                            self.current_state = self.STATES['ERROR']
+                    action = action.otherwise
             
-            elif self.current_state == self.STATES['ID']:
-                # После идентификатора ожидаем оператор присваивания '='
-                if current_token.type == "оператор присваивания":
-                    self.current_state = self.STATES['ASSIGN']
-                else:
-                    self.add_error("Ожидался оператор присваивания '='", 
-                                 current_token.line, current_token.column, current_token.value)
-                    if current_token.type == "открывающая фигурная скобка":
-                        # Пропущен оператор присваивания, но есть открывающая скобка
-                        # Применение метода Айронса: вставляем воображаемый оператор '='
-                        self.log_recovery("Вставлен воображаемый оператор присваивания '='")
-                        self.current_state = self.STATES['LBRACE']
-                    else:
-                        # Применение метода Айронса: ищем следующую открывающую скобку
-                        if not self.recover_to_state(self.STATES['ASSIGN']):
-                            self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['ASSIGN']:
-                # После '=' ожидаем открывающую фигурную скобку '{'
-                if current_token.type == "открывающая фигурная скобка":
-                    self.current_state = self.STATES['LBRACE']
-                else:
-                    self.add_error("Ожидалась открывающая фигурная скобка '{'", 
-                                 current_token.line, current_token.column, current_token.value)
-                    # Применение метода Айронса: ищем открывающую скобку или восстанавливаемся
-                    if not self.recover_to_state(self.STATES['LBRACE']):
-                        self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['LBRACE']:
-                # После '{' ожидаем либо строку (открывающую кавычку), либо закрывающую скобку '}'
-                if current_token.type == "строка":
-                    self.current_state = self.STATES['KEY']
-                elif current_token.type == "закрывающая фигурная скобка":
-                    self.current_state = self.STATES['RBRACE']
-                else:
-                    self.add_error("Ожидалась строка в кавычках или закрывающая фигурная скобка '}'", 
-                                 current_token.line, current_token.column, current_token.value)
-                    # Применение метода Айронса: ищем строку или закрывающую скобку
-                    if not self.recover_to_next_key_or_brace():
-                        self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['KEY']:
-                # После ключа ожидаем двоеточие ':'
-                if current_token.type == "двоеточие":
-                    self.current_state = self.STATES['COLON']
-                else:
-                    self.add_error("Ожидалось двоеточие ':'", 
-                                 current_token.line, current_token.column, current_token.value)
-                    if current_token.type == "число":
-                        # Пропущено двоеточие, но есть числовое значение
-                        # Применение метода Айронса: вставляем воображаемое двоеточие
-                        self.log_recovery("Вставлено воображаемое двоеточие ':'")
-                        self.current_state = self.STATES['VALUE']
-                    else:
-                        # Применение метода Айронса: ищем числовое значение
-                        if not self.recover_to_state(self.STATES['COLON']):
-                            self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['COLON']:
-                # После ':' ожидаем числовое значение
-                if current_token.type == "число":
-                    self.current_state = self.STATES['VALUE']
-                else:
-                    self.add_error("Ожидалось числовое значение", 
-                                 current_token.line, current_token.column, current_token.value)
-                    if current_token.type == "запятая":
-                        # Пропущено значение, но есть запятая
-                        # Применение метода Айронса: вставляем воображаемое числовое значение
-                        self.log_recovery("Вставлено воображаемое числовое значение")
-                        self.current_state = self.STATES['COMMA']
-                    elif current_token.type == "закрывающая фигурная скобка":
-                        # Пропущено значение, но есть закрывающая скобка
-                        self.log_recovery("Вставлено воображаемое числовое значение перед закрывающей скобкой")
-                        self.current_state = self.STATES['RBRACE']
-                    else:
-                        # Применение метода Айронса: ищем запятую или закрывающую скобку
-                        if not self.recover_to_state(self.STATES['VALUE']):
-                            self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['VALUE']:
-                # После значения ожидаем либо запятую ',', либо закрывающую скобку '}'
-                if current_token.type == "запятая":
-                    self.current_state = self.STATES['COMMA']
-                elif current_token.type == "закрывающая фигурная скобка":
-                    self.current_state = self.STATES['RBRACE']
-                else:
-                    self.add_error("Ожидалась запятая ',' или закрывающая фигурная скобка '}'", 
-                                 current_token.line, current_token.column, current_token.value)
-                    # Применение метода Айронса: ищем запятую или закрывающую скобку
-                    if not self.recover_to_comma_or_brace():
-                        self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['COMMA']:
-                # После ',' ожидаем новую строку (начало ключа)
-                if current_token.type == "строка":
-                    self.current_state = self.STATES['KEY']
-                elif current_token.type == "закрывающая фигурная скобка":
-                    # Запятая после последнего элемента допустима
-                    self.current_state = self.STATES['RBRACE']
-                else:
-                    self.add_error("Ожидалась строка в кавычках (ключ)", 
-                                 current_token.line, current_token.column, current_token.value)
-                    # Применение метода Айронса: ищем строку или закрывающую скобку
-                    if not self.recover_to_next_key_or_brace():
-                        self.current_state = self.STATES['ERROR']
-            
-            elif self.current_state == self.STATES['RBRACE']:
-                # После '}' ожидаем точку с запятой ';'
-                if current_token.type == "точка с запятой":
-                    self.current_state = self.STATES['SEMICOLON']
-                    # После точки с запятой готовы к новому объявлению
-                    self.current_state = self.STATES['START']
-                else:
-                    self.add_error("Ожидалась точка с запятой ';'", 
-                                 current_token.line, current_token.column, current_token.value)
-                    if current_token.type == "ключевое слово" and current_token.value == "let":
-                        # Отсутствует точка с запятой, но начинается новое объявление
-                        # Применение метода Айронса: вставляем воображаемую точку с запятой
-                        self.log_recovery("Вставлена воображаемая точка с запятой ';'")
-                        self.current_state = self.STATES['START']
-                        continue  # Повторно обработаем current_token как начало нового объявления
-                    else:
-                        # Применение метода Айронса: продолжаем поиск следующего объявления
-                        self.current_state = self.STATES['ERROR']
+            if action.__class__ is int:
+                # Переход без ошибки
+                state = action
+                index += 1
+                if state == start_state:
+                    break
+                continue
             
-            elif self.current_state == self.STATES['ERROR']:
-                # В состоянии ошибки пытаемся восстановиться и начать анализ заново
-                if current_token.type == "точка с запятой":
-                    self.log_recovery("Восстановление: найдена точка с запятой")
-                    self.current_state = self.STATES['START']  # Возвращаемся в начальное состояние
-                elif current_token.type == "ключевое слово" and current_token.value == "let":
-                    # Нашли новое ключевое слово 'let', начинаем заново
-                    self.log_recovery("Восстановление: найдено новое ключевое слово 'let'")
-                    self.current_state = self.STATES['START']
-                    continue  # Повторно обработаем current_token как начало нового объявления
-                elif current_token.type == "закрывающая фигурная скобка":
-                    # Нашли закрывающую скобку, переходим к ожиданию точки с запятой
-                    self.log_recovery("Восстановление: найдена закрывающая фигурная скобка")
-                    self.current_state = self.STATES['RBRACE']
-            
-            # Переходим к следующему токену
-            self.current_token_index += 1
+            message, log, next_state, recovery, reprocess = action
+            if message is not None:
+                self.add_error(message, current_token.line, current_token.column, current_token.value)
+            if log is not None:
+                self.log_recovery(log)
+            if recovery is not None:
+                # Применение метода Айронса: пропускаем токены до ожидаемого
+                self.current_token_index = index
+                self.current_state = state
+                method, args = recovery
+                if not getattr(self, method)(*args):
+                    self.current_state = next_state
+                index = self.current_token_index
+                state = self.current_state
+            else:
+                state = next_state
             
+            # Переходим к следующему токену, если текущий не нужно обработать повторно
+            if not reprocess:
+                index += 1
+            if state == start_state:
+                break
+        
+        self.current_token_index = index
+        self.current_state = state
+        if index > start:
+            self.look_ahead(examined)
+        
         # Проверяем, что достигли конечного состояния или остались в состоянии ошибки
-        if self.current_state != self.STATES['START']:
+        if state != start_state:
+            self.look_ahead(count)
             last_token = tokens[-1] if tokens else None
             line = last_token.line if last_token else 1
             column = last_token.column + len(last_token.value) + 1 if last_token else 1
             
             # Добавляем ошибку о незавершенном объявлении в зависимости от состояния
-            if self.current_state == self.STATES['KEYWORD']:
-                self.add_error("Незавершенное объявление: отсутствует идентификатор после 'let'", line, column)
-            elif self.current_state == self.STATES['ID']:
-                self.add_error("Незавершенное объявление: отсутствует оператор присваивания '='", line, column)
-            elif self.current_state == self.STATES['ASSIGN']:
-                self.add_error("Незавершенное объявление: отсутствует открывающая фигурная скобка '{'", line, column)
-            elif self.current_state == self.STATES['LBRACE']:
-                self.add_error("Незавершенный объект: отсутствует содержимое или закрывающая скобка '}'", line, column)
-            elif self.current_state == self.STATES['KEY']:
-                self.add_error("Незавершенное свойство: отсутствует двоеточие после ключа", line, column)
-            elif self.current_state == self.STATES['COLON']:
-                self.add_error("Незавершенное свойство: отсутствует значение после двоеточия", line, column)
-            elif self.current_state == self.STATES['VALUE'] or self.current_state == self.STATES['COMMA']:
-                self.add_error("Незавершенный объект: отсутствует запятая или закрывающая скобка '}'", line, column)
-            elif self.current_state == self.STATES['RBRACE']:
-                self.add_error("Незавершенное объявление: отсутствует точка с запятой ';'", line, column)
-            elif self.current_state != self.STATES['ERROR']:
-                self.add_error("Неожиданный конец ввода", line, column)
+            message = self.END_ERRORS.get(state, "Неожиданный конец ввода")
+            if message is not None:
+                self.add_error(message, line, column)
+        return index
+    
+    @property
+    def debug_mode(self):
+        """Режим отладки: в журнал пишутся все события анализа"""
+        return self.tracer.enabled(Tracer.TOKENS)
+    
+    @debug_mode.setter
+    def debug_mode(self, enabled):
+        self.tracer.level = Tracer.TOKENS if enabled else Tracer.OFF
     
     def log_state(self, token):
         """Записывает текущее состояние в журнал для отладки"""
-        state_name = self.STATE_NAMES.get(self.current_state, "НЕИЗВЕСТНО")
-        self.recovery_logs.append(f"Состояние: {state_name}, Токен: {token.type} '{token.value}' на {token.line}:{token.column}")
+        self.tracer.emit(Tracer.TOKENS, 'state', self.current_state, self.current_token_index,
+                         self.STATE_LOG, self.STATE_NAMES.get(self.current_state, "НЕИЗВЕСТНО"),
+                         token.type, token.value, token.line, token.column)
     
-    def log_recovery(self, message):
-        """Записывает информацию о восстановлении после ошибки"""
-        if self.debug_mode:
-            self.recovery_logs.append(f"[Восстановление] {message}")
+    def log_recovery(self, message, *args, level=Tracer.STEPS):
+        """Записывает информацию о восстановлении после ошибки.
+        
+        Текст - message.format(*args); он собирается только при выводе журнала"""
+        self.tracer.emit(level, 'recovery', self.current_state, self.current_token_index, message, *args)
     
     def get_recovery_logs(self):
         """Возвращает журнал восстановления"""
-        return self.recovery_logs
+        return self.tracer.render()
     
     def set_expected_tokens(self):
         """Устанавливает список ожидаемых токенов для текущего состояния
         Это необходимо для метода Айронса при восстановлении после ошибок"""
-        if self.current_state == self.STATES['START']:
-            self.expected_tokens = [("ключевое слово", "let")]
-        elif self.current_state == self.STATES['KEYWORD']:
-            self.expected_tokens = [("идентификатор", None)]
-        elif self.current_state == self.STATES['ID']:
-            self.expected_tokens = [("оператор присваивания", "=")]
-        elif self.current_state == self.STATES['ASSIGN']:
-            self.expected_tokens = [("открывающая фигурная скобка", "{")]
-        elif self.current_state == self.STATES['LBRACE']:
-            self.expected_tokens = [("строка", None), ("закрывающая фигурная скобка", "}")]
-        elif self.current_state == self.STATES['KEY']:
-            self.expected_tokens = [("двоеточие", ":")]
-        elif self.current_state == self.STATES['COLON']:
-            self.expected_tokens = [("число", None)]
-        elif self.current_state == self.STATES['VALUE']:
-            self.expected_tokens = [("запятая", ","), ("закрывающая фигурная скобка", "}")]
-        elif self.current_state == self.STATES['COMMA']:
-            self.expected_tokens = [("строка", None), ("закрывающая фигурная скобка", "}")]
-        elif self.current_state == self.STATES['RBRACE']:
-            self.expected_tokens = [("точка с запятой", ";")]
+        expected = self.EXPECTED_TOKENS.get(self.current_state)
+        if expected is not None:
+            self.expected_tokens = expected
+
+    def look_ahead(self, index):
+        """Запоминает, что анализ просмотрел лексему с индексом index"""
+        if index > self.lookahead:
+            self.lookahead = index
+    
+    def find_token(self, start, expected):
+        """Индекс первой лексемы, начиная с start, которая подходит под одну из
+        пар (тип, значение) из expected (значение None - любое), или len(self.tokens).
+        
+        Ближайшие SCAN_LIMIT лексем просматриваются перебором: обычно лексема
+        для восстановления находится рядом. Дальше поиск - это обращение к
+        таблицам следующих вхождений, поэтому ошибки, после которых лексема
+        не находится до конца потока, не делают анализ квадратичным"""
+        tokens = self.tokens
+        count = len(tokens)
+        stop = min(start + self.SCAN_LIMIT, count)
+        for index in range(start, stop):
+            token = tokens[index]
+            for expected_type, expected_value in expected:
+                if token.type == expected_type and (expected_value is None or token.value == expected_value):
+                    return index
+        if stop == count:
+            return count
+        return min(self.sync_table(expected_type, expected_value)[stop]
+                   for expected_type, expected_value in expected)
+    
+    def sync_table(self, token_type, value=None):
+        """Таблица следующих вхождений лексемы: элемент i - индекс первой лексемы
+        типа token_type (и значения value, если оно задано) с индексом не меньше i,
+        или len(self.tokens).
+        
+        Таблицы строятся при первом обращении для текущего потока лексем: один
+        проход раскладывает индексы лексем по типам, а таблица заполняется
+        срезами между соседними вхождениями"""
+        tokens = self.tokens
+        if self.sync_tokens is not tokens:
+            self.sync_tokens = tokens
+            self.sync_tables = {}
+            self.sync_positions = positions = {}
+            for index, token in enumerate(tokens):
+                token_positions = positions.get(token.type)
+                if token_positions is None:
+                    positions[token.type] = token_positions = []
+                token_positions.append(index)
+        
+        table = self.sync_tables.get((token_type, value))
+        if table is None:
+            count = len(tokens)
+            table = array('i', [count]) * (count + 1)
+            previous = 0
+            for index in self.sync_positions.get(token_type, ()):
+                if value is None or tokens[index].value == value:
+                    table[previous:index + 1] = array('i', [index]) * (index + 1 - previous)
+                    previous = index + 1
+            self.sync_tables[(token_type, value)] = table
+        return table
     
     def recover_from_error(self, expected_type, expected_value=None):
         """Метод Айронса: восстанавливается после ошибки, пропуская токены
@@ -381,21 +576,27 @@ class JSParser:
         original_index = self.current_token_index
         self.current_token_index += 1  # Пропускаем текущий токен
         
-        self.log_recovery(f"Поиск токена типа {expected_type}" + 
-                         (f" со значением {expected_value}" if expected_value else ""))
+        if expected_value:
+            self.log_recovery("Поиск токена типа {0} со значением {1}", expected_type, expected_value)
+        else:
+            self.log_recovery("Поиск токена типа {0}", expected_type)
         
         # Ищем следующий токен указанного типа
-        while self.current_token_index < len(self.tokens):
-            token = self.tokens[self.current_token_index]
-            if token.type == expected_type and (expected_value is None or token.value == expected_value):
-                # Нашли подходящий токен
-                self.log_recovery(f"Успешное восстановление: найден токен типа {expected_type}" + 
-                                 (f" со значением {expected_value}" if expected_value else ""))
-                return True
-            self.current_token_index += 1
+        index = self.find_token(self.current_token_index, ((expected_type, expected_value),))
+        if index < len(self.tokens):
+            # Нашли подходящий токен
+            self.current_token_index = index
+            if expected_value:
+                self.log_recovery("Успешное восстановление: найден токен типа {0} со значением {1}",
+                                  expected_type, expected_value)
+            else:
+                self.log_recovery("Успешное восстановление: найден токен типа {0}", expected_type)
+            self.look_ahead(index)
+            return True
         
         # Не нашли подходящий токен, возвращаемся на позицию ошибки
         self.log_recovery("Восстановление не удалось: не найден ожидаемый токен")
+        self.look_ahead(len(self.tokens))  # Просмотрен весь поток до конца
         self.current_token_index = original_index
         return False
     
@@ -407,86 +608,21 @@ class JSParser:
         original_state = self.current_state
         
         target_state_name = self.STATE_NAMES.get(target_state, "НЕИЗВЕСТНО")
-        self.log_recovery(f"Попытка восстановления до состояния {target_state_name}")
+        self.log_recovery("Попытка восстановления до состояния {0}", target_state_name)
         
         # Помечаем, что мы в режиме восстановления
         self.recovery_mode = True
         
-        # Восстанавливаемся в зависимости от целевого состояния
-        if target_state == self.STATES['ID']:
-            # Ищем идентификатор или следующее 'let'
-            found = self.recover_from_error("идентификатор")
-            if found:
-                self.current_state = self.STATES['ID']
-                self.recovery_mode = False
-                return True
-        
-        elif target_state == self.STATES['ASSIGN']:
-            # Ищем оператор присваивания или открывающую скобку
-            found = self.recover_from_error("оператор присваивания")
-            if found:
-                self.current_state = self.STATES['ASSIGN']
-                self.recovery_mode = False
-                return True
-                
-            # Или ищем открывающую скобку
-            self.current_token_index = original_index
-            found = self.recover_from_error("открывающая фигурная скобка")
-            if found:
-                self.current_state = self.STATES['LBRACE']
-                self.recovery_mode = False
-                return True
-        
-        elif target_state == self.STATES['LBRACE']:
-            # Ищем открывающую скобку
-            found = self.recover_from_error("открывающая фигурная скобка")
-            if found:
-                self.current_state = self.STATES['LBRACE']
-                self.recovery_mode = False
-                return True
-        
-        elif target_state == self.STATES['COLON']:
-            # Ищем двоеточие или числовое значение
-            found = self.recover_from_error("двоеточие")
-            if found:
-                self.current_state = self.STATES['COLON']
-                self.recovery_mode = False
-                return True
-                
-            # Или ищем числовое значение
-            self.current_token_index = original_index
-            found = self.recover_from_error("число")
-            if found:
-                self.current_state = self.STATES['VALUE']
-                self.recovery_mode = False
-                return True
-        
-        elif target_state == self.STATES['VALUE']:
-            # Ищем числовое значение, запятую или закрывающую скобку
-            found = self.recover_from_error("число")
-            if found:
-                self.current_state = self.STATES['VALUE']
-                self.recovery_mode = False
-                return True
-                
-            # Или ищем запятую
-            self.current_token_index = original_index
-            found = self.recover_from_error("запятая")
-            if found:
-                self.current_state = self.STATES['COMMA']
-                self.recovery_mode = False
-                return True
-                
-            # Или ищем закрывающую скобку
+        # Ищем по очереди лексемы, после которых можно продолжить анализ
+        for expected_type, state in self.RECOVERY_TARGETS.get(target_state, ()):
             self.current_token_index = original_index
-            found = self.recover_from_error("закрывающая фигурная скобка")
-            if found:
-                self.current_state = self.STATES['RBRACE']
+            if self.recover_from_error(expected_type):
+                self.current_state = state
                 self.recovery_mode = False
                 return True
         
         # Не смогли восстановиться, возвращаемся в исходное состояние
-        self.log_recovery(f"Восстановление до состояния {target_state_name} не удалось")
+        self.log_recovery("Восстановление до состояния {0} не удалось", target_state_name)
         self.current_token_index = original_index
         self.current_state = original_state
         self.recovery_mode = False
@@ -499,20 +635,23 @@ class JSParser:
         
         self.log_recovery("Поиск следующего ключа (строки) или закрывающей скобки")
         
-        while self.current_token_index < len(self.tokens):
-            token = self.tokens[self.current_token_index]
+        index = self.find_token(self.current_token_index,
+                                (("строка", None), ("закрывающая фигурная скобка", None)))
+        if index < len(self.tokens):
+            token = self.tokens[index]
+            self.current_token_index = index
+            self.look_ahead(index)
             if token.type == "строка":
-                self.log_recovery(f"Найдена строка '{token.value}', переходим в состояние KEY")
+                self.log_recovery("Найдена строка '{0}', переходим в состояние KEY", token.value)
                 self.current_state = self.STATES['KEY']
-                return True
-            elif token.type == "закрывающая фигурная скобка":
+            else:
                 self.log_recovery("Найдена закрывающая скобка, переходим в состояние RBRACE")
                 self.current_state = self.STATES['RBRACE']
-                return True
-            self.current_token_index += 1
+            return True
         
         # Не нашли ни строку, ни закрывающую скобку
         self.log_recovery("Не найдено ни строки, ни закрывающей скобки")
+        self.look_ahead(len(self.tokens))  # Просмотрен весь поток до конца
         self.current_token_index = original_index
         return False
     
@@ -523,20 +662,22 @@ class JSParser:
         
         self.log_recovery("Поиск запятой или закрывающей скобки")
         
-        while self.current_token_index < len(self.tokens):
-            token = self.tokens[self.current_token_index]
-            if token.type == "запятая":
+        index = self.find_token(self.current_token_index,
+                                (("запятая", None), ("закрывающая фигурная скобка", None)))
+        if index < len(self.tokens):
+            self.current_token_index = index
+            self.look_ahead(index)
+            if self.tokens[index].type == "запятая":
                 self.log_recovery("Найдена запятая, переходим в состояние COMMA")
                 self.current_state = self.STATES['COMMA']
-                return True
-            elif token.type == "закрывающая фигурная скобка":
+            else:
                 self.log_recovery("Найдена закрывающая скобка, переходим в состояние RBRACE")
                 self.current_state = self.STATES['RBRACE']
-                return True
-            self.current_token_index += 1
+            return True
         
         # Не нашли ни запятую, ни закрывающую скобку
         self.log_recovery("Не найдено ни запятой, ни закрывающей скобки")
+        self.look_ahead(len(self.tokens))  # Просмотрен весь поток до конца
         self.current_token_index = original_index
         return False
     
@@ -546,6 +687,8 @@ class JSParser:
         self.syntax_errors.append(error)
         
         # Логируем ошибку
-        if self.debug_mode:
-            self.log_recovery(f"Ошибка: {message} на {line}:{column}" + 
-                             (f" ('{token_value}')" if token_value else "")) 
\ No newline at end of file
+        if token_value:
+            self.log_recovery("Ошибка: {0} на {1}:{2} ('{3}')", message, line, column, token_value,
+                              level=Tracer.ERRORS)
+        else:
+            self.log_recovery("Ошибка: {0} на {1}:{2}", message, line, column, level=Tracer.ERRORS)
\ No newline at end of file
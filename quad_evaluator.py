@@ -0,0 +1,602 @@
+"""Вычисление программ тетрад.
+
+VectorEvaluator выполняет список тетрад над столбцами NumPy: каждый
+идентификатор связывается со столбцом, а каждая тетрада - это один вызов
+ufunc с параметром out=, поэтому одно разобранное выражение применяется
+ко всем строкам за один проход по программе.
+
+Для вычисления по одной строке compile_quads превращает тетрады в функцию
+Python с локальными переменными вместо временных, а CompiledCache хранит
+такие функции для повторно вычисляемых выражений. interpret_quads - простой
+интерпретатор тетрад для сравнения. FormulaEngine хранит значения набора
+формул и при изменении переменной пересчитывает только зависящие от нее тетрады.
+
+Пример:
+    parser = ExpressionParser()
+    quads, errors = parser.parse("(a + b) * -c")
+    evaluator = VectorEvaluator(quads, parser.result)
+    values = evaluator.evaluate({'a': a, 'b': b, 'c': c})
+
+    expression = CompiledCache().get("(a + b) * -c")
+    value = expression.function(1.0, 2.0, 3.0)  # Аргументы - в порядке expression.inputs
+
+    engine = FormulaEngine()
+    engine.add_formula("total", "(a + b) * -c")
+    engine.update({'a': 1.0, 'b': 2.0, 'c': 3.0})  # Пересчитывается только затронутое
+"""
+import heapq
+import math
+import operator
+import re
+from collections import OrderedDict
+
+from expression_parser_with_quads import ExpressionParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Числовая константа в аргументе тетрады (в тетрадах, построенных вручную)
+NUMBER = re.compile(r'\d+(\.\d*)?')
+
+# Операции тетрад -> имена ufunc NumPy; "=" - копирование из QuadOptimizer
+UFUNCS = {
+    '+': 'add',
+    '-': 'subtract',
+    '*': 'multiply',
+    '/': 'true_divide',
+    'uminus': 'negative',
+    '=': 'positive',
+}
+
+# Виды аргументов шага программы
+COLUMN, BUFFER, CONSTANT = range(3)
+
+
+def plan_buffers(quads, result):
+    """Распределяет временные переменные по буферам с учетом интервалов жизни.
+
+    Возвращает (шаги, число буферов, аргумент результата). Шаг - кортеж
+    (операция, аргумент 1, аргумент 2 или None, номер буфера результата),
+    аргумент - тройка (вид, имя столбца, номер буфера или значение константы).
+    Буфер освобождается после последнего использования значения и может
+    сразу стать буфером результата той же тетрады: ufunc допускают out,
+    совпадающий со входом. Число буферов равно наибольшему числу
+    одновременно нужных значений, а не числу временных переменных."""
+    quads = list(quads)
+    if result is None:
+        if not quads:
+            raise ValueError("Не задан результат пустой программы тетрад")
+        result = quads[-1].result
+
+    # Последнее использование каждого значения (номер вычислившей его тетрады)
+    current = {}
+    last_use = {}
+    for index, quad in enumerate(quads):
+        for name in (quad.arg1, quad.arg2):
+            if name in current:
+                last_use[current[name]] = index
+        current[quad.result] = index
+    final = current.get(result)
+    if final is not None:
+        last_use[final] = len(quads)  # Результат нужен после программы
+
+    steps = []
+    slots = {}  # Имя -> буфер с текущим значением
+    free = []
+    count = 0
+    current = {}
+    for index, quad in enumerate(quads):
+        if quad.op not in UFUNCS:
+            raise ValueError(f"Неизвестная операция тетрады: {quad.op}")
+        unary = quad.op in ('uminus', '=')
+        operands = (quad.arg1,) if unary else (quad.arg1, quad.arg2)
+        args = [operand(name, slots) for name in operands]
+        for name in operands:
+            if name in slots and last_use.get(current[name]) == index:
+                free.append(slots.pop(name))
+                del current[name]
+
+        if free:
+            slot = free.pop()
+        else:
+            slot = count
+            count += 1
+        if quad.result in slots:
+            # Прежнее значение переменной больше не нужно
+            free.append(slots[quad.result])
+        if index in last_use:
+            slots[quad.result] = slot
+            current[quad.result] = index
+        else:
+            slots.pop(quad.result, None)
+            current.pop(quad.result, None)
+            free.append(slot)
+        steps.append((UFUNCS[quad.op], args[0], args[1] if not unary else None, slot))
+    return steps, count, operand(result, slots)
+
+
+def operand(name, slots):
+    """Аргумент шага программы: буфер временной переменной, константа или столбец"""
+    if name in slots:
+        return (BUFFER, None, slots[name])
+    if NUMBER.fullmatch(name):
+        return (CONSTANT, None, float(name))
+    return (COLUMN, name, None)
+
+
+class VectorEvaluator:
+    """Векторное вычисление программы тетрад над столбцами NumPy.
+
+    Программа планируется один раз в конструкторе. Временные переменные
+    хранятся в пуле буферов, размер которого - наибольшее число одновременно
+    нужных значений, поэтому пиковая память - несколько столбцов даже для
+    длинных выражений. При block_rows строки обрабатываются блоками:
+    буферы пула имеют размер блока и остаются в кэше процессора."""
+
+    # Число строк блока по умолчанию
+    BLOCK_ROWS = 1 << 16
+
+    def __init__(self, quads, result=None, dtype="float64"):
+        if numpy is None:
+            raise ImportError("Для векторного вычисления тетрад нужен пакет numpy")
+        self.steps, self.buffer_count, self.result = plan_buffers(quads, result)
+        self.dtype = numpy.dtype(dtype)
+        self.ufuncs = [getattr(numpy, name) for name, _, _, _ in self.steps]
+        # Имена переменных, которые нужно связать со столбцами
+        names = [arg[1] for _, arg1, arg2, _ in self.steps for arg in (arg1, arg2)
+                 if arg is not None and arg[0] == COLUMN]
+        if self.result[0] == COLUMN:
+            names.append(self.result[1])
+        self.inputs = sorted(set(names))
+
+    def evaluate(self, columns, out=None, block_rows=BLOCK_ROWS):
+        """Вычисляет выражение для всех строк столбцов columns (имя -> массив).
+
+        Возвращает массив значений; если задан out, результат записывается в него.
+        Промежуточные значения тоже пишутся в out, поэтому out не может
+        перекрываться со столбцами переменных (ValueError).
+        block_rows=None - все строки одним блоком"""
+        arrays = {}
+        for name in self.inputs:
+            if name not in columns:
+                raise ValueError(f"Не задан столбец переменной {name}")
+            arrays[name] = numpy.asarray(columns[name], dtype=self.dtype)
+        shape = numpy.broadcast_shapes(*(array.shape for array in arrays.values()))
+        if out is None:
+            out = numpy.empty(shape, dtype=self.dtype)
+        elif out.shape != shape:
+            raise ValueError(f"Размер массива результата {out.shape} не совпадает с размером столбцов {shape}")
+        else:
+            for name, array in arrays.items():
+                if numpy.shares_memory(out, array):
+                    raise ValueError(f"Массив результата перекрывается со столбцом переменной {name}")
+
+        rows = shape[0] if shape else 0
+        if not block_rows or rows <= block_rows:
+            self.run(arrays, out, shape)
+            return out
+
+        # Блочный режим: буферы пула размером в блок используются повторно
+        buffers = [numpy.empty((block_rows,) + shape[1:], dtype=self.dtype)
+                   for _ in range(self.buffer_count)]
+        for start in range(0, rows, block_rows):
+            stop = min(start + block_rows, rows)
+            block = {name: array[start:stop] if array.ndim and array.shape[0] == rows else array
+                     for name, array in arrays.items()}
+            self.run(block, out[start:stop], (stop - start,) + shape[1:],
+                     [buffer[:stop - start] for buffer in buffers])
+        return out
+
+    def run(self, arrays, out, shape, buffers=None):
+        """Выполняет программу над блоком строк и записывает результат в out"""
+        if buffers is None:
+            buffers = [numpy.empty(shape, dtype=self.dtype) for _ in range(self.buffer_count)]
+        result_kind, result_name, result_slot = self.result
+        if result_kind == BUFFER:
+            # Последняя запись в буфер результата - значение выражения,
+            # поэтому этот буфер заменяется массивом out
+            buffers[result_slot] = out
+
+        def value(arg):
+            kind, name, slot = arg
+            if kind == BUFFER:
+                return buffers[slot]
+            if kind == CONSTANT:
+                return slot
+            return arrays[name]
+
+        for ufunc, (_, arg1, arg2, slot) in zip(self.ufuncs, self.steps):
+            if arg2 is None:
+                ufunc(value(arg1), out=buffers[slot])
+            else:
+                ufunc(value(arg1), value(arg2), out=buffers[slot])
+
+        if result_kind != BUFFER:
+            numpy.copyto(out, value(self.result))
+
+
+# Операции тетрад для интерпретатора
+OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    'uminus': operator.neg,
+    '=': operator.pos,
+}
+
+# Запись операций тетрад в исходном тексте Python
+TEMPLATES = {
+    '+': "{0} + {1}",
+    '-': "{0} - {1}",
+    '*': "{0} * {1}",
+    '/': "{0} / {1}",
+    'uminus': "-{0}",
+    '=': "{0}",
+}
+
+
+def interpret_quads(quads, bindings, result=None):
+    """Вычисляет программу тетрад для значений переменных bindings (имя -> число),
+    разбирая каждую тетраду при выполнении"""
+    values = dict(bindings)
+
+    def value(name):
+        if name in values:
+            return values[name]
+        if NUMBER.fullmatch(name):
+            return float(name)
+        raise ValueError(f"Не задано значение переменной {name}")
+
+    for quad in quads:
+        if quad.op not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция тетрады: {quad.op}")
+        if quad.op in ('uminus', '='):
+            values[quad.result] = OPERATIONS[quad.op](value(quad.arg1))
+        else:
+            values[quad.result] = OPERATIONS[quad.op](value(quad.arg1), value(quad.arg2))
+    if result is None:
+        if not quads:
+            raise ValueError("Не задан результат пустой программы тетрад")
+        result = quads[-1].result
+    return value(result)
+
+
+class CompiledExpression:
+    """Программа тетрад, скомпилированная в функцию Python.
+
+    function принимает значения переменных в порядке inputs и вычисляет
+    выражение прямолинейным байт-кодом: временные переменные - локальные
+    переменные функции, без словарей и разбора тетрад при вызове."""
+
+    def __init__(self, function, inputs, source):
+        self.function = function
+        self.inputs = inputs
+        self.source = source  # Исходный текст функции
+
+    def evaluate(self, bindings):
+        """Значение выражения для значений переменных bindings (имя -> число)"""
+        for name in self.inputs:
+            if name not in bindings:
+                raise ValueError(f"Не задано значение переменной {name}")
+        return self.function(*[bindings[name] for name in self.inputs])
+
+
+def compile_quads(quads, result=None):
+    """Компилирует программу тетрад в CompiledExpression.
+
+    Имена программы заменяются локальными переменными: входные переменные
+    (в порядке имен) - параметрами v0, v1, ..., результаты тетрад - t1, t2, ...,
+    поэтому в исходном тексте не бывает идентификаторов, недопустимых
+    в Python или совпадающих с его ключевыми словами"""
+    quads = list(quads)
+    if result is None:
+        if not quads:
+            raise ValueError("Не задан результат пустой программы тетрад")
+        result = quads[-1].result
+
+    # Входные переменные - имена, которые используются до присваивания
+    defined = set()
+    inputs = set()
+    for quad in quads:
+        if quad.op not in TEMPLATES:
+            raise ValueError(f"Неизвестная операция тетрады: {quad.op}")
+        operands = (quad.arg1,) if quad.op in ('uminus', '=') else (quad.arg1, quad.arg2)
+        inputs.update(name for name in operands
+                      if name not in defined and not NUMBER.fullmatch(name))
+        defined.add(quad.result)
+    if result not in defined and not NUMBER.fullmatch(result):
+        inputs.add(result)
+    inputs = sorted(inputs)
+
+    local_names = {name: f"v{index}" for index, name in enumerate(inputs)}
+
+    def local(name):
+        if name in local_names:
+            return local_names[name]
+        if NUMBER.fullmatch(name):
+            return repr(float(name))
+        local_names[name] = f"t{len(local_names) - len(inputs) + 1}"
+        return local_names[name]
+
+    lines = [f"def expression({', '.join(local_names[name] for name in inputs)}):"]
+    for quad in quads:
+        if quad.op in ('uminus', '='):
+            args = (local(quad.arg1),)
+        else:
+            args = (local(quad.arg1), local(quad.arg2))
+        lines.append(f"    {local(quad.result)} = {TEMPLATES[quad.op].format(*args)}")
+    lines.append(f"    return {local(result)}")
+    source = "\n".join(lines) + "\n"
+
+    namespace = {}
+    exec(compile(source, "<тетрады>", "exec"), namespace)
+    return CompiledExpression(namespace['expression'], inputs, source)
+
+
+class CompiledCache:
+    """LRU-кэш выражений, скомпилированных в функции Python.
+
+    Ключ - текст выражения без пробелов вокруг операций и скобок, поэтому
+    "a+b" и "a + b" компилируются один раз."""
+
+    # Пробелы вокруг операций и скобок
+    SPACES = re.compile(r'\s*([-+*/()])\s*')
+
+    def __init__(self, max_entries=1024, cse=True):
+        self.max_entries = max_entries
+        self.cse = cse  # Исключение общих подвыражений при разборе
+        self.entries = OrderedDict()  # Нормализованный текст -> CompiledExpression
+        self.keys = {}  # Текст выражения -> нормализованный текст
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def normalize(cls, text):
+        """Нормализованный текст выражения"""
+        return cls.SPACES.sub(r'\1', ' '.join(text.split()))
+
+    def get(self, text):
+        """Скомпилированное выражение text; ошибки разбора - ValueError"""
+        key = self.keys.get(text)
+        if key is None:
+            key = self.normalize(text)
+            if len(self.keys) >= 4 * self.max_entries:
+                self.keys.clear()
+            self.keys[text] = key
+        expression = self.entries.get(key)
+        if expression is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return expression
+
+        self.misses += 1
+        parser = ExpressionParser(cse=self.cse)
+        quads, errors = parser.parse(text)
+        if errors:
+            raise ValueError("; ".join(errors))
+        expression = compile_quads(quads, parser.result)
+        self.entries[key] = expression
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return expression
+
+    def clear(self):
+        """Очищает кэш"""
+        self.entries.clear()
+        self.keys.clear()
+
+
+def divide(a, b):
+    """Деление с результатом IEEE 754 при нулевом делителе, как в NumPy"""
+    if b:
+        return a / b
+    if a != a or not a:
+        return math.nan
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+# Операции тетрад для FormulaEngine: деление на ноль дает inf или nan
+FORMULA_OPERATIONS = dict(OPERATIONS, **{'/': divide})
+
+
+def same_value(old, new):
+    """Совпадают ли значения узла: nan равно nan, а 0.0 и -0.0 различаются,
+    так как от знака нуля зависит знак бесконечности при делении"""
+    if old is None or new is None:
+        return old is new
+    if old != old:
+        return new != new
+    return old == new and math.copysign(1.0, old) == math.copysign(1.0, new)
+
+
+class FormulaEngine:
+    """Инкрементальное вычисление набора формул при изменении переменных.
+
+    Тетрады всех формул собираются в один граф зависимостей: переменная ->
+    узлы-тетрады -> результаты формул. Одинаковые подвыражения разных формул
+    (с учетом перестановки аргументов + и *) - один узел. Значения узлов
+    хранятся, и при изменении переменных пересчитываются только узлы ниже
+    по графу в порядке создания узлов (аргументы создаются раньше узла,
+    поэтому это топологический порядок). Узел, значение которого не
+    изменилось, не передает изменение дальше. Все переменные одного вызова
+    update пересчитываются за один проход, и каждый узел - не больше одного раза.
+
+    Номера узлов, освобожденных при удалении или замене формул, используются
+    повторно, поэтому число узлов не растет при редактировании формул.
+
+    Формулы ссылаются только на переменные, а не на другие формулы.
+    Значение формулы - None, пока не заданы все ее переменные.
+
+    Пример:
+        engine = FormulaEngine()
+        engine.add_formula("total", "a * b + c")
+        engine.update({'a': 2.0, 'b': 3.0, 'c': 1.0})
+        engine.value("total")  # 7.0
+    """
+
+    def __init__(self, cse=True):
+        self.parser = ExpressionParser(cse=cse)
+        self.ops = []         # Узел -> операция (None - переменная)
+        self.args = []        # Узел -> узлы аргументов
+        self.values = []      # Узел -> текущее значение
+        self.dependents = []  # Узел -> узлы, для которых он аргумент
+        self.refs = []        # Узел -> число ссылок из узлов и формул
+        self.keys = []        # Узел -> ключ в таблице nodes
+        self.order = []       # Узел -> порядковый номер создания
+        self.created = 0      # Число созданных узлов
+        self.free = []        # Освобожденные номера узлов
+        self.nodes = {}       # (операция, узлы аргументов) -> узел
+        self.variables = {}   # Имя переменной -> узел
+        self.formulas = {}    # Имя формулы -> узел результата
+        self.recomputed = 0   # Число узлов, пересчитанных последним update
+
+    def new_node(self, op, args, value, key=None):
+        """Добавляет узел и возвращает его номер.
+
+        Освобожденный номер может быть меньше номеров аргументов, поэтому
+        порядок пересчета задает order, а не номер узла"""
+        if self.free:
+            node = self.free.pop()
+            self.ops[node] = op
+            self.args[node] = args
+            self.values[node] = value
+            self.refs[node] = 0
+            self.keys[node] = key
+            self.order[node] = self.created
+        else:
+            node = len(self.ops)
+            self.ops.append(op)
+            self.args.append(args)
+            self.values.append(value)
+            self.dependents.append([])
+            self.refs.append(0)
+            self.keys.append(key)
+            self.order.append(self.created)
+        self.created += 1
+        for arg in args:
+            self.dependents[arg].append(node)
+            self.refs[arg] += 1
+        return node
+
+    def variable_node(self, name):
+        """Узел переменной; новая переменная не имеет значения"""
+        node = self.variables.get(name)
+        if node is None:
+            node = self.variables[name] = self.new_node(None, (), None)
+        return node
+
+    def compute(self, node):
+        """Значение узла-тетрады по текущим значениям аргументов"""
+        values = [self.values[arg] for arg in self.args[node]]
+        if None in values:
+            return None
+        return FORMULA_OPERATIONS[self.ops[node]](*values)
+
+    def add_formula(self, name, text):
+        """Добавляет формулу text с именем name; ошибки разбора - ValueError"""
+        if name in self.formulas:
+            raise ValueError(f"Формула {name} уже существует")
+        quads, errors = self.parser.parse(text)
+        if errors:
+            raise ValueError("; ".join(errors))
+
+        temps = {}  # Временная переменная формулы -> узел
+
+        def node_of(arg):
+            return temps[arg] if arg in temps else self.variable_node(arg)
+
+        for quad in quads:
+            if quad.op not in FORMULA_OPERATIONS:
+                raise ValueError(f"Неизвестная операция тетрады: {quad.op}")
+            if quad.op in ('uminus', '='):
+                args = (node_of(quad.arg1),)
+            else:
+                args = (node_of(quad.arg1), node_of(quad.arg2))
+            key = (quad.op, args)
+            if quad.op in ExpressionParser.COMMUTATIVE and args[1] < args[0]:
+                key = (quad.op, (args[1], args[0]))
+            node = self.nodes.get(key)
+            if node is None:
+                node = self.nodes[key] = self.new_node(quad.op, args, None, key)
+                self.values[node] = self.compute(node)
+            temps[quad.result] = node
+
+        result = node_of(self.parser.result)
+        self.refs[result] += 1
+        self.formulas[name] = result
+
+    def remove_formula(self, name):
+        """Удаляет формулу и узлы, которые больше не нужны другим формулам"""
+        stack = [self.formulas.pop(name)]
+        while stack:
+            node = stack.pop()
+            self.refs[node] -= 1
+            if self.refs[node] or self.ops[node] is None:
+                continue
+            # Узел больше не нужен: отсоединяем его от аргументов и освобождаем номер
+            del self.nodes[self.keys[node]]
+            self.values[node] = None
+            for arg in self.args[node]:
+                self.dependents[arg].remove(node)
+                stack.append(arg)
+            self.args[node] = ()
+            self.keys[node] = None
+            self.free.append(node)
+
+    def set_formula(self, name, text):
+        """Добавляет или заменяет формулу"""
+        if name in self.formulas:
+            self.remove_formula(name)
+        self.add_formula(name, text)
+
+    def update(self, bindings):
+        """Задает значения переменных (имя -> число) и пересчитывает затронутые
+        узлы. Возвращает число пересчитанных узлов"""
+        values = self.values
+        dependents = self.dependents
+        order = self.order
+        queue = []  # Куча пар (порядок создания, узел)
+        queued = set()
+        for name, value in bindings.items():
+            node = self.variable_node(name)
+            if same_value(values[node], value):
+                continue
+            values[node] = value
+            for dependent in dependents[node]:
+                if dependent not in queued:
+                    queued.add(dependent)
+                    heapq.heappush(queue, (order[dependent], dependent))
+
+        recomputed = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            recomputed += 1
+            value = self.compute(node)
+            if same_value(values[node], value):
+                continue
+            values[node] = value
+            for dependent in dependents[node]:
+                if dependent not in queued:
+                    queued.add(dependent)
+                    heapq.heappush(queue, (order[dependent], dependent))
+        self.recomputed = recomputed
+        return recomputed
+
+    def set(self, name, value):
+        """Задает значение одной переменной"""
+        return self.update({name: value})
+
+    def __len__(self):
+        """Число узлов графа (переменных и тетрад)"""
+        return len(self.ops) - len(self.free)
+
+    def value(self, name):
+        """Текущее значение формулы"""
+        return self.values[self.formulas[name]]
+
+    def results(self):
+        """Значения всех формул: имя -> значение"""
+        return {name: self.values[node] for name, node in self.formulas.items()}
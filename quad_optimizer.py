@@ -0,0 +1,210 @@
+"""Оптимизация списка тетрад.
+
+Проходы выполняются по порядку, каждый можно отключить:
+    simplify - алгебраические упрощения: x*1, 1*x, x/1, x+0, 0+x, x-0
+               и двойной унарный минус заменяются копированием (=, x, _, t)
+    copies   - распространение копий: вместо результата копирования
+               используется его источник
+    dead     - удаление тетрад, результат которых не используется
+    reuse    - повторное использование временных переменных по интервалам
+               жизни: число разных временных переменных не превышает
+               наибольшего числа одновременно живых значений
+
+ExpressionParser не допускает числовых литералов, поэтому в его тетрадах
+правила с нейтральными операндами 0 и 1 не срабатывают: из них действует
+только двойной унарный минус. Остальные правила применяются к тетрадам,
+построенным вручную или полученным из других источников.
+
+Временные переменные - результаты тетрад с именами вида tN. Результат
+выражения - результат последней тетрады: эта тетрада сохраняется всеми
+проходами, но reuse может переименовать ее результат. Поэтому после
+оптимизации имя значения выражения - quads[-1].result, а не parser.result
+(если тетрад нет, значением остается идентификатор parser.result).
+
+Пример:
+    quads, reports = QuadOptimizer().optimize(quads)
+    result = quads[-1].result if quads else parser.result
+"""
+import heapq
+import re
+
+from expression_parser_with_quads import Quad, Temp
+
+# Имя временной переменной, которую формирует ExpressionParser.new_temp
+TEMP_NAME = re.compile(r't\d+')
+
+# Пустой аргумент тетрады
+EMPTY = "_"
+
+
+def is_temp(name):
+    """Является ли имя временной переменной"""
+    return TEMP_NAME.fullmatch(name) is not None
+
+
+def count_temps(quads):
+    """Число разных временных переменных среди результатов тетрад"""
+    return len({quad.result for quad in quads if is_temp(quad.result)})
+
+
+class QuadOptimizer:
+    """Конвейер проходов оптимизации тетрад.
+
+    Исходный список тетрад не изменяется. Для каждого выполненного прохода
+    возвращается отчет: сколько тетрад и временных переменных он удалил."""
+
+    PASSES = ("simplify", "copies", "dead", "reuse")
+
+    # Операция: (нейтральный правый операнд, нейтральный левый операнд или None)
+    IDENTITIES = {
+        '+': ("0", "0"),
+        '-': ("0", None),
+        '*': ("1", "1"),
+        '/': ("1", None),
+    }
+
+    def __init__(self, passes=PASSES):
+        for name in passes:
+            if name not in self.PASSES:
+                raise ValueError(f"Неизвестный проход оптимизации: {name}")
+        # Проходы выполняются в порядке PASSES независимо от порядка в passes
+        self.passes = [name for name in self.PASSES if name in passes]
+
+    def optimize(self, quads):
+        """Выполняет включенные проходы и возвращает (тетрады, отчеты).
+
+        Отчет - словарь {'pass', 'quads_removed', 'temps_removed'}. Значение
+        выражения - результат последней из возвращенных тетрад"""
+        quads = list(quads)
+        reports = []
+        for name in self.passes:
+            quad_count = len(quads)
+            temp_count = count_temps(quads)
+            quads = getattr(self, name)(quads)
+            reports.append({
+                'pass': name,
+                'quads_removed': quad_count - len(quads),
+                'temps_removed': temp_count - count_temps(quads),
+            })
+        return quads, reports
+
+    def simplify(self, quads):
+        """Заменяет тождественные операции копированием операнда"""
+        result = []
+        versions = {}   # Имя -> число присваиваний ему
+        negated = {}    # Результат унарного минуса -> (операнд, версия операнда)
+        for quad in quads:
+            op, arg1, arg2 = quad.op, quad.arg1, quad.arg2
+            source = None
+            identity = self.IDENTITIES.get(op)
+            if identity is not None:
+                right, left = identity
+                if arg2 == right:
+                    source = arg1
+                elif left is not None and arg1 == left:
+                    source = arg2
+            elif op == "uminus" and arg1 in negated:
+                operand, version = negated[arg1]
+                if versions.get(operand, 0) == version:
+                    source = operand
+
+            negated.pop(quad.result, None)
+            if source is not None:
+                quad = Quad("=", source, EMPTY, quad.result)
+            elif op == "uminus":
+                negated[quad.result] = (arg1, versions.get(arg1, 0))
+            versions[quad.result] = versions.get(quad.result, 0) + 1
+            result.append(quad)
+        return result
+
+    def copies(self, quads):
+        """Подставляет источник копирования вместо временной переменной"""
+        result = []
+        copies = {}   # Временная переменная -> источник копирования
+        targets = {}  # Источник -> временные переменные, скопированные из него
+        for quad in quads:
+            arg1 = copies.get(quad.arg1, quad.arg1)
+            arg2 = copies.get(quad.arg2, quad.arg2)
+            if arg1 != quad.arg1 or arg2 != quad.arg2:
+                quad = Quad(quad.op, arg1, arg2, quad.result)
+
+            # Присваивание делает недействительными копии в переменную и из нее
+            name = quad.result
+            source = copies.pop(name, None)
+            if source is not None:
+                targets[source].discard(name)
+            for target in targets.pop(name, ()):
+                del copies[target]
+
+            if quad.op == "=" and is_temp(name) and quad.arg1 != name:
+                copies[name] = quad.arg1
+                targets.setdefault(quad.arg1, set()).add(name)
+            result.append(quad)
+        return result
+
+    def dead(self, quads):
+        """Удаляет тетрады, результат которых не используется дальше"""
+        if not quads:
+            return []
+        live = {quads[-1].result}
+        kept = []
+        for quad in reversed(quads):
+            name = quad.result
+            if is_temp(name) and name not in live:
+                continue
+            live.discard(name)
+            live.add(quad.arg1)
+            live.add(quad.arg2)
+            kept.append(quad)
+        kept.reverse()
+        return kept
+
+    def reuse(self, quads):
+        """Переименовывает временные переменные, повторно используя имена
+        переменных, значения которых больше не нужны"""
+        # Последнее использование каждого значения (значение - номер тетрады,
+        # которая его вычислила)
+        current = {}
+        last_use = {}
+        for index, quad in enumerate(quads):
+            for arg in (quad.arg1, quad.arg2):
+                definition = current.get(arg)
+                if definition is not None:
+                    last_use[definition] = index
+            if is_temp(quad.result):
+                current[quad.result] = index
+
+        result = []
+        names = {}   # Исходное имя -> номер новой переменной с текущим значением
+        free = []    # Куча освободившихся номеров
+        counter = 0
+        current = {}
+        for index, quad in enumerate(quads):
+            arg1, arg2 = quad.arg1, quad.arg2
+            new_arg1 = Temp(f"t{names[arg1]}") if arg1 in names else arg1
+            new_arg2 = Temp(f"t{names[arg2]}") if arg2 in names else arg2
+            # Значения, которые больше не используются, освобождают свои номера
+            for arg in (arg1, arg2):
+                definition = current.get(arg)
+                if definition is not None and last_use.get(definition) == index:
+                    del current[arg]
+                    heapq.heappush(free, names.pop(arg))
+
+            name = quad.result
+            if is_temp(name):
+                if free:
+                    number = heapq.heappop(free)
+                else:
+                    counter += 1
+                    number = counter
+                if index in last_use:
+                    names[name] = number
+                    current[name] = index
+                else:
+                    # Значение не используется: номер сразу свободен
+                    names.pop(name, None)
+                    current.pop(name, None)
+                    heapq.heappush(free, number)
+                name = Temp(f"t{number}")
+            result.append(Quad(quad.op, new_arg1, new_arg2, name))
+        return result
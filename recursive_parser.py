@@ -1,4 +1,5 @@
 from scanner import JSScanner, Token
+from tracing import Tracer
 
 class RecursiveSyntaxError(Exception):
     def __init__(self, message, line, column):
@@ -14,7 +15,7 @@ class RecursiveDescentParser:
         self.current = 0
         self.call_stack = []  # Лог вызова процедур
         self.errors = []
-        self.logs = []
+        self.tracer = Tracer(Tracer.TOKENS)  # Журнал выполнения разбора
 
     def parse(self, text):
         scanner = JSScanner()
@@ -22,7 +23,7 @@ class RecursiveDescentParser:
         self.current = 0
         self.call_stack = []
         self.errors = []
-        self.logs = []
+        self.tracer.clear()
 
         try:
             self.log("== НАЧАЛО РАЗБОРА ==")
@@ -32,13 +33,14 @@ class RecursiveDescentParser:
             self.log("== РАЗБОР ЗАВЕРШЕН УСПЕШНО ==")
         except RecursiveSyntaxError as e:
             self.errors.append({'message': e.message, 'line': e.line, 'column': e.column})
-            self.log(f"ОШИБКА: {e.message} на строке {e.line}, позиции {e.column}")
+            self.log("ОШИБКА: {0} на строке {1}, позиции {2}", e.message, e.line, e.column,
+                     level=Tracer.ERRORS)
 
-        return self.call_stack, self.errors, self.logs
+        return self.call_stack, self.errors, self.tracer.render()
 
     def match(self, *expected_values):
         if self.current < len(self.tokens) and self.tokens[self.current].value in expected_values:
-            self.log(f"match: {self.tokens[self.current].value}")
+            self.log("match: {0}", self.tokens[self.current].value, level=Tracer.TOKENS)
             self.current += 1
             return True
         return False
@@ -53,8 +55,11 @@ class RecursiveDescentParser:
         self.current += 1
         return token
 
-    def log(self, message):
-        self.logs.append(message)
+    def log(self, message, *args, level=Tracer.STEPS):
+        # Текст события - message.format(*args), он собирается только при выводе журнала
+        if level <= self.tracer.level:
+            self.tracer.emit(level, 'message', self.call_stack[-1] if self.call_stack else None,
+                             self.current, message, *args)
 
     def parse_expr(self):
         self.call_stack.append("parse_expr")
@@ -88,7 +93,7 @@ class RecursiveDescentParser:
             raise RecursiveSyntaxError("Ожидалось целое число, но достигнут конец ввода", -1, -1)
         token = self.tokens[self.current]
         if token.type == "число":
-            self.log(f"распознано число: {token.value}")
+            self.log("распознано число: {0}", token.value, level=Tracer.TOKENS)
             self.current += 1
         else:
             raise RecursiveSyntaxError("Ожидалось целое число", token.line, token.column)
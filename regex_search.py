@@ -1,6 +1,8 @@
 import re
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+from line_index import LineIndex
 
 @dataclass
 class SearchResult:
@@ -23,13 +25,15 @@ class RegexSearcher:
     }
     
     @staticmethod
-    def find_all_matches(text: str, pattern_type: str) -> List[SearchResult]:
+    def find_all_matches(text: str, pattern_type: str,
+                         line_index: Optional[LineIndex] = None) -> List[SearchResult]:
         """
         Поиск всех совпадений в тексте для заданного типа шаблона
         
         Args:
             text: Исходный текст для поиска
             pattern_type: Тип шаблона ('snils', 'mir_card', 'chemical_element')
+            line_index: Индекс строк текста, если он уже построен
             
         Returns:
             Список объектов SearchResult с найденными совпадениями
@@ -37,26 +41,26 @@ class RegexSearcher:
         if pattern_type not in RegexSearcher.PATTERNS:
             raise ValueError(f"Неизвестный тип шаблона: {pattern_type}")
         
-        pattern = RegexSearcher.PATTERNS[pattern_type]
+        regex = re.compile(RegexSearcher.PATTERNS[pattern_type])
         results = []
         
-        # Разбиваем текст на строки для определения позиции
-        lines = text.split('\n')
-        current_pos = 0
-        
-        for line_num, line in enumerate(lines, 1):
-            for match in re.finditer(pattern, line):
+        # Ищем совпадения в пределах каждой строки, не вырезая строки из текста:
+        # границы поиска pos/endpos для \b и \s равносильны вырезанию строки,
+        # так как соседние с ними символы - переводы строк
+        if line_index is None:
+            line_index = LineIndex(text)
+        for line_num in range(1, len(line_index) + 1):
+            line_start = line_index.line_start(line_num)
+            for match in regex.finditer(text, line_start, line_index.line_end(line_num)):
                 start = match.start()
-                end = match.end()
                 results.append(SearchResult(
                     pattern=pattern_type,
                     match=match.group(),
-                    start=current_pos + start,
-                    end=current_pos + end,
+                    start=start,
+                    end=match.end(),
                     line=line_num,
-                    column=start + 1  # +1 для отображения с 1, а не с 0
+                    column=start - line_start + 1  # +1 для отображения с 1, а не с 0
                 ))
-            current_pos += len(line) + 1  # +1 для учета символа новой строки
         
         return results
     
@@ -64,11 +64,13 @@ class RegexSearchDialog(QDialog):
         layout.addWidget(self.status_label)
         
         self.current_text = ""
+        self.current_line_index = None
         self.current_results = []
     
-    def set_text(self, text: str):
-        """Устанавливает текст для поиска"""
+    def set_text(self, text: str, line_index=None):
+        """Устанавливает текст для поиска и, если он есть, индекс его строк"""
         self.current_text = text
+        self.current_line_index = line_index
     
     def search(self):
         """Выполняет поиск по выбранному шаблону"""
@@ -79,7 +81,7 @@ class RegexSearchDialog(QDialog):
         pattern_type = self.pattern_combo.currentData()
         try:
             self.current_results = RegexSearcher.find_all_matches(
-                self.current_text, pattern_type
+                self.current_text, pattern_type, self.current_line_index
             )
             self.update_results_table()
         except Exception as e:
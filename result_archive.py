@@ -0,0 +1,426 @@
+"""Двоичный поколоночный архив результатов анализа.
+
+Архив хранит потоки лексем, тетрады и диагностические сообщения нескольких
+документов. Данные записываются блоками по block_rows строк: каждый блок
+состоит из заголовка, столбцов фиксированной ширины в порядке байтов
+little-endian (каждый выровнен на 8 байт) и пула строк блока. В конце файла
+находится оглавление в формате JSON (таблица видов лексем, имена документов,
+смещения блоков) и завершающая запись с его смещением и длиной.
+
+Запись идет потоком: в памяти хранится только текущий блок. Чтение идет
+через mmap, столбцы блоков доступны как memoryview (или массивы NumPy)
+без копирования данных. Такие представления можно использовать и после
+закрытия ArchiveReader: отображение файла освобождается вместе с последним
+из них.
+
+Пример запуска:
+    python result_archive.py results.jsca configs/ --engine dfa
+"""
+import argparse
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from expression_parser_with_quads import Quad
+from parser import SyntaxError
+from scanner import JSScanner, Token, TokenBuffer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'JSCA'
+VERSION = 1
+
+# Заголовок файла: сигнатура, версия
+FILE_HEADER = struct.Struct('<4sI')
+# Заголовок блока: вид блока, номер документа, число строк, число строк пула
+BLOCK_HEADER = struct.Struct('<BxxxIII')
+# Завершающая запись: смещение и длина оглавления, сигнатура
+TRAILER = struct.Struct('<QQ4s')
+
+# Виды блоков и их столбцы: (имя, код типа array)
+TOKENS = 1
+QUADS = 2
+DIAGNOSTICS = 3
+SCHEMAS = {
+    TOKENS: [('kind', 'B'), ('line', 'I'), ('column', 'I'),
+             ('start', 'q'), ('end', 'q'), ('value', 'I')],
+    QUADS: [('op', 'I'), ('arg1', 'I'), ('arg2', 'I'), ('result', 'I')],
+    DIAGNOSTICS: [('line', 'I'), ('column', 'I'), ('message', 'I'), ('value', 'I')],
+}
+
+# Номер строки пула для отсутствующего значения
+NO_STRING = 0xFFFFFFFF
+# Смещение лексемы, если оно неизвестно
+NO_OFFSET = -1
+
+# Виды лексем с одинаковыми типом и кодом, которые различаются по значению
+KIND_VALUES = {'LBRACKET': '[', 'RBRACKET': ']'}
+
+
+def _padding(size):
+    """Число байтов выравнивания до границы 8 байт"""
+    return -size % 8
+
+
+def _to_little_endian(column):
+    """Байты столбца в порядке little-endian"""
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+class ArchiveWriter:
+    """Потоковая запись архива результатов анализа.
+
+    Строки каждого столбца накапливаются в массивах array и сбрасываются
+    в файл блоком, как только их становится block_rows, поэтому расход
+    памяти не зависит от размера записываемых потоков."""
+
+    def __init__(self, path, block_rows=65536, kinds=None):
+        self.file = open(path, 'wb')
+        self.block_rows = block_rows
+        # Таблица видов лексем: код вида -> (тип, код лексемы)
+        self.kinds = kinds or JSScanner().kinds
+        self.kind_of = {}
+        for index, kind in enumerate(self.kinds):
+            self.kind_of.setdefault(tuple(kind), index)
+        # (тип, код, значение) -> код вида для видов, которые не различить по типу и коду
+        self.kind_by_value = {}
+        if len(self.kinds) == len(JSScanner.TOKEN_KINDS):
+            for name, value in KIND_VALUES.items():
+                index = JSScanner.TOKEN_KINDS.index(name)
+                self.kind_by_value[(*self.kinds[index], value)] = index
+        self.documents = []
+        self.blocks = []  # Оглавление: [вид, документ, смещение, число строк]
+        self.current = None  # (вид, документ) текущего блока
+        self.columns = {}
+        self.pool = {}
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_document(self, name):
+        """Регистрирует документ и возвращает его номер"""
+        self.documents.append(name)
+        return len(self.documents) - 1
+
+    def _start(self, kind, document):
+        """Начинает блок вида kind, если текущий блок другого вида или документа"""
+        if self.current != (kind, document):
+            self._flush()
+            self.current = (kind, document)
+            self.columns = {name: array(code) for name, code in SCHEMAS[kind]}
+            self.pool = {}
+
+    def _string(self, value):
+        """Номер строки в пуле текущего блока"""
+        if value is None:
+            return NO_STRING
+        index = self.pool.get(value)
+        if index is None:
+            index = self.pool[value] = len(self.pool)
+        return index
+
+    def _row_added(self):
+        if len(next(iter(self.columns.values()))) >= self.block_rows:
+            kind, document = self.current
+            self._flush()
+            self._start(kind, document)
+
+    def _flush(self):
+        """Записывает текущий блок в файл"""
+        if self.current is None:
+            return
+        kind, document = self.current
+        self.current = None
+        rows = len(next(iter(self.columns.values())))
+        if not rows:
+            return
+
+        offset = self.file.tell()
+        self.file.write(BLOCK_HEADER.pack(kind, document, rows, len(self.pool)))
+        self.file.write(bytes(_padding(BLOCK_HEADER.size)))
+        for name, _ in SCHEMAS[kind]:
+            data = _to_little_endian(self.columns[name])
+            self.file.write(data)
+            self.file.write(bytes(_padding(len(data))))
+
+        # Пул строк: смещения начала каждой строки и конца последней, затем байты UTF-8
+        encoded = [value.encode('utf-8', 'surrogatepass') for value in self.pool]
+        ends = array('I', [0])
+        for value in encoded:
+            ends.append(ends[-1] + len(value))
+        data = _to_little_endian(ends)
+        self.file.write(data)
+        self.file.write(bytes(_padding(len(data))))
+        self.file.write(b''.join(encoded))
+        self.file.write(bytes(_padding(ends[-1])))
+
+        self.blocks.append([kind, document, offset, rows])
+
+    def _kind(self, type_name, code, value=None):
+        """Код вида лексемы в таблице видов архива"""
+        kind = self.kind_by_value.get((type_name, code, value))
+        if kind is None:
+            kind = self.kind_of.get((type_name, code))
+        if kind is None:
+            raise ValueError(f"Неизвестный тип лексемы: {type_name}")
+        return kind
+
+    def write_tokens(self, document, tokens, line_index=None):
+        """Записывает поток лексем документа.
+
+        Смещения лексем берутся из TokenBuffer (для байтовых источников -
+        в байтах), а для списка лексем - из индекса строк line_index
+        (LineIndex), если он передан."""
+        self._start(TOKENS, document)
+        if isinstance(tokens, TokenBuffer):
+            # Коды видов буфера переводятся в коды таблицы архива; при той же
+            # таблице видов код сохраняется, иначе ищется по типу и коду
+            kinds = [index if index < len(self.kinds) and tuple(self.kinds[index]) == tuple(kind)
+                     else self._kind(*kind)
+                     for index, kind in enumerate(tokens.kinds)]
+            for index in range(len(tokens)):
+                columns = self.columns
+                columns['kind'].append(kinds[tokens.types[index]])
+                columns['line'].append(tokens.lines[index])
+                columns['column'].append(tokens.columns[index])
+                columns['start'].append(tokens.starts[index])
+                columns['end'].append(tokens.ends[index])
+                columns['value'].append(self._string(tokens.value(index)))
+                self._row_added()
+            return
+
+        for token in tokens:
+            kind = self._kind(token.type, token.code, token.value)
+            if line_index is not None:
+                start = line_index.offset(token.line, token.column)
+                end = start + len(token.value)
+            else:
+                start = end = NO_OFFSET
+            columns = self.columns
+            columns['kind'].append(kind)
+            columns['line'].append(token.line)
+            columns['column'].append(token.column)
+            columns['start'].append(start)
+            columns['end'].append(end)
+            columns['value'].append(self._string(token.value))
+            self._row_added()
+
+    def write_quads(self, document, quads):
+        """Записывает тетрады документа"""
+        self._start(QUADS, document)
+        for quad in quads:
+            columns = self.columns
+            columns['op'].append(self._string(quad.op))
+            columns['arg1'].append(self._string(quad.arg1))
+            columns['arg2'].append(self._string(quad.arg2))
+            columns['result'].append(self._string(quad.result))
+            self._row_added()
+
+    def write_diagnostics(self, document, errors):
+        """Записывает ошибки документа (объекты SyntaxError или совместимые с ними)"""
+        self._start(DIAGNOSTICS, document)
+        for error in errors:
+            columns = self.columns
+            columns['line'].append(error.line)
+            columns['column'].append(error.column)
+            columns['message'].append(self._string(error.message))
+            columns['value'].append(self._string(error.value))
+            self._row_added()
+
+    def close(self):
+        """Сбрасывает последний блок и записывает оглавление"""
+        if self.file.closed:
+            return
+        self._flush()
+        footer = json.dumps({
+            'kinds': [list(kind) for kind in self.kinds],
+            'documents': self.documents,
+            'blocks': self.blocks,
+        }, ensure_ascii=False).encode('utf-8')
+        offset = self.file.tell()
+        self.file.write(footer)
+        self.file.write(TRAILER.pack(offset, len(footer), MAGIC))
+        self.file.close()
+
+
+class ArchiveBlock:
+    """Блок архива: столбцы в виде memoryview над отображенным в память файлом"""
+
+    def __init__(self, view, kind, document, offset):
+        self.kind = kind
+        self.document = document
+        _, _, self.rows, pool_size = BLOCK_HEADER.unpack_from(view, offset)
+        position = offset + BLOCK_HEADER.size + _padding(BLOCK_HEADER.size)
+
+        self.columns = {}
+        self.offsets = {}  # Смещения столбцов в файле (для NumPy)
+        self.view = view
+        for name, code in SCHEMAS[kind]:
+            size = self.rows * array(code).itemsize
+            self.offsets[name] = position
+            self.columns[name] = self._column(view[position:position + size], code)
+            position += size + _padding(size)
+
+        size = (pool_size + 1) * 4
+        self.pool_ends = self._column(view[position:position + size], 'I')
+        position += size + _padding(size)
+        self.pool_start = position
+
+    @staticmethod
+    def _column(data, code):
+        """Столбец без копирования (на little-endian машинах)"""
+        if sys.byteorder == 'big' and code not in ('B', 'b'):
+            column = array(code, data.tobytes())
+            column.byteswap()
+            return memoryview(column)
+        return data.cast(code)
+
+    def string(self, index):
+        """Строка пула с номером index (None для отсутствующего значения)"""
+        if index == NO_STRING:
+            return None
+        start = self.pool_start + self.pool_ends[index]
+        end = self.pool_start + self.pool_ends[index + 1]
+        return str(self.view[start:end], 'utf-8', 'surrogatepass')
+
+    def numpy(self, name):
+        """Столбец в виде массива NumPy без копирования"""
+        if numpy is None:
+            raise ImportError("Для представления столбцов массивами NumPy нужен пакет numpy")
+        code = dict(SCHEMAS[self.kind])[name]
+        dtype = numpy.dtype(code).newbyteorder('<')
+        return numpy.frombuffer(self.view, dtype=dtype, count=self.rows, offset=self.offsets[name])
+
+
+class ArchiveReader:
+    """Чтение архива результатов анализа через mmap.
+
+    Блоки читаются по одному при обращении, лексемы, тетрады и ошибки
+    выдаются генераторами, поэтому расход памяти не зависит от размера архива.
+    Полученные блоки, их столбцы и массивы NumPy остаются действительными
+    и после close."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        magic, version = FILE_HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Файл не является архивом результатов: {path}")
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия архива: {version}")
+        offset, length, magic = TRAILER.unpack_from(self.view, len(self.view) - TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"Архив поврежден или не закрыт: {path}")
+
+        footer = json.loads(str(self.view[offset:offset + length], 'utf-8'))
+        self.kinds = [tuple(kind) for kind in footer['kinds']]
+        self.documents = footer['documents']
+        self.block_index = footer['blocks']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def blocks(self, kind=None, document=None):
+        """Блоки архива, отобранные по виду и документу"""
+        for block_kind, block_document, offset, _ in self.block_index:
+            if self.mmap is None:
+                raise ValueError("Архив закрыт")
+            if (kind is None or block_kind == kind) and (document is None or block_document == document):
+                # Собственное представление блока не зависит от закрытия читателя
+                yield ArchiveBlock(memoryview(self.mmap), block_kind, block_document, offset)
+
+    def tokens(self, document=None):
+        """Лексемы документа в виде объектов Token"""
+        kinds = self.kinds
+        for block in self.blocks(TOKENS, document):
+            columns = block.columns
+            for kind, line, column, value in zip(columns['kind'], columns['line'],
+                                                 columns['column'], columns['value']):
+                type_name, code = kinds[kind]
+                yield Token(type_name, block.string(value), line, column, code)
+
+    def quads(self, document=None):
+        """Тетрады документа в виде объектов Quad"""
+        for block in self.blocks(QUADS, document):
+            columns = block.columns
+            for op, arg1, arg2, result in zip(columns['op'], columns['arg1'],
+                                              columns['arg2'], columns['result']):
+                yield Quad(block.string(op), block.string(arg1), block.string(arg2), block.string(result))
+
+    def diagnostics(self, document=None):
+        """Ошибки документа в виде объектов SyntaxError"""
+        for block in self.blocks(DIAGNOSTICS, document):
+            columns = block.columns
+            for line, column, message, value in zip(columns['line'], columns['column'],
+                                                    columns['message'], columns['value']):
+                yield SyntaxError(block.string(message), line, column, block.string(value))
+
+    def close(self):
+        """Закрывает архив: новые блоки после этого не читаются.
+
+        Если полученные блоки, столбцы, массивы NumPy или незавершенные
+        генераторы еще ссылаются на отображение файла, mmap.close вызвал бы
+        BufferError. Тогда отображение не закрывается явно, а освобождается
+        при удалении последнего представления."""
+        if self.view is None:
+            return
+        view, mapping = self.view, self.mmap
+        self.view = self.mmap = None
+        try:
+            view.release()
+            mapping.close()
+        except BufferError:
+            pass
+
+
+def main(argv=None):
+    from batch_analysis import collect_files
+    from parser import JSParser
+
+    arg_parser = argparse.ArgumentParser(
+        description="Архивация результатов анализа файлов JavaScript в поколоночном формате")
+    arg_parser.add_argument('output', help="файл архива")
+    arg_parser.add_argument('paths', nargs='+', help="файлы и каталоги для анализа")
+    arg_parser.add_argument('--pattern', default='*.js',
+                            help="шаблон имен файлов при обходе каталогов")
+    arg_parser.add_argument('--engine', choices=JSScanner.ENGINES, default="regex",
+                            help="движок сканера")
+    args = arg_parser.parse_args(argv)
+
+    parser = JSParser()
+    parser.scanner = JSScanner(args.engine)
+    with ArchiveWriter(args.output, kinds=parser.scanner.kinds) as writer:
+        for path in collect_files(args.paths, args.pattern):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    text = file.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                continue
+            document = writer.add_document(path)
+            tokens = parser.scanner.tokenize_buffer(text)
+            _, syntax_errors = parser.parse_tokens(tokens)
+            writer.write_tokens(document, tokens)
+            writer.write_diagnostics(document, syntax_errors)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
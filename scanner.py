@@ -1,8 +1,15 @@
+import codecs
+import mmap
 import re
+import sys
+from array import array
+from dfa_scanner import DFAEngine
 
 class Token:
     """Класс, представляющий токен (лексему)"""
     
+    __slots__ = ('type', 'value', 'line', 'column', 'code')
+    
     def __init__(self, type, value, line, column, code=None):
         self.type = type
         self.value = value
@@ -10,6 +17,92 @@ class Token:
         self.column = column
         self.code = code
 
+class TokenBuffer:
+    """Компактное поколоночное хранилище лексем.
+    
+    Вместо объекта Token на каждую лексему хранит массивы кодов видов,
+    смещений начала и конца в исходном тексте, строк и позиций. Значение
+    лексемы вырезается из исходного текста только при обращении к ней.
+    Индексация и перебор возвращают объекты Token, поэтому буфер можно
+    передавать туда, где ожидается список лексем.
+    
+    Источником может быть и байтовая строка или mmap: тогда смещения
+    считаются в байтах, а значения декодируются из encoding при обращении.
+    
+    Массив partners - индекс парных скобок: для скобки в нем записан индекс
+    парной ей скобки, для остальных лексем и скобок без пары - -1."""
+    
+    def __init__(self, source, kinds, encoding=None):
+        self.source = source  # Исходный текст
+        self.kinds = kinds    # Виды лексем: код вида -> (тип, код лексемы)
+        self.encoding = encoding  # Кодировка байтового источника
+        # Смещения до 4 ГБ помещаются в 32 бита, для больших источников берем 64
+        offset_type = 'I' if len(source) < 2 ** 32 else 'Q'
+        self.types = array('B')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+        self.lines = array('I')
+        self.columns = array('I')
+        self.partners = array('i')
+    
+    def add(self, kind, start, end, line, column):
+        """Добавляет лексему и возвращает ее индекс"""
+        self.types.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.partners.append(-1)
+        return len(self.types) - 1
+    
+    def value(self, index):
+        """Возвращает значение лексемы, вырезая его из исходного текста"""
+        value = self.source[self.starts[index]:self.ends[index]]
+        if self.encoding:
+            value = value.decode(self.encoding)
+        return value
+    
+    def token(self, index):
+        """Возвращает лексему с индексом index в виде объекта Token"""
+        type_name, code = self.kinds[self.types[index]]
+        return Token(type_name, self.value(index), self.lines[index], self.columns[index], code)
+    
+    def __len__(self):
+        return len(self.types)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.token(i) for i in range(*index.indices(len(self.types)))]
+        if index < 0:
+            index += len(self.types)
+        if not 0 <= index < len(self.types):
+            raise IndexError("индекс лексемы вне диапазона")
+        return self.token(index)
+    
+    def __iter__(self):
+        source = self.source
+        kinds = self.kinds
+        encoding = self.encoding
+        for kind, start, end, line, column in zip(self.types, self.starts, self.ends,
+                                                  self.lines, self.columns):
+            type_name, code = kinds[kind]
+            value = source[start:end]
+            if encoding:
+                value = value.decode(encoding)
+            yield Token(type_name, value, line, column, code)
+
+class ScanState:
+    """Состояние сканера, переносимое между фрагментами текста"""
+    
+    def __init__(self, line=1, line_start=0, brackets=None, line_index=None):
+        self.line = line              # Номер текущей строки
+        self.line_start = line_start  # Смещение начала текущей строки во фрагменте
+        # Стек открытых скобок: пары (тип скобки, токен или индекс открывающей скобки)
+        self.brackets = brackets if brackets is not None else []
+        self.position = 0             # Позиция во фрагменте, на которой остановился разбор
+        # Индекс строк всего текста (LineIndex), если фрагмент - это весь документ
+        self.line_index = line_index
+
 class JSScanner:
     """Лексический анализатор для языка JavaScript с фокусом на ассоциативные массивы"""
     
@@ -77,21 +170,58 @@ class JSScanner:
         "RPAREN": 15,        # Закрывающая )
     }
     
+    # Виды лексем, которые попадают в результат; индекс вида - его код в TokenBuffer
+    TOKEN_KINDS = (
+        'KEYWORD', 'IDENTIFIER', 'NUMBER', 'STRING', 'OPERATOR', 'ASSIGNMENT',
+        'LBRACE', 'RBRACE', 'LPAREN', 'RPAREN', 'LBRACKET', 'RBRACKET',
+        'COLON', 'COMMA', 'SEMICOLON', 'ERROR',
+    )
+    
     # Ключевые слова JavaScript
     KEYWORDS = ["let", "var", "const", "function", "return", "true", "false", "null", "undefined"]
     
-    def __init__(self):
+    # Ключевые слова языковых профилей
+    LANGUAGE_PROFILES = {
+        "javascript": KEYWORDS,
+        "ecmascript": [
+            "await", "break", "case", "catch", "class", "const", "continue", "debugger",
+            "default", "delete", "do", "else", "enum", "export", "extends", "false",
+            "finally", "for", "function", "if", "import", "in", "instanceof", "let",
+            "new", "null", "return", "static", "super", "switch", "this", "throw",
+            "true", "try", "typeof", "undefined", "var", "void", "while", "with", "yield",
+        ],
+        "json": ["true", "false", "null"],
+    }
+    
+    # Движки распознавания лексем. Движок "dfa" читает каждый символ текста
+    # не больше одного раза (см. DFAEngine) и гарантирует линейное время разбора
+    # на любом входе, поэтому его следует использовать для непроверенных текстов.
+    # Движок "hashed" распознает слова одним шаблоном идентификатора, а ключевые
+    # слова находит поиском во множестве, а не перебором альтернатив
+    ENGINES = ("regex", "dfa", "hashed")
+    
+    # Проверка символа слова (\w) для границ ключевых слов
+    WORD_CHAR = re.compile(r'\w')
+    
+    def __init__(self, engine="regex", profile="javascript"):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Неизвестный движок сканера: {engine}")
+        if profile not in self.LANGUAGE_PROFILES:
+            raise ValueError(f"Неизвестный языковой профиль: {profile}")
+        self.engine = engine
+        self.profile = profile
+        self.keywords = frozenset(sys.intern(keyword) for keyword in self.LANGUAGE_PROFILES[profile])
+        
         # Регулярные выражения для распознавания лексем
         self.token_specs = [
-            ('KEYWORD', r'\b(?:' + '|'.join(self.KEYWORDS) + r')\b'),
+            ('KEYWORD', r'\b(?:' + '|'.join(sorted(self.keywords)) + r')\b'),
             ('STRING', r'"[^"\n]*"|\'[^\'\n]*\''),  # Строки без экранированных кавычек
-            ('INVALID_STRING_DOUBLE', r'"[^"\n]*\n|"[^"]*$'),  # Незакрытые двойные кавычки
-            ('INVALID_STRING_SINGLE', r'\'[^\'\n]*\n|\'[^\']*$'),  # Незакрытые одинарные кавычки
+            # Незакрытые кавычки: строка до перевода строки или до конца текста
+            ('INVALID_STRING_DOUBLE', r'"[^"\n]*(?:\n|\Z)'),
+            ('INVALID_STRING_SINGLE', r'\'[^\'\n]*(?:\n|\Z)'),
             ('NUMBER', r'\d+(\.\d*)?'),
-            ('INVALID_IDENTIFIER', r'\d+[a-zA-Z_][a-zA-Z0-9_]*'),  # Идентификатор, начинающийся с цифры
             ('IDENTIFIER', r'[a-zA-Z_][a-zA-Z0-9_]*'),
             ('OPERATOR', r'[\+\-\*/]'),
-            ('INVALID_OPERATOR', r'\+\+\d'),  # Неправильное использование ++
             ('ASSIGNMENT', r'='),
             ('LBRACE', r'\{'),
             ('RBRACE', r'\}'),
@@ -110,43 +240,204 @@ class JSScanner:
         self.token_regex = '|'.join('(?P<%s>%s)' % pair for pair in self.token_specs)
         self.regex = re.compile(self.token_regex)
         
+        # Байтовый вариант для анализа файлов, отображенных в память. В байтовом
+        # режиме \s, \w и \d означают только ASCII-символы, поэтому цепочки
+        # не-ASCII байтов выделяются отдельной группой до группы ERROR
+        bytes_specs = [(name, pattern.encode('ascii')) for name, pattern in self.token_specs]
+        bytes_specs.insert(len(bytes_specs) - 1, ('NON_ASCII', rb'[\x80-\xff]+'))
+        self.bytes_regex = re.compile(b'|'.join(b'(?P<%s>%s)' % (name.encode('ascii'), pattern)
+                                                for name, pattern in bytes_specs))
+        
+        # Табличный автомат строится по тем же классам лексем
+        if engine == "dfa":
+            self.dfa = DFAEngine(self.keywords)
+            self.matches = self.dfa.matches
+        elif engine == "hashed":
+            # То же регулярное выражение без альтернативы ключевых слов. Самые частые
+            # лексемы (слова и пробелы) проверяются первыми: их первые символы не
+            # совпадают с первыми символами других лексем, поэтому порядок
+            # альтернатив на результат не влияет
+            frequent = ('IDENTIFIER', 'WHITESPACE')
+            word_specs = sorted(self.token_specs[1:], key=lambda pair: pair[0] not in frequent)
+            self.word_regex = re.compile('|'.join('(?P<%s>%s)' % pair for pair in word_specs))
+            self.matches = self._hashed_matches
+        else:
+            self.matches = self._regex_matches
+        
         # Для проверки баланса скобок
         self.brackets = []
+        
+        # Тип и код лексемы для каждого вида вычисляются один раз, а не для каждой лексемы
+        self.kinds = [
+            ("ERROR", self.TOKEN_TYPES['ERROR']) if kind == 'ERROR'
+            else (self._get_token_description(kind, None), self._get_token_code(kind, None))
+            for kind in self.TOKEN_KINDS
+        ]
+        self.kind_codes = {kind: code for code, kind in enumerate(self.TOKEN_KINDS)}
+        # Группы регулярного выражения, которые дают лексему-ошибку
+        for group in ('INVALID_STRING_DOUBLE', 'INVALID_STRING_SINGLE'):
+            self.kind_codes[group] = self.kind_codes['ERROR']
     
-    def tokenize(self, text):
-        """Разбивает текст на лексемы"""
+    def tokenize(self, text, line_index=None):
+        """Разбивает текст на лексемы.
+        
+        Если передан индекс строк документа (LineIndex), номера строк лексем
+        берутся из него, а не подсчитываются по тексту."""
         tokens = []
-        line = 1
-        line_start = 0
+        state = ScanState(line_index=line_index)
+        self.scan(text, state, tokens)
         
-        # Для хранения информации о скобках (тип, позиция, строка)
-        opening_brackets = []
+        # После обработки всех токенов проверяем, остались ли открытые скобки
+        self.close_brackets(state, tokens)
         
-        # Перебираем все совпадения с регулярными выражениями
-        for match in self.regex.finditer(text):
-            # Группа, которая соответствует лексеме
+        return tokens
+    
+    def tokenize_buffer(self, text, line_index=None):
+        """Разбивает текст на лексемы и возвращает их в компактном TokenBuffer"""
+        tokens = TokenBuffer(text, self.kinds)
+        state = ScanState(line_index=line_index)
+        self.scan(text, state, tokens)
+        self.close_brackets(state, tokens)
+        return tokens
+    
+    def _regex_matches(self, text, pos=0):
+        """Выдает лексемы, найденные регулярным выражением, в виде (вид, начало, конец)"""
+        for match in self.regex.finditer(text, pos):
+            yield match.lastgroup, match.start(), match.end()
+    
+    def _hashed_matches(self, text, pos=0):
+        """Выдает лексемы в виде (вид, начало, конец), распознавая ключевые слова
+        поиском идентификатора во множестве ключевых слов профиля"""
+        keywords = self.keywords
+        word_char = self.WORD_CHAR.match
+        for match in self.word_regex.finditer(text, pos):
             token_type = match.lastgroup
-            token_value = match.group()
-            start_pos = match.start()
+            start, end = match.span()
+            # Ключевое слово, как и \b в регулярном выражении, должно стоять
+            # на границах слова (соседний символ может быть буквой Unicode)
+            if token_type == 'IDENTIFIER' and text[start:end] in keywords \
+                    and not (start and word_char(text, start - 1)) and not word_char(text, end):
+                token_type = 'KEYWORD'
+            yield token_type, start, end
+    
+    def tokenize_mmap(self, path, encoding='utf-8'):
+        """Разбивает на лексемы файл, отображенный в память, не читая его в строку.
+        
+        Возвращает TokenBuffer, источником которого является сам mmap: смещения
+        и позиции в строке считаются в байтах, значения декодируются только при
+        обращении. Кодировка должна быть совместима с ASCII (utf-8, cp1251)."""
+        with open(path, 'rb') as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Пустой файл нельзя отобразить в память
+                data = b''
+        tokens = TokenBuffer(data, self.kinds, encoding)
+        state = ScanState()
+        self.scan(data, state, tokens)
+        self.close_brackets(state, tokens)
+        return tokens
+    
+    def _bytes_matches(self, data, pos=0, encoding='utf-8'):
+        """Выдает лексемы байтового текста в виде (вид, начало, конец) со смещениями в байтах.
+        
+        Цепочки не-ASCII байтов декодируются и разбираются строковым регулярным
+        выражением, так что, например, кириллица классифицируется так же, как в
+        tokenize. Отличие возможно только для чисел, в которых ASCII-цифры
+        соседствуют с цифрами других алфавитов: в байтовом режиме это два числа."""
+        for match in self.bytes_regex.finditer(data, pos):
+            token_type = match.lastgroup
+            start, end = match.span()
             
-            # Вычисляем позицию в строке
-            col = start_pos - line_start + 1
+            if token_type == 'NON_ASCII':
+                run = data[start:end].decode(encoding, errors='replace')
+                offset = start
+                previous = 0
+                for sub_match in self.regex.finditer(run):
+                    offset += len(run[previous:sub_match.start()].encode(encoding))
+                    length = len(sub_match.group().encode(encoding))
+                    yield sub_match.lastgroup, offset, offset + length
+                    offset += length
+                    previous = sub_match.end()
+                continue
+            
+            # Граница слова \b у ключевого слова в байтовом режиме не видит
+            # не-ASCII буквы, поэтому соседние символы проверяем отдельно
+            if token_type == 'KEYWORD':
+                before = data[max(start - 4, 0):start].decode(encoding, errors='ignore')[-1:]
+                after = data[end:end + 4].decode(encoding, errors='ignore')[:1]
+                if (before and not before.isascii() and re.match(r'\w', before)) or \
+                        (after and not after.isascii() and re.match(r'\w', after)):
+                    token_type = 'IDENTIFIER'
+            
+            yield token_type, start, end
+    
+    def scan(self, text, state, tokens, pos=0, partial=False):
+        """Разбивает фрагмент текста на лексемы, продолжая анализ с состояния state.
+        
+        Номер строки и стек открытых скобок берутся из state и сохраняются
+        в нем после разбора, поэтому текст можно анализировать по частям.
+        Незакрытые скобки остаются в state.brackets до вызова close_brackets.
+        
+        Если partial=True, фрагмент считается незаконченным: лексема, которая
+        доходит до конца фрагмента, может продолжиться в следующей порции текста,
+        поэтому она не разбирается, а state.position указывает на ее начало."""
+        line = state.line
+        line_start = state.line_start
+        line_index = state.line_index
+        state.position = len(text)
+        
+        # Для хранения информации о скобках (тип, токен открывающей скобки)
+        opening_brackets = state.brackets
+        
+        kinds = self.kinds
+        kind_codes = self.kind_codes
+        error_kind = kind_codes['ERROR']
+        compact = isinstance(tokens, TokenBuffer)
+        
+        # Байтовый текст (в том числе mmap) разбирается байтовым регулярным выражением
+        if isinstance(text, str):
+            newline = '\n'
+            matches = self.matches(text, pos)
+            # Имена повторяются в тексте многократно - храним одну копию строки
+            word_kinds = (kind_codes['KEYWORD'], kind_codes['IDENTIFIER'])
+        else:
+            word_kinds = ()
+            newline = b'\n'
+            matches = self._bytes_matches(text, pos, getattr(tokens, 'encoding', None) or 'utf-8')
+        
+        # Начало следующей строки: лексема, которая заканчивается дальше,
+        # содержит перевод строки
+        if line_index is not None:
+            next_line_start = line_index.line_end(line) + 1
+        else:
+            next_line_start = text.find(newline, pos) + 1 or len(text) + 1
+        
+        # Перебираем все лексемы, найденные выбранным движком
+        for token_type, start_pos, end_pos in matches:
+            
+            # Лексема на границе порции будет разобрана вместе со следующей порцией
+            if partial and end_pos == state.position:
+                state.position = start_pos
+                break
             
             # Проверяем на переносы строк в пробельных символах
             if token_type == 'WHITESPACE':
-                newlines = token_value.count('\n')
-                if newlines > 0:
-                    line += newlines
-                    line_start = start_pos + token_value.rindex('\n') + 1
+                if end_pos >= next_line_start:
+                    line, line_start, next_line_start = self._next_line(
+                        text, start_pos, end_pos, line, line_index)
                 continue  # Пропускаем пробельные символы
             
-            # Отслеживаем открывающие и закрывающие скобки
-            if token_type in ['LBRACE', 'LPAREN', 'LBRACKET']:
-                opening_brackets.append((token_type, col, line))
-            elif token_type in ['RBRACE', 'RPAREN', 'RBRACKET']:
+            # Вычисляем позицию в строке
+            col = start_pos - line_start + 1
+            kind = kind_codes[token_type]
+            
+            # Отслеживаем закрывающие скобки
+            opener = None
+            if token_type in ('RBRACE', 'RPAREN', 'RBRACKET'):
                 if opening_brackets:
                     # Проверяем соответствие типов скобок
-                    opening_type, _, _ = opening_brackets.pop()
+                    opening_type, opener = opening_brackets.pop()
                     expected_closing = {
                         'LBRACE': 'RBRACE',
                         'LPAREN': 'RPAREN',
@@ -155,83 +446,126 @@ class JSScanner:
                     
                     if expected_closing != token_type:
                         # Неправильная закрывающая скобка
-                        token = Token(
-                            type="ERROR",
-                            value=token_value,
-                            line=line,
-                            column=col,
-                            code=self.TOKEN_TYPES['ERROR']
-                        )
-                        tokens.append(token)
-                        continue
+                        kind = error_kind
+                        opener = None
             
-            # Обработка ошибок
-            if token_type == 'INVALID_STRING_DOUBLE':
-                token_type = 'ERROR'
-                error_message = "Незакрытая двойная кавычка"
-                token = Token(
-                    type=token_type,
-                    value=token_value,
-                    line=line,
-                    column=col,
-                    code=self.TOKEN_TYPES['ERROR']
-                )
-            elif token_type == 'INVALID_STRING_SINGLE':
-                token_type = 'ERROR'
-                error_message = "Незакрытая одинарная кавычка"
-                token = Token(
-                    type=token_type,
-                    value=token_value,
-                    line=line,
-                    column=col,
-                    code=self.TOKEN_TYPES['ERROR']
-                )
-            elif token_type in ['INVALID_IDENTIFIER', 'INVALID_OPERATOR', 'ERROR']:
-                token_type = 'ERROR'
-                error_message = self._get_error_message(token_type, token_value)
-                token = Token(
-                    type=token_type,
-                    value=token_value,
-                    line=line,
-                    column=col,
-                    code=self.TOKEN_TYPES['ERROR']
-                )
+            # Создаем лексему: в компактном буфере храним только смещения
+            if compact:
+                ref = tokens.add(kind, start_pos, end_pos, line, col)
+                # Связываем парные скобки в индексе пар
+                if opener is not None:
+                    tokens.partners[opener] = ref
+                    tokens.partners[ref] = opener
             else:
-                # Создаем объект Token для правильных лексем
-                token = Token(
-                    type=self._get_token_description(token_type, token_value),
-                    value=token_value,
-                    line=line,
-                    column=col,
-                    code=self._get_token_code(token_type, token_value)
-                )
-            
-            tokens.append(token)
+                type_name, code = kinds[kind]
+                value = text[start_pos:end_pos]
+                if kind in word_kinds:
+                    value = sys.intern(value)
+                ref = Token(type_name, value, line, col, code)
+                tokens.append(ref)
             
-            # Обновляем номер строки для многострочных токенов
-            newlines = token_value.count('\n')
-            if newlines > 0:
-                line += newlines
-                line_start = start_pos + token_value.rindex('\n') + 1
+            # Запоминаем открывающую скобку вместе с ее лексемой
+            if token_type in ('LBRACE', 'LPAREN', 'LBRACKET'):
+                opening_brackets.append((token_type, ref))
+            # Незакрытая строка включает перевод строки
+            elif token_type in ('INVALID_STRING_DOUBLE', 'INVALID_STRING_SINGLE'):
+                if end_pos >= next_line_start:
+                    line, line_start, next_line_start = self._next_line(
+                        text, start_pos, end_pos, line, line_index)
         
-        # После обработки всех токенов проверяем, остались ли открытые скобки
-        for bracket_type, pos, line_num in opening_brackets:
-            bracket_char = {
-                'LBRACE': '{',
-                'LPAREN': '(',
-                'LBRACKET': '['
-            }.get(bracket_type)
+        state.line = line
+        state.line_start = line_start
+        return tokens
+    
+    def _next_line(self, text, start_pos, end_pos, line, line_index):
+        """Возвращает номер строки, начало строки и начало следующей строки
+        после лексемы, содержащей переводы строк"""
+        if line_index is not None:
+            line = line_index.line_of(end_pos)
+            return line, line_index.line_start(line), line_index.line_end(line) + 1
+        
+        newline = '\n' if isinstance(text, str) else b'\n'
+        value = text[start_pos:end_pos]
+        line += value.count(newline)
+        line_start = start_pos + value.rindex(newline) + 1
+        return line, line_start, text.find(newline, end_pos) + 1 or len(text) + 1
+    
+    def iter_tokens(self, fileobj, chunk_size=65536, encoding='utf-8'):
+        """Лениво разбивает на лексемы содержимое файлового объекта, читая его
+        порциями по chunk_size символов (или байт для двоичных файлов).
+        
+        Выдает те же лексемы, что и tokenize, но хранит в памяти только
+        текущую порцию, поэтому подходит для файлов больше оперативной памяти."""
+        state = ScanState()
+        decoder = None
+        buffer = ''
+        pos = 0
+        
+        while True:
+            chunk = fileobj.read(chunk_size)
+            final = not chunk
+            if isinstance(chunk, bytes):
+                # Двоичный файл: многобайтовый символ может оказаться на границе порций
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(encoding)()
+                chunk = decoder.decode(chunk, final=final)
+            buffer += chunk
+            
+            tokens = []
+            self.scan(buffer, state, tokens, pos=pos, partial=not final)
+            yield from tokens
+            if final:
+                break
             
-            # Создаем токен ошибки для каждой незакрытой скобки
-            token = Token(
-                type="ERROR",
-                value=bracket_char,
-                line=line_num,
-                column=pos,
-                code=self.TOKEN_TYPES['ERROR']
-            )
-            tokens.append(token)
+            # Отбрасываем разобранную часть порции, сохраняя один символ перед
+            # остановкой: от него зависит граница слова \b у ключевых слов
+            cut = max(state.position - 1, 0)
+            buffer = buffer[cut:]
+            pos = state.position - cut
+            state.line_start -= cut
+        
+        # Незакрытые скобки в конце файла
+        yield from self.close_brackets(state, [])
+    
+    def match_brackets(self, tokens):
+        """Строит индекс парных скобок для готового списка лексем
+        (в TokenBuffer он строится при разборе, см. TokenBuffer.partners).
         
+        Повторяет разбор скобок сканера: возвращает массив, в котором для
+        скобки записан индекс парной скобки (-1 - для скобок без пары и
+        остальных лексем), и стек незакрытых скобок в виде пар (тип, лексема).
+        Лексемы ошибок, добавленные close_brackets, в разборе не участвуют."""
+        pairs = array('i', [-1]) * len(tokens)
+        openers = []
+        for index, token in enumerate(tokens):
+            value = token.value
+            if value in ('{', '(', '[') and token.type != "ERROR":
+                openers.append((token.type, index))
+            elif value in ('}', ')', ']') and openers:
+                # Закрывающая скобка (в том числе ошибочная) снимает вершину стека
+                _, opener = openers.pop()
+                if token.type != "ERROR":
+                    pairs[opener] = index
+                    pairs[index] = opener
+        return pairs, [(bracket_type, tokens[index]) for bracket_type, index in openers]
+    
+    def close_brackets(self, state, tokens):
+        """Добавляет лексему ошибки для каждой незакрытой скобки из state.brackets"""
+        compact = isinstance(tokens, TokenBuffer)
+        for _, bracket in state.brackets:
+            # Создаем лексему ошибки для каждой незакрытой скобки
+            if compact:
+                tokens.add(self.kind_codes['ERROR'], tokens.starts[bracket], tokens.ends[bracket],
+                           tokens.lines[bracket], tokens.columns[bracket])
+            else:
+                token = Token(
+                    type="ERROR",
+                    value=bracket.value,
+                    line=bracket.line,
+                    column=bracket.column,
+                    code=self.TOKEN_TYPES['ERROR']
+                )
+                tokens.append(token)
         return tokens
     
     def _get_error_message(self, token_type, token_value):
@@ -1,6 +1,9 @@
 from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QTextEdit
-from PyQt6.QtCore import QRect, Qt, QSize
-from PyQt6.QtGui import QColor, QPainter, QTextFormat, QTextCharFormat, QSyntaxHighlighter, QFont
+from PyQt6.QtCore import QRect, Qt, QSize, QTimer
+from PyQt6.QtGui import (QColor, QPainter, QTextFormat, QTextCharFormat, QSyntaxHighlighter, QFont,
+                         QTextCursor, QShortcut, QKeySequence)
+from incremental_parser import IncrementalParser
+from incremental_scanner import IncrementalScanner
 
 class ErrorHighlighter(QSyntaxHighlighter):
     """Подсветка ошибок в коде"""
@@ -111,6 +114,62 @@ class CodeEditor(QPlainTextEdit):
         
         # Добавляем подсветку синтаксиса и ошибок
         self.highlighter = ErrorHighlighter(self.document())
+        
+        # Инкрементальный лексический анализ: пересканируются только измененные строки
+        self.lexer = IncrementalScanner()
+        self.document().contentsChange.connect(self.update_lexer)
+        
+        # Инкрементальный синтаксический анализ: разбираются только измененные объявления
+        self.syntax = IncrementalParser(self.lexer)
+        self.live_syntax = False
+        self.syntax_timer = QTimer(self)
+        self.syntax_timer.setSingleShot(True)
+        self.syntax_timer.setInterval(300)  # Проверяем после паузы в наборе, мс
+        self.syntax_timer.timeout.connect(self.check_syntax)
+        
+        # Переход к парной скобке
+        self.bracket_shortcut = QShortcut(QKeySequence("Ctrl+]"), self)
+        self.bracket_shortcut.activated.connect(self.jump_to_matching_bracket)
+    
+    def update_lexer(self, position, removed, added):
+        """Передает изменение документа инкрементальным сканеру и анализатору"""
+        doc = self.document()
+        end = min(position + added, doc.characterCount() - 1)
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(end).blockNumber()
+        
+        # Число удаленных строк определяем по изменению количества блоков
+        removed_lines = (last - first + 1) - (doc.blockCount() - len(self.lexer.lines))
+        if first < 0 or last < first or removed_lines < 1 or first + removed_lines > len(self.lexer.lines):
+            # Изменение не удалось сопоставить со строками - пересканируем документ целиком
+            self.syntax.set_text(self.toPlainText())
+        else:
+            new_lines = [doc.findBlockByNumber(number).text() for number in range(first, last + 1)]
+            self.syntax.replace_lines(first, removed_lines, new_lines)
+        
+        if self.live_syntax:
+            self.syntax_timer.start()
+    
+    def set_live_syntax(self, enabled):
+        """Включает или выключает проверку синтаксиса при вводе"""
+        self.live_syntax = enabled
+        if enabled:
+            self.check_syntax()
+        else:
+            self.syntax_timer.stop()
+            self.set_errors([])
+    
+    def check_syntax(self):
+        """Подсвечивает синтаксические ошибки документа. После правки заново
+        разбираются только затронутые ею объявления"""
+        errors = [{
+            'line': error.line,
+            'position': error.column,
+            'value': error.value if error.value else "",
+            'message': error.message
+        } for error in self.syntax.syntax_errors()]
+        self.set_errors(errors)
+        return errors
     
     def lineNumberAreaWidth(self):
         digits = 1
@@ -154,8 +213,55 @@ class CodeEditor(QPlainTextEdit):
             selection.cursor.clearSelection()
             extraSelections.append(selection)
         
+        # Подсветка скобки у курсора и парной ей скобки
+        brackets = self.matching_brackets()
+        if brackets:
+            for token in brackets:
+                selection = QTextEdit.ExtraSelection()
+                selection.format.setBackground(QColor(255, 215, 0, 120))  # Золотистый
+                selection.cursor = self.token_cursor(token)
+                extraSelections.append(selection)
+        
         self.setExtraSelections(extraSelections)
     
+    def matching_brackets(self):
+        """Скобка у курсора (после него или перед ним) и парная ей скобка, или None"""
+        if not hasattr(self, 'lexer'):
+            return None
+        cursor = self.textCursor()
+        line = cursor.blockNumber() + 1
+        line_index = self.lexer.line_index
+        if line > len(line_index):
+            return None
+        # Позиция курсора Qt считается в единицах UTF-16, позиции лексем - в символах
+        offset = line_index.offset(line, cursor.positionInBlock() + 1, utf16=True)
+        column = offset - line_index.line_start(line) + 1
+        
+        # Поток лексем документа не собирается: пара ищется по скобкам строк
+        for bracket_column in (column, column - 1):
+            pair = self.lexer.bracket_pair(line, bracket_column)
+            if pair:
+                return pair
+        return None
+    
+    def token_cursor(self, token):
+        """Курсор, выделяющий лексему token в документе"""
+        line_index = self.lexer.line_index
+        start = line_index.offset(token.line, token.column)
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(line_index.to_utf16(start))
+        cursor.setPosition(line_index.to_utf16(start + len(token.value)), QTextCursor.MoveMode.KeepAnchor)
+        return cursor
+    
+    def jump_to_matching_bracket(self):
+        """Перемещает курсор к скобке, парной скобке у курсора"""
+        brackets = self.matching_brackets()
+        if brackets:
+            _, partner = brackets
+            cursor = self.token_cursor(partner)
+            cursor.clearSelection()
+            self.setTextCursor(cursor)
+    
     def set_errors(self, errors):
         """Устанавливает список ошибок для подсветки"""
         if hasattr(self, 'highlighter'):
@@ -0,0 +1,79 @@
+import unittest
+
+from expression_parser_with_quads import ExpressionParser, QuadBuffer, Temp
+from quad_evaluator import CompiledCache, FormulaEngine, VectorEvaluator, interpret_quads, numpy
+from quad_optimizer import QuadOptimizer
+
+
+class TempNameTest(unittest.TestCase):
+    """Идентификаторы вида tN не смешиваются с временными переменными"""
+
+    TEXT = "t1*b+t1"
+    BINDINGS = {'t1': 2.0, 'b': 3.0}
+    EXPECTED = 8.0
+
+    def test_temp_like_identifier_parsed(self):
+        for engine in ExpressionParser.ENGINES:
+            for compact in (False, True):
+                parser = ExpressionParser(engine=engine, compact=compact)
+                quads, errors = parser.parse(self.TEXT)
+                self.assertEqual(errors, [])
+                self.assertEqual([repr(quad) for quad in quads], ["(*, t1, b, t1)", "(+, t1, t1, t2)"])
+                self.assertEqual(interpret_quads(quads, self.BINDINGS, parser.result), self.EXPECTED)
+
+    def test_evaluators_keep_identifier(self):
+        self.assertEqual(CompiledCache().get(self.TEXT).evaluate(self.BINDINGS), self.EXPECTED)
+        engine = FormulaEngine()
+        engine.add_formula("f", self.TEXT)
+        engine.update(self.BINDINGS)
+        self.assertEqual(engine.value("f"), self.EXPECTED)
+
+        parser = ExpressionParser()
+        quads, _ = parser.parse("(t1 + t2) * t1 - t2")
+        optimized, _ = QuadOptimizer().optimize(quads)
+        bindings = {'t1': 2.0, 't2': 5.0}
+        self.assertEqual(interpret_quads(optimized, bindings, optimized[-1].result), 9.0)
+
+    @unittest.skipIf(numpy is None, "нужен пакет numpy")
+    def test_vector_evaluator_keeps_identifier(self):
+        parser = ExpressionParser()
+        quads, _ = parser.parse(self.TEXT)
+        columns = {'t1': numpy.arange(4.0), 'b': numpy.full(4, 3.0)}
+        values = VectorEvaluator(quads, parser.result).evaluate(columns)
+        numpy.testing.assert_allclose(values, columns['t1'] * 3.0 + columns['t1'])
+
+    def test_other_identifiers_allowed(self):
+        parser = ExpressionParser()
+        quads, errors = parser.parse("t*b+x1")
+        self.assertEqual(errors, [])
+        self.assertEqual([repr(quad) for quad in quads], ["(*, t, b, t1)", "(+, t1, x1, t2)"])
+
+    def test_buffer_separates_temps_from_symbols(self):
+        buffer = QuadBuffer()
+        code = buffer.intern("t1")
+        self.assertGreaterEqual(code, 0)
+        buffer.add('*', code, buffer.intern("b"), -1)
+        buffer.add('+', -1, code, -2)
+        self.assertEqual([repr(quad) for quad in buffer], ["(*, t1, b, t1)", "(+, t1, t1, t2)"])
+        self.assertNotEqual(buffer.args1[1], buffer.args2[1])
+
+        quads, _ = ExpressionParser().parse("t1*b+t1")
+        copy = QuadBuffer.from_quads(quads)
+        self.assertEqual((copy.args1[1], copy.args2[1]), (buffer.args1[1], buffer.args2[1]))
+        self.assertEqual([(quad.arg1, quad.arg2, quad.result) for quad in copy],
+                         [(quad.arg1, quad.arg2, quad.result) for quad in quads])
+        self.assertIsInstance(copy[1].arg1, Temp)
+        self.assertNotIsInstance(copy[1].arg2, Temp)
+
+    def test_compact_matches_list(self):
+        text = "(a + b) * -c - a / (b + a)"
+        for cse in (False, True):
+            quads, _ = ExpressionParser(cse=cse).parse(text)
+            compact, _ = ExpressionParser(cse=cse, compact=True).parse(text)
+            self.assertEqual([repr(quad) for quad in compact], [repr(quad) for quad in quads])
+            self.assertEqual([repr(quad) for quad in QuadBuffer.from_quads(quads)],
+                             [repr(quad) for quad in quads])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import random
+import unittest
+
+from incremental_scanner import IncrementalScanner
+from scanner import JSScanner
+
+# Фрагменты строк: скобки всех видов (в том числе несогласованные), строки
+# со скобками внутри, незакрытые строки и обычные лексемы
+PIECES = ["{", "}", "(", ")", "[", "]", "{", "}", "let", "a", "=", "1", ",", ";", ":",
+          '"(}"', '"open', " ", "  ", "@"]
+
+
+def random_line(rng):
+    return ' '.join(rng.choice(PIECES) for _ in range(rng.randint(0, 6)))
+
+
+class BracketPairTest(unittest.TestCase):
+    """Парные скобки и диапазоны сворачивания по скобкам строк совпадают
+    с индексом парных скобок полного потока лексем после каждой правки"""
+
+    def check(self, lexer):
+        tokens = lexer.tokens()
+        pairs = lexer.pairs
+        ranges = []
+        for index, token in enumerate(tokens[:len(tokens) - len(lexer.final_brackets)]):
+            pair = lexer.bracket_pair(token.line, token.column)
+            partner = pairs[index]
+            if partner < 0:
+                self.assertIsNone(pair, (index, token.value))
+                continue
+            self.assertIsNotNone(pair, (index, token.value))
+            found, other = pair
+            self.assertEqual((found.line, found.column, found.value),
+                             (token.line, token.column, token.value))
+            expected = tokens[partner]
+            self.assertEqual((other.line, other.column, other.value),
+                             (expected.line, expected.column, expected.value))
+            if partner > index and expected.line > token.line:
+                ranges.append((token.line, expected.line))
+        self.assertEqual(lexer.fold_ranges(), ranges)
+
+    def test_random_edits(self):
+        rng = random.Random(4)
+        for _ in range(60):
+            lexer = IncrementalScanner(JSScanner())
+            lines = [random_line(rng) for _ in range(rng.randint(1, 10))]
+            lexer.set_text('\n'.join(lines))
+            self.check(lexer)
+            for _ in range(20):
+                first = rng.randint(0, len(lines) - 1)
+                removed = rng.randint(1, min(3, len(lines) - first))
+                new_lines = [random_line(rng) for _ in range(rng.randint(1, 3))]
+                lexer.replace_lines(first, removed, new_lines)
+                lines[first:first + removed] = new_lines
+                self.check(lexer)
+
+    def test_positions_outside_brackets(self):
+        lexer = IncrementalScanner()
+        lexer.set_text("let a = {\n  b: [1, 2]\n};")
+        self.assertIsNone(lexer.bracket_pair(1, 1))
+        self.assertIsNone(lexer.bracket_pair(4, 1))
+        opening, closing = lexer.bracket_pair(1, 9)
+        self.assertEqual((closing.line, closing.column, closing.value), (3, 1, "}"))
+        closing, opening = lexer.bracket_pair(2, 11)
+        self.assertEqual((opening.line, opening.column, opening.value), (2, 6, "["))
+        self.assertEqual(lexer.fold_ranges(), [(1, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from line_index import LineIndex
+
+# Буквы, пробел и символы вне базовой плоскости (две единицы UTF-16)
+ALPHABET = "ab c\U0001F600\U00010348"
+
+
+class LineIndexTest(unittest.TestCase):
+    """Индекс после последовательности правок совпадает с индексом,
+    вычисленным по тексту заново"""
+
+    def check(self, index, lines):
+        text = '\n'.join(lines)
+        self.assertEqual(len(index), len(lines))
+        starts = [0]
+        for line in lines[:-1]:
+            starts.append(starts[-1] + len(line) + 1)
+        for number, start in enumerate(starts, 1):
+            self.assertEqual(index.line_start(number), start)
+            self.assertEqual(index.line_end(number), start + len(lines[number - 1]))
+        for offset in range(len(text) + 1):
+            line = sum(1 for start in starts if start <= offset)
+            self.assertEqual(index.line_of(offset), line)
+            utf16 = len(text[:offset].encode('utf-16-le')) // 2
+            self.assertEqual(index.to_utf16(offset), utf16)
+            column = offset - starts[line - 1]
+            units = len(text[starts[line - 1]:offset].encode('utf-16-le')) // 2
+            self.assertEqual(index.line_column(offset), (line, column + 1))
+            self.assertEqual(index.line_column(offset, utf16=True), (line, units + 1))
+            self.assertEqual(index.offset(line, units + 1, utf16=True), offset)
+
+    def test_random_edits(self):
+        rng = random.Random(2)
+
+        def line():
+            return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 6)))
+
+        for _ in range(100):
+            lines = [line() for _ in range(rng.randint(1, 8))]
+            index = LineIndex('\n'.join(lines))
+            for _ in range(30):
+                first = rng.randint(0, len(lines))
+                removed = rng.randint(0, len(lines) - first)
+                new_lines = [line() for _ in range(rng.randint(0, 3))]
+                if removed == len(lines) and not new_lines:
+                    new_lines = [line()]
+                index.replace_lines(first, removed, new_lines)
+                lines[first:first + removed] = new_lines
+                self.check(index, lines)
+
+    def test_invalid_range(self):
+        index = LineIndex("a\nb")
+        with self.assertRaises(ValueError):
+            index.replace_lines(1, 2, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from expression_parser_with_quads import ExpressionParser
+from quad_evaluator import FormulaEngine, VectorEvaluator, numpy, same_value
+
+NAMES = "abcdefgh"
+
+
+def random_expression(rng, depth=0):
+    if depth > 2 or rng.random() < 0.3:
+        return rng.choice(NAMES)
+    text = f"{random_expression(rng, depth + 1)} {rng.choice('+-*/')} {random_expression(rng, depth + 1)}"
+    return f"-({text})" if rng.random() < 0.2 else f"({text})"
+
+
+class FormulaEngineTest(unittest.TestCase):
+
+    def test_incremental_matches_rebuild(self):
+        rng = random.Random(3)
+        engine = FormulaEngine()
+        texts = {}
+        bindings = {}
+        for index in range(50):
+            texts[f"f{index}"] = random_expression(rng)
+            engine.add_formula(f"f{index}", texts[f"f{index}"])
+        for step in range(300):
+            if step % 3 == 0:
+                # Замена формулы: новые узлы занимают освобожденные номера
+                name = rng.choice(list(texts))
+                texts[name] = random_expression(rng)
+                engine.set_formula(name, texts[name])
+            changes = {rng.choice(NAMES): float(rng.randint(-2, 2)) for _ in range(rng.randint(1, 3))}
+            bindings.update(changes)
+            engine.update(changes)
+
+            rebuilt = FormulaEngine()
+            for name, text in texts.items():
+                rebuilt.add_formula(name, text)
+            rebuilt.update(bindings)
+            for name in texts:
+                self.assertTrue(same_value(engine.value(name), rebuilt.value(name)), texts[name])
+
+    def test_redefinition_keeps_node_count_bounded(self):
+        engine = FormulaEngine()
+        engine.add_formula("g", "a + b")
+        engine.update({'a': 1.0, 'b': 2.0, 'c': 3.0})
+        sizes = set()
+        for index in range(1000):
+            engine.set_formula("f", "a * b - c" if index % 2 else "(a + c) / -b")
+            sizes.add((len(engine), len(engine.ops)))
+        # Размеры графа только чередуются для двух вариантов формулы
+        self.assertEqual(len(sizes), 2)
+        self.assertEqual(engine.value("f"), -1.0)
+        self.assertEqual(engine.value("g"), 3.0)
+
+    def test_removal_frees_unshared_nodes(self):
+        engine = FormulaEngine()
+        engine.add_formula("f", "a * b + c")
+        engine.add_formula("g", "b * a - c")
+        engine.remove_formula("f")
+        engine.remove_formula("g")
+        self.assertEqual(len(engine), 3)  # Остаются только переменные a, b, c
+        self.assertEqual(engine.nodes, {})
+
+
+@unittest.skipIf(numpy is None, "нужен пакет numpy")
+class VectorEvaluatorTest(unittest.TestCase):
+
+    def setUp(self):
+        parser = ExpressionParser()
+        quads, _ = parser.parse("(a + b) * -c - a / b")
+        self.evaluator = VectorEvaluator(quads, parser.result)
+        self.columns = {name: numpy.arange(1.0, 11.0) + index
+                        for index, name in enumerate(("a", "b", "c"))}
+        a, b, c = self.columns['a'], self.columns['b'], self.columns['c']
+        self.expected = (a + b) * -c - a / b
+
+    def test_blocks_match_single_pass(self):
+        for block_rows in (None, 3):
+            values = self.evaluator.evaluate(self.columns, block_rows=block_rows)
+            numpy.testing.assert_allclose(values, self.expected)
+
+    def test_out_overlapping_input_rejected(self):
+        for out in (self.columns['a'], self.columns['c'][::-1]):
+            with self.assertRaises(ValueError):
+                self.evaluator.evaluate(self.columns, out=out)
+        numpy.testing.assert_array_equal(self.columns['a'], numpy.arange(1.0, 11.0))
+
+    def test_separate_out(self):
+        out = numpy.empty(10)
+        self.assertIs(self.evaluator.evaluate(self.columns, out=out), out)
+        numpy.testing.assert_allclose(out, self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
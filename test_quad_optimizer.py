@@ -0,0 +1,47 @@
+import unittest
+
+from expression_parser_with_quads import ExpressionParser, Quad
+from quad_evaluator import interpret_quads
+from quad_optimizer import QuadOptimizer
+
+BINDINGS = {'a': 2.0, 'b': 3.0, 'c': 5.0}
+
+
+def quads_of(*rows):
+    return [Quad(*row) for row in rows]
+
+
+class QuadOptimizerTest(unittest.TestCase):
+
+    def test_identities_on_hand_built_quads(self):
+        # Числовые константы бывают только в тетрадах, построенных вручную
+        quads = quads_of(('*', 'a', '1', 't1'), ('+', '0', 't1', 't2'), ('-', 't2', '0', 't3'),
+                         ('/', 't3', '1', 't4'), ('+', 't4', 'b', 't5'))
+        optimized, reports = QuadOptimizer().optimize(quads)
+        self.assertEqual([repr(quad) for quad in optimized], ["(+, a, b, t1)"])
+        self.assertEqual(reports[0], {'pass': 'simplify', 'quads_removed': 0, 'temps_removed': 0})
+        self.assertEqual(interpret_quads(optimized, BINDINGS), interpret_quads(quads, BINDINGS))
+
+    def test_non_identities_kept(self):
+        quads = quads_of(('-', '0', 'a', 't1'), ('/', '1', 't1', 't2'))
+        optimized, _ = QuadOptimizer(("simplify",)).optimize(quads)
+        self.assertEqual([repr(quad) for quad in optimized], [repr(quad) for quad in quads])
+
+    def test_double_minus_on_parser_output(self):
+        parser = ExpressionParser()
+        quads, _ = parser.parse("--a * b")
+        optimized, _ = QuadOptimizer().optimize(quads)
+        self.assertEqual([repr(quad) for quad in optimized], ["(*, a, b, t1)"])
+
+    def test_result_is_last_quad(self):
+        parser = ExpressionParser()
+        quads, _ = parser.parse("(a + b) * (b - c) - --c / a")
+        optimized, _ = QuadOptimizer().optimize(quads)
+        result = optimized[-1].result
+        self.assertNotEqual(result, parser.result)  # reuse переименовал результат
+        self.assertEqual(interpret_quads(optimized, BINDINGS, result),
+                         interpret_quads(quads, BINDINGS, parser.result))
+
+
+if __name__ == "__main__":
+    unittest.main()
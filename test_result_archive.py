@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from result_archive import TOKENS, ArchiveReader, ArchiveWriter, numpy
+from scanner import JSScanner
+
+TEXT = "let a = [1, [b]];\nx = a[0];"
+
+
+class ResultArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = JSScanner()
+        handle, self.path = tempfile.mkstemp(suffix='.jsca')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, tokens):
+        with ArchiveWriter(self.path, kinds=self.scanner.kinds) as writer:
+            writer.write_tokens(writer.add_document("test.js"), tokens)
+
+    def test_bracket_kinds_round_trip(self):
+        # Квадратные скобки имеют одинаковые тип и код, но разные виды
+        buffer = self.scanner.tokenize_buffer(TEXT)
+        expected = list(buffer.types)
+        for tokens in (buffer, self.scanner.tokenize(TEXT)):
+            self.write(tokens)
+            with ArchiveReader(self.path) as reader:
+                kinds = [kind for block in reader.blocks(TOKENS) for kind in block.columns['kind']]
+                values = [token.value for token in reader.tokens(0)]
+            self.assertEqual(kinds, expected)
+            self.assertEqual(values, [buffer.value(index) for index in range(len(buffer))])
+
+    def test_views_outlive_reader(self):
+        self.write(self.scanner.tokenize_buffer(TEXT))
+        with ArchiveReader(self.path) as reader:
+            tokens = reader.tokens(0)
+            first = next(tokens)
+            blocks = list(reader.blocks(TOKENS))
+            column = blocks[0].columns['start']
+        self.assertEqual(first.value, "let")
+        self.assertEqual(next(tokens).value, "a")
+        self.assertEqual(column[1], 4)
+        self.assertEqual(blocks[0].string(blocks[0].columns['value'][0]), "let")
+        with self.assertRaises(ValueError):
+            list(reader.blocks())
+
+    @unittest.skipIf(numpy is None, "нужен пакет numpy")
+    def test_numpy_views_outlive_reader(self):
+        self.write(self.scanner.tokenize_buffer(TEXT))
+        with ArchiveReader(self.path) as reader:
+            columns = [block.numpy('start') for block in reader.blocks(TOKENS)]
+        self.assertEqual(list(columns[0][:3]), [0, 4, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import random
+import unittest
+
+from scanner import JSScanner
+
+# Фрагменты сгенерированных текстов: ключевые слова и их префиксы, буквы и
+# цифры Unicode, незакрытые строки и комментарии (сканер не выделяет
+# комментарии, они разбираются как операторы), скобки, недопустимые символы
+PIECES = [
+    "let", "var", "const", "function", "return", "true", "false", "null", "undefined",
+    "functio", "lett", "_let", "let1", "x", "foo_bar", "a1",
+    "é", "яблоко", "中文", "ß", "letя", "яlet", "Ω1",
+    "0", "42", "3.14", "7.", "٣", "１２", "1٣", "٣.5", "x٣",
+    '"str"', "'str'", '"unterminated', "'open", '"', "'", '""', "''",
+    "/*", "*/", "//", "/* comment", "// comment",
+    "(", ")", "{", "}", "[", "]", "=", "+", "-", "*", "/", ",", ";", ":",
+    "@", "#", "$", "\\", "`", "€",
+    " ", "  ", "\t", "\n", "\r\n", "\n\n", "   ", " ",
+]
+
+
+def random_text(rng, size):
+    return ''.join(rng.choice(PIECES) for _ in range(size))
+
+
+def as_tuples(tokens):
+    return [(token.type, token.value, token.line, token.column, token.code) for token in tokens]
+
+
+class ScannerEnginesTest(unittest.TestCase):
+    """Разностная проверка: движки dfa и hashed, TokenBuffer и поточный
+    разбор по порциям дают те же лексемы, что и движок regex"""
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.scanners = {engine: JSScanner(engine) for engine in JSScanner.ENGINES}
+        self.texts = [random_text(self.rng, self.rng.randint(0, 60)) for _ in range(400)]
+        self.texts += ["", "let", '"', "let\n\"x\n'y", "(((", "{)", "٣" * 10, "é" * 10]
+
+    def test_engines_match_regex(self):
+        reference = self.scanners["regex"]
+        for text in self.texts:
+            expected = as_tuples(reference.tokenize(text))
+            for engine, scanner in self.scanners.items():
+                self.assertEqual(as_tuples(scanner.tokenize(text)), expected, (engine, text))
+
+    def test_buffer_matches_list(self):
+        for text in self.texts:
+            for engine, scanner in self.scanners.items():
+                tokens = scanner.tokenize(text)
+                buffer = scanner.tokenize_buffer(text)
+                self.assertEqual(as_tuples(buffer), as_tuples(tokens), (engine, text))
+                pairs, _ = scanner.match_brackets(tokens)
+                self.assertEqual(list(buffer.partners), list(pairs), (engine, text))
+
+    def test_chunked_iter_tokens(self):
+        reference = self.scanners["regex"]
+        for text in self.texts[:150]:
+            expected = as_tuples(reference.tokenize(text))
+            for engine, scanner in self.scanners.items():
+                for chunk_size in (1, 2, 3, 7):
+                    tokens = scanner.iter_tokens(io.StringIO(text), chunk_size)
+                    self.assertEqual(as_tuples(tokens), expected, (engine, chunk_size, text))
+                # Двоичный файл: многобайтовые символы на границах порций
+                tokens = scanner.iter_tokens(io.BytesIO(text.encode('utf-8')), 3)
+                self.assertEqual(as_tuples(tokens), expected, (engine, text))
+
+    def test_long_tokens_across_chunks(self):
+        text = "let " + "x" * 1000 + ' = "' + "s" * 500 + '"\n' + "1" * 700 + ' "open'
+        expected = as_tuples(self.scanners["regex"].tokenize(text))
+        for engine, scanner in self.scanners.items():
+            self.assertEqual(as_tuples(scanner.iter_tokens(io.StringIO(text), 64)), expected, engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
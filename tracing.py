@@ -0,0 +1,84 @@
+from collections import deque
+
+
+class Tracer:
+    """Структурированный журнал событий анализаторов.
+
+    Событие - кортеж (вид, состояние, индекс лексемы, шаблон, аргументы).
+    Анализатор записывает в него исходные значения, а текст собирается
+    только тогда, когда журнал нужен: при вызове render (вывод журнала
+    в консоль интерфейса) или при записи в подключенный приемник (файл,
+    sys.stdout).
+
+    Каждое событие относится к уровню подробности. События уровня выше
+    текущего не записываются; в горячих циклах анализаторы проверяют
+    уровень один раз до цикла, поэтому выключенный уровень не стоит ничего.
+
+    При заданной емкости события хранятся в кольцевом буфере и журнал
+    содержит только последние capacity событий.
+    """
+
+    OFF = 0     # Журнал выключен
+    ERRORS = 1  # Ошибки анализа
+    STEPS = 2   # Шаги восстановления, вызовы процедур, этапы разбора
+    TOKENS = 3  # События на каждой лексеме
+
+    # Префикс текста событий каждого вида
+    PREFIXES = {'recovery': "[Восстановление] "}
+
+    def __init__(self, level=OFF, capacity=None):
+        self.level = level
+        self.capacity = capacity
+        self.events = deque(maxlen=capacity) if capacity else []
+        self.sinks = []  # Приемники, в которые события пишутся текстом сразу
+
+    def enabled(self, level):
+        """Записываются ли события уровня level"""
+        return level <= self.level
+
+    def emit(self, level, kind, state, index, template, *args):
+        """Записывает событие, если его уровень включен.
+
+        Текст события - template.format(*args) (без аргументов - сам template),
+        но форматируется он только при выводе"""
+        if level > self.level:
+            return
+        event = (kind, state, index, template, args)
+        self.events.append(event)
+        if self.sinks:
+            line = self.render_event(event) + '\n'
+            for sink in self.sinks:
+                sink.write(line)
+
+    def add_sink(self, sink):
+        """Подключает приемник - объект с методом write (файл, sys.stdout)"""
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """Отключает приемник"""
+        self.sinks.remove(sink)
+
+    def clear(self):
+        """Очищает журнал"""
+        self.events.clear()
+
+    def extend(self, events):
+        """Добавляет готовые события (например, из журнала другого процесса)"""
+        self.events.extend(events)
+
+    def __len__(self):
+        """Число событий в журнале"""
+        return len(self.events)
+
+    @classmethod
+    def render_event(cls, event):
+        """Текст одного события"""
+        kind, _, _, template, args = event
+        text = template.format(*args) if args else template
+        prefix = cls.PREFIXES.get(kind)
+        return prefix + text if prefix else text
+
+    def render(self):
+        """Тексты всех событий журнала"""
+        render_event = self.render_event
+        return [render_event(event) for event in self.events]